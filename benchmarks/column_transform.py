@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+#
+# Micro-benchmark of the tag value transforms over a whole column: the
+# per-string functions (as the output file stem templates apply them,
+# one value at a time) against a single template.column_transform()
+# call. Results of the two are also checked to be identical.
+#
+# The column holds <values> PatientIDs with <distinct> distinct values
+# (a tree has many files per patient and series). The garbage collector
+# is off while timing, so that the results kept alive do not bias the
+# later cases.
+#
+#   python3 benchmarks/column_transform.py [--values N] [--distinct N]
+#
+
+import      gc
+import      sys
+import      time
+import      random
+import      argparse
+
+from        pfdicom             import  template
+
+l_transform = [
+    ('md5|7',           lambda v: template.md5_transform(v, 7)),
+    ('strmsk|******01', lambda v: template.strmsk_transform(v, '******01')),
+    ('nospc|-',         lambda v: template.nospc_transform(v, '-')),
+]
+
+def column_make(values, distinct):
+    random.seed(0)
+    l_id    = ['%08d %s' % (random.randrange(10 ** 8), random.choice(['A', 'B^C', '']))
+                for i in range(distinct)]
+    return [l_id[random.randrange(distinct)] for i in range(values)]
+
+def main(argv = None):
+    parser  = argparse.ArgumentParser(description = 'column transform benchmark')
+    parser.add_argument('--values',     type = int, default = 1000000)
+    parser.add_argument('--distinct',   type = int, default = 0,
+                        help = 'distinct values (default: all distinct)')
+    args    = parser.parse_args(argv)
+
+    l_value = column_make(args.values, args.distinct or args.values)
+    print('numpy: %s' % ('yes' if template.numpy is not None else 'no'))
+    print('%-20s %12s %12s %8s' % ('transform', 'string/s', 'column/s', 'speedup'))
+    gc.disable()
+    for str_func, fn in l_transform:
+        tic         = time.perf_counter()
+        l_string    = [fn(v) for v in l_value]
+        f_string    = time.perf_counter() - tic
+        tic         = time.perf_counter()
+        l_column    = template.column_transform(l_value, str_func)
+        f_column    = time.perf_counter() - tic
+        if l_string != l_column:
+            print('MISMATCH for %s' % str_func)
+            return 1
+        print('%-20s %12.0f %12.0f %7.1fx' % (str_func, len(l_value) / f_string,
+              len(l_value) / f_column, f_string / f_column))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
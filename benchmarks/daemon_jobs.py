@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+#
+# Benchmark many small runs as separate 'pfdicom' command line
+# invocations (each paying the start-up cost) against the same runs as
+# jobs of one warm 'pfdicom serve' server.
+#
+#   python3 benchmarks/daemon_jobs.py [--jobs J] [--files F]
+#
+
+import      os
+import      sys
+import      json
+import      time
+import      shutil
+import      tempfile
+import      argparse
+import      subprocess
+
+from        pfdicom             import  bench
+
+def cli_run(str_rootDir, str_outputDir, jobs):
+    """
+    <jobs> runs, one command line invocation each.
+    """
+    for i in range(jobs):
+        subprocess.run([sys.executable, '-m', 'pfdicom',
+                        '--inputDir', str_rootDir,
+                        '--outputDir', os.path.join(str_outputDir, str(i)),
+                        '--verbosity', '0'],
+                       stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL, check = True)
+
+def serve_run(str_rootDir, str_outputDir, jobs):
+    """
+    <jobs> runs as the jobs of one server (including its start-up), and
+    the number of them that succeeded.
+    """
+    str_jobs    = ''.join(json.dumps({
+                    'id':           i,
+                    'inputDir':     str_rootDir,
+                    'outputDir':    os.path.join(str_outputDir, str(i))
+                  }) + '\n' for i in range(jobs))
+    p_serve     = subprocess.run([sys.executable, '-m', 'pfdicom', 'serve'],
+                                 input = str_jobs, capture_output = True, text = True)
+    l_record    = [json.loads(l) for l in p_serve.stdout.splitlines()]
+    return sum(1 for d in l_record if d['record'] == 'job' and d['status'])
+
+def main(argv = None):
+    parser  = argparse.ArgumentParser(description = 'job server benchmark')
+    parser.add_argument('--jobs',       type = int, default = 20)
+    parser.add_argument('--files',      type = int, default = 4)
+    args    = parser.parse_args(argv)
+
+    str_rootDir     = tempfile.mkdtemp(prefix = 'pfdicom-jobs-')
+    str_outputDir   = tempfile.mkdtemp(prefix = 'pfdicom-jobs-out-')
+    try:
+        bench.tree_generate(str_rootDir, series = 1, files = args.files)
+        tic         = time.perf_counter()
+        cli_run(str_rootDir, str_outputDir, args.jobs)
+        f_cli       = time.perf_counter() - tic
+        tic         = time.perf_counter()
+        jobsOk      = serve_run(str_rootDir, str_outputDir, args.jobs)
+        f_serve     = time.perf_counter() - tic
+        print('%d runs of a %d file directory' % (args.jobs, args.files))
+        print('%-16s %10s %12s' % ('', 'time (s)', 'per run (ms)'))
+        print('%-16s %10.3f %12.1f' % ('command line', f_cli, 1000 * f_cli / args.jobs))
+        print('%-16s %10.3f %12.1f' % ('pfdicom serve', f_serve, 1000 * f_serve / args.jobs))
+        if jobsOk != args.jobs:
+            print('%d job(s) failed' % (args.jobs - jobsOk))
+    finally:
+        shutil.rmtree(str_rootDir, ignore_errors = True)
+        shutil.rmtree(str_outputDir, ignore_errors = True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+#
+# Benchmark a full tag-extract run over a synthetic tree when every file
+# open costs <latency> seconds (as on a network filesystem), with and
+# without the asynchronous read-ahead of '--io-concurrency'.
+#
+# The baseline reads each file in turn through the same delayed open;
+# the prefetch cases hand the delayed open to the read-ahead pipeline.
+#
+#   python3 benchmarks/io_prefetch.py [--latency S] [--concurrency 1,4,16]
+#
+
+import      os
+import      sys
+import      time
+import      shutil
+import      tempfile
+import      argparse
+
+from        pfdicom             import  bench
+from        pfdicom             import  prefetch
+
+def case_run(str_rootDir, latency, concurrency):
+    """
+    A benchDICOM run over <str_rootDir>, returning (files, seconds).
+    """
+    str_outputDir   = tempfile.mkdtemp(prefix = 'pfdicom-io-out-')
+    fn_open         = prefetch.delayedOpen(latency)
+    try:
+        pf_dicom    = bench.pfdicom_make(
+                        str_rootDir, str_outputDir,
+                        ['--fileFilter', 'dcm', '--io-concurrency', str(concurrency)],
+                        bench.benchDICOM
+                      )
+        if concurrency:
+            pf_dicom.fn_ioOpen  = fn_open
+        else:
+            # Without read-ahead, each file is opened when it is parsed
+            fn_read             = pf_dicom.DICOMfile_read
+            def DICOMfile_read(*args, **kwargs):
+                fn_open(kwargs['file']).close()
+                return fn_read(*args, **kwargs)
+            pf_dicom.DICOMfile_read = DICOMfile_read
+        tic         = time.perf_counter()
+        d_run       = pf_dicom.run()
+        f_time      = time.perf_counter() - tic
+    finally:
+        shutil.rmtree(str_outputDir, ignore_errors = True)
+    return d_run['filesRead'], f_time
+
+def main(argv = None):
+    parser  = argparse.ArgumentParser(description = 'read-ahead benchmark')
+    parser.add_argument('--latency',        type = float, default = 0.005)
+    parser.add_argument('--concurrency',    default = '1,4,16')
+    parser.add_argument('--series',         type = int, default = 8)
+    parser.add_argument('--files',          type = int, default = 16)
+    args    = parser.parse_args(argv)
+
+    str_rootDir = tempfile.mkdtemp(prefix = 'pfdicom-io-')
+    try:
+        bench.tree_generate(str_rootDir, series = args.series, files = args.files)
+        print('open latency: %.3f s' % args.latency)
+        print('%-12s %8s %10s %10s' % ('concurrency', 'files', 'time (s)', 'files/s'))
+        for concurrency in [0] + [int(c) for c in args.concurrency.split(',') if c]:
+            files, f_time   = case_run(str_rootDir, args.latency, concurrency)
+            print('%-12d %8d %10.3f %10.1f' % (concurrency, files, f_time, files / f_time))
+    finally:
+        shutil.rmtree(str_rootDir, ignore_errors = True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
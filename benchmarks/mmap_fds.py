@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+#
+# Check that a '--mmap' run holds no file descriptors for the files it
+# has read: a tree of more files than the RLIMIT_NOFILE soft limit is
+# run (in a child process) with the limit lowered to <limit>, and every
+# file must be read, with none failed, and no more descriptors open at
+# the end than at the start.
+#
+#   python3 benchmarks/mmap_fds.py [--limit N] [--files N] [--stream]
+#
+
+import      os
+import      sys
+import      time
+import      shutil
+import      resource
+import      tempfile
+import      argparse
+
+from        pfdicom             import  bench
+
+def fds_count():
+    """
+    The number of file descriptors this process has open.
+    """
+    return len(os.listdir('/proc/self/fd'))
+
+def run_check(d_tree, limit, l_args):
+    str_outputDir   = tempfile.mkdtemp(prefix = 'pfdicom-fds-out-')
+    try:
+        soft, hard  = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(limit, hard), hard))
+        fds         = fds_count()
+        pf_dicom    = bench.pfdicom_make(d_tree['rootDir'], str_outputDir,
+                                         ['--fileFilter', 'dcm', '--mmap'] + l_args,
+                                         bench.benchDICOM)
+        tic         = time.perf_counter()
+        d_run       = pf_dicom.run()
+        f_time      = time.perf_counter() - tic
+        d_readLog   = pf_dicom.readLog.stats()
+    finally:
+        shutil.rmtree(str_outputDir, ignore_errors = True)
+    return {
+        'status':       d_run['status'],
+        'filesRead':    d_run['filesRead'],
+        'failed':       d_readLog['failed'],
+        'fdsLeaked':    fds_count() - fds
+    }, f_time
+
+def main(argv = None):
+    parser  = argparse.ArgumentParser(description = 'mmap file descriptor check')
+    parser.add_argument('--limit',  type = int, default = 200)
+    parser.add_argument('--files',  type = int, default = 600)
+    parser.add_argument('--stream', action = 'store_true')
+    args    = parser.parse_args(argv)
+
+    if not os.path.isdir('/proc/self/fd'):
+        print('needs /proc/self/fd')
+        return 0
+    str_rootDir = tempfile.mkdtemp(prefix = 'pfdicom-fds-')
+    try:
+        d_tree  = bench.tree_generate(str_rootDir, depth = 0, series = 4,
+                                      files = args.files // 4, tags = 2, rows = 16)
+        d_check, f_time, peakRSS    = bench.case_run(run_check, d_tree, args.limit,
+                                                     ['--stream'] if args.stream else [])
+    finally:
+        shutil.rmtree(str_rootDir, ignore_errors = True)
+    print('files: %d, limit: %d' % (d_tree['files'], args.limit))
+    print('status: %s, read: %d, failed: %d, fds leaked: %d, seconds: %.2f' % (
+          d_check['status'], d_check['filesRead'], d_check['failed'],
+          d_check['fdsLeaked'], f_time))
+    if d_check['failed'] or d_check['filesRead'] != d_tree['files'] or d_check['fdsLeaked'] > 0:
+        print('FAIL')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
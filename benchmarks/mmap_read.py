@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#
+# Benchmark the peak memory of reading a large multi-frame DICOM file
+# and getting at its pixel data, with a buffered pydicom read and with
+# the memory-mapped read path (pfdicom.mmapread).
+#
+# Each mode runs in a fresh process so that its peak RSS can be
+# reported on its own.
+#
+#   python3 benchmarks/mmap_read.py [--frames N] [--rows R]
+#
+
+import      os
+import      sys
+import      time
+import      tempfile
+import      argparse
+import      subprocess
+
+import      pydicom             as      dicom
+from        pydicom.dataset     import  Dataset, FileMetaDataset
+from        pydicom.uid         import  ExplicitVRLittleEndian, generate_uid
+
+def multiframe_write(str_file, frames, rows):
+    """
+    Write a synthetic multi-frame file of <frames> x <rows> x <rows>
+    16 bit pixels.
+    """
+    meta                            = FileMetaDataset()
+    meta.MediaStorageSOPClassUID    = '1.2.840.10008.5.1.4.1.1.4.1'
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID          = ExplicitVRLittleEndian
+
+    ds                              = Dataset()
+    ds.file_meta                    = meta
+    ds.is_little_endian             = True
+    ds.is_implicit_VR               = False
+    ds.SOPClassUID                  = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID               = meta.MediaStorageSOPInstanceUID
+    ds.PatientID                    = '4412364'
+    ds.Modality                     = 'MR'
+    ds.NumberOfFrames               = frames
+    ds.Rows                         = rows
+    ds.Columns                      = rows
+    ds.SamplesPerPixel              = 1
+    ds.PhotometricInterpretation    = 'MONOCHROME2'
+    ds.BitsAllocated                = 16
+    ds.BitsStored                   = 16
+    ds.HighBit                      = 15
+    ds.PixelRepresentation          = 0
+    ds.PixelData                    = os.urandom(frames * rows * rows * 2)
+    ds.save_as(str_file, write_like_original = False)
+
+def peakRSS_get():
+    """
+    The peak RSS (in kB) of this process image. This is read from /proc
+    since getrusage() also counts the parent's RSS from before exec().
+    """
+    with open('/proc/self/status') as fp:
+        for str_line in fp:
+            if str_line.startswith('VmHWM:'):
+                return int(str_line.split()[1])
+    return 0
+
+def mode_run(str_mode, str_file):
+    """
+    Read <str_file> in <str_mode>, touch one byte per page of the first
+    MB of pixel data, and print the time and the peak RSS (in kB).
+    """
+    tic     = time.perf_counter()
+    if str_mode == 'buffered':
+        mv_pixel    = memoryview(dicom.dcmread(str_file).PixelData)
+    else:
+        from pfdicom import mmapread
+        dcm, fn_pixelData   = mmapread.dcm_read(str_file)
+        mv_pixel            = fn_pixelData()
+    checksum    = sum(mv_pixel[0:min(len(mv_pixel), 1 << 20):4096])
+    print('%f %d %d' % (time.perf_counter() - tic,
+                        peakRSS_get(),
+                        checksum))
+
+def main(argv = None):
+    parser  = argparse.ArgumentParser(description = 'mmap read benchmark')
+    parser.add_argument('--frames', type = int, default = 200)
+    parser.add_argument('--rows',   type = int, default = 512)
+    parser.add_argument('--mode',   default = '')
+    parser.add_argument('--file',   default = '')
+    args    = parser.parse_args(argv)
+
+    if args.mode:
+        mode_run(args.mode, args.file)
+        return 0
+
+    with tempfile.TemporaryDirectory() as str_dir:
+        str_file    = os.path.join(str_dir, 'multiframe.dcm')
+        multiframe_write(str_file, args.frames, args.rows)
+        print('file size: %d bytes' % os.path.getsize(str_file))
+        print('%-10s %10s %16s' % ('mode', 'time (s)', 'peak RSS (kB)'))
+        for str_mode in ['buffered', 'mmap']:
+            str_out = subprocess.check_output([
+                sys.executable, __file__, '--mode', str_mode, '--file', str_file
+            ]).decode()
+            f_time, maxrss, checksum    = str_out.split()
+            print('%-10s %10.3f %16s' % (str_mode, float(f_time), maxrss))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
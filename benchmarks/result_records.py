@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+#
+# Benchmark the memory held by the per-file read results of a run: the
+# plain result dictionaries against fileRecords, and fileRecords whose
+# datasets have been dropped (as with '--dropDatasets').
+#
+# <files> reads of a synthetic file are kept, with their tag
+# dictionaries built, and the memory they hold is measured with
+# tracemalloc.
+#
+#   python3 benchmarks/result_records.py [--files F]
+#
+
+import      os
+import      sys
+import      shutil
+import      tempfile
+import      argparse
+import      tracemalloc
+
+from        pfdicom             import  bench
+
+def case_run(pf_dicom, str_file, files, str_case):
+    """
+    The memory (in bytes) held by <files> read results of <str_file>.
+    """
+    tracemalloc.start()
+    l_result    = []
+    for i in range(files):
+        d_read  = pf_dicom.DICOMfile_read(file = str_file)
+        d_read['d_DICOM']['d_json']
+        if str_case == 'dict':
+            d_read  = d_read.toDict()
+        if str_case == 'dropped':
+            d_read.heavy_drop()
+        l_result.append(d_read)
+    size, peak  = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+def main(argv = None):
+    parser  = argparse.ArgumentParser(description = 'result record benchmark')
+    parser.add_argument('--files',      type = int, default = 2000)
+    args    = parser.parse_args(argv)
+
+    str_rootDir     = tempfile.mkdtemp(prefix = 'pfdicom-rec-')
+    str_outputDir   = tempfile.mkdtemp(prefix = 'pfdicom-rec-out-')
+    try:
+        bench.tree_generate(str_rootDir, series = 1, files = 1)
+        str_file    = [os.path.join(d, f) for d, l_dir, l_file in os.walk(str_rootDir)
+                        for f in l_file][0]
+        pf_dicom    = bench.pfdicom_make(str_rootDir, str_outputDir,
+                                         ['--fileFilter', 'dcm'], bench.benchDICOM)
+        print('%-10s %12s %14s' % ('results', 'MB', 'bytes per file'))
+        for str_case in ['dict', 'record', 'dropped']:
+            size    = case_run(pf_dicom, str_file, args.files, str_case)
+            print('%-10s %12.1f %14d' % (str_case, size / 1e6, size / args.files))
+    finally:
+        shutil.rmtree(str_rootDir, ignore_errors = True)
+        shutil.rmtree(str_outputDir, ignore_errors = True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
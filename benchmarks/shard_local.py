@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+#
+# Run a tag-extract over a synthetic tree as <shards> separate shard
+# processes on this machine ('--shard i/N'), merge their result files as
+# 'pfdicom merge' does, and check the merge against a single-node run.
+#
+#   python3 benchmarks/shard_local.py [--shards N] [--shardBy hash|size]
+#
+
+import      os
+import      sys
+import      time
+import      shutil
+import      tempfile
+import      json
+import      argparse
+import      subprocess
+
+from        pfdicom             import  bench
+from        pfdicom             import  shard
+
+# One shard (or, without a shard, the single-node run) in its own process
+str_shardRun    = """
+import sys, json
+from pfdicom import bench
+pf_dicom    = bench.pfdicom_make(sys.argv[1], sys.argv[2],
+                                 ['--fileFilter', 'dcm'] + sys.argv[3:], bench.benchDICOM)
+d_ret       = pf_dicom.run()
+print(json.dumps(d_ret, default = str))
+"""
+
+l_compareKey    = ['status', 'fileSetsProcessed', 'filesRead', 'filesAnalyzed', 'filesSaved']
+
+def process_run(str_rootDir, str_outputDir, l_args):
+    return subprocess.Popen([sys.executable, '-c', str_shardRun,
+                             str_rootDir, str_outputDir] + l_args,
+                            stdout = subprocess.PIPE)
+
+def main(argv = None):
+    parser  = argparse.ArgumentParser(description = 'local sharded run')
+    parser.add_argument('--shards',     type = int, default = 4)
+    parser.add_argument('--shardBy',    default = 'hash')
+    parser.add_argument('--series',     type = int, default = 16)
+    parser.add_argument('--files',      type = int, default = 16)
+    args    = parser.parse_args(argv)
+
+    str_rootDir     = tempfile.mkdtemp(prefix = 'pfdicom-shard-')
+    str_singleDir   = tempfile.mkdtemp(prefix = 'pfdicom-shard-single-')
+    str_shardDir    = tempfile.mkdtemp(prefix = 'pfdicom-shard-out-')
+    try:
+        bench.tree_generate(str_rootDir, series = args.series, files = args.files)
+
+        tic         = time.perf_counter()
+        str_out, e  = process_run(str_rootDir, str_singleDir, []).communicate()
+        f_single    = time.perf_counter() - tic
+        d_single    = json.loads(str_out.decode().strip().splitlines()[-1])
+
+        tic         = time.perf_counter()
+        l_process   = [process_run(str_rootDir, str_shardDir,
+                                   ['--shard', '%d/%d' % (i, args.shards),
+                                    '--shardBy', args.shardBy])
+                        for i in range(1, args.shards + 1)]
+        for p in l_process:
+            p.communicate()
+        f_shards    = time.perf_counter() - tic
+
+        l_file      = shard.files_find([str_shardDir])
+        d_merge     = shard.merge(l_file)
+        l_dirs      = [json.load(open(f))['d_shard']['dirs'] for f in l_file]
+        print('single run: %.3f s, %d shards: %.3f s' % (f_single, args.shards, f_shards))
+        print('directories per shard: %s' % l_dirs)
+        print('%-20s %10s %10s' % ('', 'single', 'merged'))
+        for k in l_compareKey:
+            print('%-20s %10s %10s' % (k, d_single.get(k), d_merge.get(k)))
+        l_single    = sorted(os.path.relpath(os.path.join(d, f), str_singleDir)
+                             for d, l_d, l_f in os.walk(str_singleDir) for f in l_f)
+        l_shard     = sorted(os.path.relpath(os.path.join(d, f), str_shardDir)
+                             for d, l_d, l_f in os.walk(str_shardDir) for f in l_f
+                                if not f.startswith('pfdicom-shard-'))
+        print('same output files as the single run: %s' % (l_single == l_shard))
+    finally:
+        for str_dir in [str_rootDir, str_singleDir, str_shardDir]:
+            shutil.rmtree(str_dir, ignore_errors = True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
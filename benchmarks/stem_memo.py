@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+#
+# Micro-benchmark of output file stem memoization: evaluating a set of
+# typical templates over the files of a few series, with the stem memo
+# (the default) and without it (--stemMemoSize 0). The stems of the two
+# are also checked to be identical, and the hit rate is reported.
+#
+#   python3 benchmarks/stem_memo.py [--series N] [--files N]
+#
+
+import      sys
+import      time
+import      argparse
+
+from        pydicom.dataset     import  Dataset
+
+from        pfdicom             import  pfdicom
+from        pfdicom.dicommap    import  DICOMmap
+from        pfdicom.__main__    import  parserSA
+
+l_template  = [
+    '%PatientID-%StudyDate-%_md5|8_AccessionNumber',
+    '%_md5|7_PatientID-%_strmsk|******01_PatientBirthDate-%Modality',
+    '%_nospc|-_SeriesDescription-%ProtocolName.dcm',
+    '%_name|patientID_PatientName-%_md5|4_PatientID-%StudyDate-output.txt',
+]
+
+def dataset_make(series, instance):
+    """
+    The header of file <instance> of series <series>.
+    """
+    ds                      = Dataset()
+    ds.PatientName          = 'Doe^John'
+    ds.PatientID            = '4412364'
+    ds.PatientBirthDate     = '20140317'
+    ds.AccessionNumber      = '2268148%d' % series
+    ds.StudyDate            = '20200101'
+    ds.Modality             = 'MR'
+    ds.SeriesDescription    = 'AX T1 MPRAGE %d' % series
+    ds.ProtocolName         = 'T1 MPRAGE'
+    ds.InstanceNumber       = instance
+    return ds
+
+def pfdicom_make(l_args):
+    d_args      = vars(parserSA.parse_args(['--inputDir', '.', '--verbosity', '0'] + l_args))
+    d_args['str_desc']  = ''
+    return pfdicom.pfdicom(d_args)
+
+def stems_make(pf_dicom, l_DICOM, astr):
+    tic     = time.perf_counter()
+    l_stem  = [pf_dicom.tagsInString_process(d_DICOM, astr)['str_result']
+               for d_DICOM in l_DICOM]
+    return time.perf_counter() - tic, l_stem
+
+def main(argv = None):
+    parser  = argparse.ArgumentParser(description = 'stem memo benchmark')
+    parser.add_argument('--series', type = int, default = 8)
+    parser.add_argument('--files',  type = int, default = 500)
+    args    = parser.parse_args(argv)
+
+    l_DICOM     = []
+    for series in range(args.series):
+        for instance in range(args.files):
+            ds  = dataset_make(series, instance)
+            l_DICOM.append(DICOMmap(ds, l_tagsToUse = ds.dir()))
+
+    print('%-72s %10s %10s %8s %8s' % ('template', 'plain/s', 'memo/s', 'speedup', 'hitRate'))
+    for astr in l_template:
+        pf_plain    = pfdicom_make(['--stemMemoSize', '0'])
+        pf_memo     = pfdicom_make([])
+        f_plain, l_plain    = stems_make(pf_plain, l_DICOM, astr)
+        f_memo, l_memo      = stems_make(pf_memo, l_DICOM, astr)
+        if l_plain != l_memo:
+            print('MISMATCH for %s' % astr)
+            return 1
+        print('%-72s %10.0f %10.0f %7.1fx %8.3f' % (astr,
+              len(l_DICOM) / f_plain, len(l_DICOM) / f_memo, f_plain / f_memo,
+              pf_memo.stemMemo.stats()['hitRate']))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+#
+# Benchmark the memory held by the tree walk: a run that walks the whole
+# input tree first (the default) against a '--stream' run, which walks
+# and processes it a directory at a time.
+#
+# A tree of <dirs> directories of <files> (empty) files each is run
+# through a tool whose callbacks only count the files, so that the peak
+# RSS of each run (in a child process of its own) is what its tree walk
+# and result trees hold.
+#
+#   python3 benchmarks/stream_memory.py [--dirs D] [--files F]
+#
+
+import      os
+import      sys
+import      time
+import      shutil
+import      tempfile
+import      argparse
+
+from        pfdicom             import  bench
+from        pfdicom             import  pfdicom
+
+class countDICOM(pfdicom.pfdicom):
+    """
+    A tool that reads nothing: its callbacks count the files.
+    """
+
+    def inputReadCallback(self, *args, **kwargs):
+        str_path, l_file    = args[0]
+        return {
+            'status':       True,
+            'l_file':       l_file,
+            'filesRead':    len(l_file)
+        }
+
+    def inputAnalyzeFile(self, *args, **kwargs):
+        str_path, d_read    = args[0]
+        return {
+            'status':       True,
+            'filesAnalyzed':len(d_read['l_file'])
+        }
+
+    def run(self, *args, **kwargs):
+        super().run(JSONprint = False, timerStart = False)
+        return self.tree_process(
+            inputReadCallback       = self.inputReadCallback,
+            analysisCallback        = self.inputAnalyzeFile,
+            persistAnalysisResults  = False
+        )
+
+def tree_make(str_rootDir, dirs, files):
+    for i in range(dirs):
+        str_dir     = os.path.join(str_rootDir, 'study-%04d' % (i // 100),
+                                   'series-%06d' % i)
+        os.makedirs(str_dir)
+        for j in range(files):
+            open(os.path.join(str_dir, 'image-%06d.dcm' % j), 'w').close()
+
+def run_bench(str_rootDir, str_outputDir, l_args):
+    pf_dicom    = bench.pfdicom_make(str_rootDir, str_outputDir, l_args, countDICOM)
+    tic         = time.perf_counter()
+    d_run       = pf_dicom.run()
+    return d_run['filesRead'], time.perf_counter() - tic
+
+def main(argv = None):
+    parser  = argparse.ArgumentParser(description = 'streaming walk benchmark')
+    parser.add_argument('--dirs',   type = int, default = 2000)
+    parser.add_argument('--files',  type = int, default = 100)
+    args    = parser.parse_args(argv)
+
+    str_rootDir     = tempfile.mkdtemp(prefix = 'pfdicom-stream-')
+    str_outputDir   = tempfile.mkdtemp(prefix = 'pfdicom-stream-out-')
+    try:
+        tree_make(str_rootDir, args.dirs, args.files)
+        print('%-10s %10s %10s %14s' % ('walk', 'files', 'seconds', 'peak RSS MB'))
+        for str_case, l_args in [('tree',   ['--fileFilter', 'dcm']),
+                                 ('stream', ['--fileFilter', 'dcm', '--stream'])]:
+            files, f_time, peakRSS  = bench.case_run(run_bench, str_rootDir,
+                                                     str_outputDir, l_args)
+            print('%-10s %10d %10.2f %14.1f' % (str_case, files, f_time, peakRSS / 1e3))
+    finally:
+        shutil.rmtree(str_rootDir, ignore_errors = True)
+        shutil.rmtree(str_outputDir, ignore_errors = True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+#
+# Benchmark the cost of a typical tag-extract read of a DICOM series
+# with and without the 'headerOnly' read mode.
+#
+# A synthetic series is written to a temporary directory, and each file
+# is then read the way pfdicom.DICOMfile_read reads it. For each mode the
+# wall time and the number of bytes actually consumed from the files
+# are reported.
+#
+#   python3 benchmarks/tagExtract_headerOnly.py [--files N] [--rows R]
+#
+
+import      os
+import      sys
+import      time
+import      tempfile
+import      argparse
+
+import      pydicom             as      dicom
+from        pydicom.dataset     import  Dataset, FileMetaDataset
+from        pydicom.uid         import  ExplicitVRLittleEndian, generate_uid
+
+l_tagsToUse = ['PatientID', 'PatientAge', 'StudyDate', 'Modality',
+               'SeriesDescription', 'SeriesInstanceUID']
+
+def series_write(str_dir, files, rows):
+    """
+    Write a synthetic single-frame CT-like series of <files> slices,
+    each <rows> x <rows> 16 bit pixels.
+    """
+    str_seriesUID   = generate_uid()
+    for i in range(files):
+        meta                            = FileMetaDataset()
+        meta.MediaStorageSOPClassUID    = '1.2.840.10008.5.1.4.1.1.2'
+        meta.MediaStorageSOPInstanceUID = generate_uid()
+        meta.TransferSyntaxUID          = ExplicitVRLittleEndian
+
+        ds                              = Dataset()
+        ds.file_meta                    = meta
+        ds.is_little_endian             = True
+        ds.is_implicit_VR               = False
+        ds.SOPClassUID                  = meta.MediaStorageSOPClassUID
+        ds.SOPInstanceUID               = meta.MediaStorageSOPInstanceUID
+        ds.PatientName                  = 'Doe^John'
+        ds.PatientID                    = '4412364'
+        ds.PatientAge                   = '006Y'
+        ds.StudyDate                    = '20200101'
+        ds.Modality                     = 'CT'
+        ds.SeriesDescription            = 'AX BRAIN'
+        ds.SeriesInstanceUID            = str_seriesUID
+        ds.InstanceNumber               = i + 1
+        ds.Rows                         = rows
+        ds.Columns                      = rows
+        ds.SamplesPerPixel              = 1
+        ds.PhotometricInterpretation    = 'MONOCHROME2'
+        ds.BitsAllocated                = 16
+        ds.BitsStored                   = 16
+        ds.HighBit                      = 15
+        ds.PixelRepresentation          = 0
+        ds.PixelData                    = os.urandom(rows * rows * 2)
+        ds.save_as(os.path.join(str_dir, 'slice-%04d.dcm' % i),
+                   write_like_original = False)
+
+def series_read(str_dir, **kwargs):
+    """
+    Read (and touch the tags of) every file in <str_dir>, returning
+    the elapsed time and the total number of bytes consumed.
+    """
+    bytesRead   = 0
+    tic         = time.perf_counter()
+    for str_file in sorted(os.listdir(str_dir)):
+        with open(os.path.join(str_dir, str_file), 'rb') as fp:
+            dcm         = dicom.read_file(fp, **kwargs)
+            bytesRead   += fp.tell()
+        for key in l_tagsToUse:
+            str(getattr(dcm, key))
+    return time.perf_counter() - tic, bytesRead
+
+def main(argv = None):
+    parser  = argparse.ArgumentParser(description = 'headerOnly read benchmark')
+    parser.add_argument('--files',  type = int, default = 200)
+    parser.add_argument('--rows',   type = int, default = 512)
+    args    = parser.parse_args(argv)
+
+    d_modes = {
+        'full':             {},
+        'headerOnly':       {'stop_before_pixels':  True},
+        'headerOnly+tags':  {'stop_before_pixels':  True,
+                             'specific_tags':       l_tagsToUse}
+    }
+
+    with tempfile.TemporaryDirectory() as str_dir:
+        series_write(str_dir, args.files, args.rows)
+        print('%-16s %10s %14s %10s' % ('mode', 'time (s)', 'bytes read', 'files/s'))
+        for str_mode, d_readArgs in d_modes.items():
+            f_time, bytesRead   = series_read(str_dir, **d_readArgs)
+            print('%-16s %10.3f %14d %10.1f' %
+                  (str_mode, f_time, bytesRead, args.files / f_time))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
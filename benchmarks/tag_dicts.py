@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+#
+# Benchmark building the per-tag dictionaries ('d_dicom', 'd_dicomSimple'
+# and 'd_json') of a DICOMmap for files with many elements.
+#
+# A synthetic dataset with <elements> standard (keyword) elements is
+# written and read back, and the three dictionaries are then built for
+# each of <files> fresh reads of it.
+#
+#   python3 benchmarks/tag_dicts.py [--elements N] [--files F]
+#
+
+import      os
+import      sys
+import      time
+import      tempfile
+import      argparse
+
+import      pydicom             as      dicom
+from        pydicom.dataset     import  Dataset, FileMetaDataset
+from        pydicom.uid         import  ExplicitVRLittleEndian, generate_uid
+
+from        pfdicom.dicommap    import  DICOMmap
+
+# VRs whose values are easy to make up
+d_valueVR   = {
+    'LO': 'value', 'SH': 'value', 'CS': 'VALUE', 'LT': 'some text',
+    'DS': '1.5', 'IS': '7', 'DA': '20200101', 'TM': '120000',
+    'US': 7, 'UL': 7, 'FL': 1.5, 'FD': 1.5, 'PN': 'Doe^John'
+}
+
+def dataset_write(str_file, elements):
+    """
+    Write a dataset with (at least) <elements> single valued elements.
+    """
+    meta                            = FileMetaDataset()
+    meta.MediaStorageSOPClassUID    = '1.2.840.10008.5.1.4.1.1.4'
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID          = ExplicitVRLittleEndian
+    ds                              = Dataset()
+    ds.file_meta                    = meta
+    ds.is_little_endian             = True
+    ds.is_implicit_VR               = False
+    n       = 0
+    for tag, t_entry in sorted(dicom.datadict.DicomDictionary.items()):
+        VR, VM, name, retired, keyword  = t_entry
+        if n >= elements or tag >> 16 < 0x0008 or tag >> 16 >= 0x7fe0:
+            continue
+        if retired or VM != '1' or VR not in d_valueVR or not keyword:
+            continue
+        ds.add_new(tag, VR, d_valueVR[VR])
+        n       += 1
+    ds.save_as(str_file, write_like_original = False)
+    return n
+
+def main(argv = None):
+    parser  = argparse.ArgumentParser(description = 'tag dictionary benchmark')
+    parser.add_argument('--elements',   type = int, default = 400)
+    parser.add_argument('--files',      type = int, default = 200)
+    args    = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as str_dir:
+        str_file    = os.path.join(str_dir, 'many.dcm')
+        n           = dataset_write(str_file, args.elements)
+        l_dcm       = [dicom.dcmread(str_file) for i in range(args.files)]
+        tic         = time.perf_counter()
+        for dcm in l_dcm:
+            d_DICOM = DICOMmap(dcm)
+            d_DICOM['d_dicom'], d_DICOM['d_dicomSimple'], d_DICOM['d_json']
+        f_time      = time.perf_counter() - tic
+    print('%d elements, %d files: %.3f s (%.2f ms per file)' %
+          (n, args.files, f_time, 1000 * f_time / args.files))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
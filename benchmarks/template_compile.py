@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+#
+# Micro-benchmark of output file stem templating: the original string
+# interpreter (pfdicom.tagsInString_interpret) against the compiled
+# template (pfdicom.tagsInString_process) on a set of typical templates.
+# Results of the two are also checked to be identical.
+#
+#   python3 benchmarks/template_compile.py [--repeat N]
+#
+
+import      sys
+import      time
+import      argparse
+
+from        pydicom.dataset     import  Dataset
+
+from        pfdicom             import  pfdicom
+from        pfdicom.dicommap    import  DICOMmap
+from        pfdicom.__main__    import  parserSA
+
+l_template  = [
+    '%PatientID-%PatientAge',
+    '%PatientID-%StudyDate-%_md5|8_AccessionNumber',
+    '%_md5|7_PatientID-%_strmsk|******01_PatientBirthDate-%Modality',
+    '%_nospc|-_SeriesDescription-%ProtocolName.dcm',
+    '%_name|patientID_PatientName-%_md5|4_PatientID-%StudyDate-output.txt',
+]
+
+def dataset_make():
+    """
+    A header with a realistic number of elements.
+    """
+    ds                      = Dataset()
+    ds.PatientName          = 'Doe^John'
+    ds.PatientID            = '4412364'
+    ds.PatientAge           = '006Y'
+    ds.PatientBirthDate     = '20140317'
+    ds.AccessionNumber      = '22681485'
+    ds.StudyDate            = '20200101'
+    ds.Modality             = 'MR'
+    ds.SeriesDescription    = 'AX T1 MPRAGE (post)'
+    ds.ProtocolName         = 'T1 MPRAGE'
+    for i in range(1, 300):
+        ds.add_new((0x0019, 0x1000 + i), 'LO', 'private %d' % i)
+    return ds
+
+def timeit(fn, repeat):
+    tic     = time.perf_counter()
+    for i in range(repeat):
+        d_ret   = fn()
+    return time.perf_counter() - tic, d_ret
+
+def main(argv = None):
+    parser  = argparse.ArgumentParser(description = 'template compile benchmark')
+    parser.add_argument('--repeat', type = int, default = 20000)
+    args    = parser.parse_args(argv)
+
+    d_args      = vars(parserSA.parse_args(['--inputDir', '.', '--verbosity', '0']))
+    d_args['str_desc']  = ''
+    pf_dicom    = pfdicom.pfdicom(d_args)
+    ds          = dataset_make()
+    d_DICOM     = DICOMmap(ds, l_tagsToUse = ds.dir())
+    d_DICOM['l_tagRaw']
+
+    print('%-72s %10s %10s %8s' % ('template', 'interp/s', 'compiled/s', 'speedup'))
+    for astr in l_template:
+        f_interp, d_interp  = timeit(
+            lambda: pf_dicom.tagsInString_interpret(d_DICOM, astr), args.repeat)
+        f_comp, d_comp      = timeit(
+            lambda: pf_dicom.tagsInString_process(d_DICOM, astr), args.repeat)
+        if d_interp != d_comp:
+            print('MISMATCH for %s: %s != %s' % (astr, d_interp, d_comp))
+            return 1
+        print('%-72s %10.0f %10.0f %7.1fx' % (astr,
+              args.repeat / f_interp, args.repeat / f_comp, f_interp / f_comp))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
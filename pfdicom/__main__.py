@@ -8,19 +8,21 @@
 #
 
 import sys, os
+import json
 # sys.path.insert(1, os.path.join(os.path.dirname(__file__), '../pfdicom'))
 
 try:
     from    .               import pfdicom
+    from    .               import shard
     from    .               import __pkg, __version__
 except:
     from pfdicom            import pfdicom
+    import                         shard
     from __init__           import __pkg, __version__
 
 
 from    argparse            import RawTextHelpFormatter
 from    argparse            import ArgumentParser
-import  pudb
 
 import  pfmisc
 from    pfmisc._colors      import Colors
@@ -62,11 +64,171 @@ str_desc = Colors.CYAN + """
 """ + Colors.NO_COLOUR
 
 package_CLIself = '''
-        [--outputFileStem <stem>]                                               \\'''
+        [--outputFileStem <stem>]                                               \\
+        [--stemMemoSize <N>]                                                    \\
+        [--nameTable]                                                           \\
+        [--headerOnly]                                                          \\
+        [--mmap]                                                                \\
+        [--dropDatasets]                                                        \\
+        [--io-concurrency <N>]                                                  \\
+        [--seriesLevel]                                                         \\
+        [--seriesSpotCheck <fraction>]                                          \\
+        [--executor {thread,process}]                                           \\
+        [--workers <numWorkers>]                                                \\
+        [--stream]                                                              \\
+        [--cacheDir <cacheDir>]                                                 \\
+        [--cacheMaxEntries <N>]                                                 \\
+        [--incremental]                                                         \\
+        [--json-stream]                                                         \\
+        [--profile]                                                             \\
+        [--profileExport <file>]                                                \\
+        [--tagExport <file>]                                                    \\
+        [--exportTags <tag,tag,...>]                                            \\
+        [--shard <i>/<N>]                                                       \\
+        [--shardBy {hash,size}]                                                 \\'''
 
 package_argSynopsisSelf = """
         [--outputFileStem <stem>]
-        An output file stem pattern to use."""
+        An output file stem pattern to use.
+
+        [--stemMemoSize <N>]
+        The number of evaluated output file stems to remember (default
+        4096), keyed on the tag values the <outputFileStem> uses, so that
+        files with the same values (typically all the files of a series)
+        only evaluate it once. The hits, misses and hit rate are returned
+        as 'd_stemMemo'. 0 turns it off.
+
+        [--nameTable]
+        If specified, make the '%_name' pseudonyms from a table of faker's
+        first and last names, indexed by a hash of the seed. This is faster
+        than the default of seeding faker for each name, but gives other
+        names for the same seed than the default (and than earlier
+        versions), so trees pseudonymized with and without it do not link.
+
+        [--headerOnly]
+        If specified, only parse DICOM headers: reading stops before the
+        PixelData element, and if the caller restricts the tags to use,
+        only those tags (and the tags the output file stem needs) are
+        parsed.
+
+        [--mmap]
+        If specified, memory-map each DICOM file and parse its header from
+        the map. The dataset is read without its pixel data, which derived
+        classes can access as a zero-copy view of the file instead.
+
+        [--dropDatasets]
+        If specified, once the analysis of a directory is done, drop the
+        pydicom datasets of its files (and the 'd_dcm' and 'strRaw' built
+        from them). Only the tag dictionaries of each file are kept until
+        the end of the run, which bounds memory on very large trees. Output
+        callbacks then cannot use the datasets.
+
+        [--io-concurrency <N>]
+        If specified (and not 0), read up to <N> files ahead concurrently
+        while earlier files are being parsed, which mostly helps on network
+        filesystems where open/read latency dominates. Files of the next
+        few directories are read ahead too (only the current directory's
+        with '--executor process'). The read-ahead buffer holds at most
+        2 x <N> files. Not used with '--mmap'.
+
+        [--seriesLevel]
+        If specified, read one representative file per series (by
+        SeriesInstanceUID) per directory in full. For the other files of
+        the series only the tags up to the end of group 0020 (patient, study,
+        series and instance identifiers) are parsed, and the series tags
+        after it (the image pixel description and a few others, see
+        series.py) are taken from the representative. Any other tag is read
+        from the file itself, which parses the rest of it: this only saves
+        time for tools that need no tags beyond those.
+
+        [--seriesSpotCheck <fraction>]
+        In series-level mode, also read this fraction (0..1) of the files in
+        full and check them against their representative. A series that
+        fails the check is read file by file.
+
+        [--executor {thread,process}]
+        The backend used to process the tree. With 'thread' (the default)
+        only the analysis step is threaded, and since DICOM parsing holds
+        the GIL this gives little speedup. With 'process' whole directories
+        (read, analysis and write) are processed by a pool of worker
+        processes, which scales with the number of CPUs.
+
+        [--workers <numWorkers>]
+        The number of threads or worker processes for the <executor>. For
+        the process executor this defaults to the number of CPUs.
+
+        [--stream]
+        If specified, do not walk the whole input tree before processing
+        it: walk it a directory at a time, and process (and let go of) each
+        directory as it is found, so that memory is in the order of the
+        largest directory rather than of the whole tree. The analysis is
+        then not threaded, and a sharded run can only split by 'hash'.
+
+        [--cacheDir <cacheDir>]
+        If specified, keep a persistent index of the tags of every DICOM file
+        read in an SQLite database in <cacheDir>. On later runs, files whose
+        path, mtime, size and inode are unchanged are served from the index
+        and only opened if the full dataset is actually needed. The index
+        holds the tag values as JSON data (never code), decoded to the
+        pydicom types a parse gives. As the inode is part of the key, a
+        copy of the files (or of the index) never hits.
+
+        [--cacheMaxEntries <N>]
+        If non-zero, after processing the tree drop index entries of files that no
+        longer exist and keep only the <N> most recently stored entries.
+
+        [--incremental]
+        If specified, record a manifest of the run (the fingerprint of every
+        input file and its output file stem) in <outputDir>, and on a later
+        run with the same settings skip all processing of the input
+        directories whose files are unchanged. Directories whose output
+        failed to write are processed again. All the arguments, except
+        those that only change how the run is executed (threads,
+        executor, workers, profiling, sharding, ...), are settings.
+
+        [--json-stream]
+        If specified, write results to stdout as NDJSON while the run goes
+        on: one compact record for each directory as soon as it has been
+        processed, and a final 'summary' record with the run results.
+
+        [--profile]
+        If specified, time each stage of the run (tree walk, file open,
+        header parse, tag extraction, 'strRaw' conversion, template
+        evaluation and the read/analysis/write callbacks) and return the
+        counts, total and percentile (p50/p95/p99) times and bytes read of
+        each as 'd_profile'.
+
+        [--profileExport <file>]
+        Also write the profile to <file>: in the Prometheus text format if
+        <file> ends in '.prom', otherwise as JSON. Implies --profile.
+
+        [--tagExport <file>]
+        Also write the tags of every file read into a columnar <file>: in
+        the Arrow IPC format if <file> ends in '.arrow', '.feather' or
+        '.ipc', otherwise as Parquet. Each directory is one row group, and
+        tag columns are typed (date, integer, float or string) from their
+        DICOM VR. The columns are all the tags of all the files read (a
+        tag a file does not have is null), unless --exportTags lists them.
+        Needs pyarrow.
+
+        [--exportTags <tag,tag,...>]
+        The tag columns of the --tagExport file. Other tags are not
+        exported, and are listed in its 'l_tagsDropped'.
+
+        [--shard <i>/<N>]
+        If specified, only process shard <i> (1..<N>) of the input tree's
+        directories, so that <N> runs, for example on <N> machines, split
+        one tree between them. Each shard writes its results to
+        'pfdicom-shard-<i>-of-<N>.json' in <outputDir>, and
+        'pfdicom merge <file|dir> ...' combines these into the results of a
+        single run. The files each shard writes on its own (manifest,
+        profile and tag export) get a '.shard-<i>-of-<N>' suffix.
+
+        [--shardBy {hash,size}]
+        How the directories are split between shards: by a hash of their
+        path relative to <inputDir> ('hash', the default), which keeps a
+        directory in the same shard as the tree grows, or balanced by their
+        size on disk ('size')."""
 
 package_tagProcessingHelp   = """
 
@@ -182,6 +344,102 @@ parserSelf.add_argument("--outputFileStem",
                     help    = "output file",
                     default = "",
                     dest    = 'outputFileStem')
+parserSelf.add_argument("--stemMemoSize",
+                    help    = "number of evaluated output file stems to remember",
+                    dest    = 'stemMemoSize',
+                    default = "4096")
+parserSelf.add_argument("--nameTable",
+                    help    = "make '%%_name' pseudonyms from the hashed name table",
+                    dest    = 'nameTable',
+                    action  = 'store_true',
+                    default = False)
+parserSelf.add_argument("--headerOnly",
+                    help    = "only parse DICOM headers, never read PixelData",
+                    dest    = 'headerOnly',
+                    action  = 'store_true',
+                    default = False)
+parserSelf.add_argument("--mmap",
+                    help    = "parse DICOM headers from a memory map of each file",
+                    dest    = 'mmap',
+                    action  = 'store_true',
+                    default = False)
+parserSelf.add_argument("--dropDatasets",
+                    help    = "drop the pydicom datasets of a directory once it is analyzed",
+                    dest    = 'dropDatasets',
+                    action  = 'store_true',
+                    default = False)
+parserSelf.add_argument("--io-concurrency",
+                    help    = "number of files to read ahead concurrently",
+                    dest    = 'ioConcurrency',
+                    default = "0")
+parserSelf.add_argument("--seriesLevel",
+                    help    = "read one representative header per series",
+                    dest    = 'seriesLevel',
+                    action  = 'store_true',
+                    default = False)
+parserSelf.add_argument("--seriesSpotCheck",
+                    help    = "fraction of series-level files to check in full",
+                    dest    = 'seriesSpotCheck',
+                    default = "0")
+parserSelf.add_argument("--executor",
+                    help    = "tree processing backend",
+                    dest    = 'executor',
+                    choices = ['thread', 'process'],
+                    default = 'thread')
+parserSelf.add_argument("--workers",
+                    help    = "number of threads/worker processes for the executor",
+                    dest    = 'workers',
+                    default = "0")
+parserSelf.add_argument("--stream",
+                    help    = "walk and process the input tree a directory at a time",
+                    dest    = 'stream',
+                    action  = 'store_true',
+                    default = False)
+parserSelf.add_argument("--cacheDir",
+                    help    = "directory of the persistent tag index",
+                    dest    = 'cacheDir',
+                    default = "")
+parserSelf.add_argument("--cacheMaxEntries",
+                    help    = "maximum number of tag index entries to keep",
+                    dest    = 'cacheMaxEntries',
+                    default = "0")
+parserSelf.add_argument("--incremental",
+                    help    = "only process directories that changed since the last run",
+                    dest    = 'incremental',
+                    action  = 'store_true',
+                    default = False)
+parserSelf.add_argument("--json-stream",
+                    help    = "stream results as NDJSON records",
+                    dest    = 'jsonStream',
+                    action  = 'store_true',
+                    default = False)
+parserSelf.add_argument("--profile",
+                    help    = "time each stage of the run",
+                    dest    = 'profile',
+                    action  = 'store_true',
+                    default = False)
+parserSelf.add_argument("--profileExport",
+                    help    = "file to export the profile to (.prom or JSON)",
+                    dest    = 'profileExport',
+                    default = "")
+parserSelf.add_argument("--tagExport",
+                    help    = "columnar file to export the tags read to (Parquet or .arrow)",
+                    dest    = 'tagExport',
+                    default = "")
+parserSelf.add_argument("--exportTags",
+                    help    = "comma separated tag columns of the --tagExport file",
+                    dest    = 'exportTags',
+                    default = "")
+
+parserSelf.add_argument("--shard",
+                    help    = "only process shard <i>/<N> of the input tree",
+                    dest    = 'shard',
+                    default = "")
+parserSelf.add_argument("--shardBy",
+                    help    = "how the tree is split into shards",
+                    dest    = 'shardBy',
+                    choices = ['hash', 'size'],
+                    default = 'hash')
 
 parserSA    = ArgumentParser(description        = str_desc,
                              formatter_class    = RawTextHelpFormatter,
@@ -207,9 +465,73 @@ def earlyExit_check(args) -> int:
         return 1
     return 0
 
+parserMerge = ArgumentParser(prog               = 'pfdicom merge',
+                             description        = 'Combine the shard result files of a sharded run')
+parserMerge.add_argument("l_shardFile",
+                    help    = "shard result files, or directories that hold them",
+                    nargs   = '+')
+parserMerge.add_argument("--output",
+                    help    = "file to write the merged results to (default: stdout)",
+                    dest    = 'output',
+                    default = "")
+
+def merge_main(argv) -> int:
+    """The 'pfdicom merge' subcommand: combine the shard result files
+    of a '--shard <i>/<N>' run into the results of a single run.
+    """
+    args    = parserMerge.parse_args(argv)
+    d_ret   = shard.merge(shard.files_find(args.l_shardFile))
+    str_ret = json.dumps(d_ret, indent = 4, sort_keys = True, default = str)
+    if len(args.output):
+        with open(args.output, 'w') as fp:
+            fp.write(str_ret + '\n')
+    else:
+        print(str_ret)
+    if d_ret.get('d_shards', {}).get('l_missing'):
+        print('Missing shard(s): %s' % d_ret['d_shards']['l_missing'], file = sys.stderr)
+    if d_ret.get('d_shards', {}).get('l_duplicate'):
+        print('Shard(s) given more than once: %s' % d_ret['d_shards']['l_duplicate'],
+              file = sys.stderr)
+    return 0 if d_ret['status'] else 1
+
+parserServe = ArgumentParser(prog               = 'pfdicom serve',
+                             description        = 'Serve NDJSON pfdicom jobs from stdin or a Unix socket')
+parserServe.add_argument("--socket",
+                    help    = "Unix socket to serve jobs on (default: stdin/stdout)",
+                    dest    = 'socket',
+                    default = "")
+parserServe.add_argument("--class",
+                    help    = "the tool class that runs the jobs, as <module>:<class>",
+                    dest    = 'cls',
+                    default = "pfdicom.pfdicom:pfdicom")
+
+def serve_main(argv, cls = None, parser = None) -> int:
+    """The 'pfdicom serve' subcommand: run jobs in a long-running,
+    warm server (see daemon.py). Derived tools pass their own <cls> and
+    argument <parser>.
+    """
+    try:
+        from    .           import daemon
+    except:
+        import                     daemon
+    args    = parserServe.parse_args(argv)
+    server  = daemon.jobServer(cls or daemon.class_load(args.cls), parser or parserSA)
+    if len(args.socket):
+        server.socket_serve(args.socket)
+    else:
+        server.stream_serve(sys.stdin, sys.stdout)
+    return 0
+
 def main(argv=None):
 
-    args = parserSA.parse_args()
+    if argv is None:
+        argv    = sys.argv[1:]
+    if len(argv) and argv[0] == 'merge':
+        return merge_main(argv[1:])
+    if len(argv) and argv[0] == 'serve':
+        return serve_main(argv[1:])
+
+    args = parserSA.parse_args(argv)
 
     if earlyExit_check(args): return 1
 
@@ -217,7 +539,7 @@ def main(argv=None):
     args.str_desc       = synopsis(True)
 
 
-    # pudb.set_trace()
+    # import pudb; pudb.set_trace()
 
     pf_dicom            = pfdicom.pfdicom(vars(args))
 
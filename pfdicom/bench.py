@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+#
+# pfdicom-bench: generate a synthetic DICOM tree and time the pfdicom
+# read, templating and tree processing paths over it.
+#
+# Results are written as JSON (files/s, MB/s and peak RSS per case) so
+# that runs of different versions can be compared mechanically.
+#
+
+import      os
+import      sys
+import      json
+import      time
+import      shutil
+import      tempfile
+import      argparse
+import      multiprocessing
+
+import      pydicom             as      dicom
+from        pydicom.dataset     import  Dataset, FileMetaDataset
+from        pydicom.uid         import  ExplicitVRLittleEndian, generate_uid
+
+try:
+    from    .                   import pfdicom
+    from    .__main__           import parserSA
+except:
+    from    pfdicom             import pfdicom
+    from    __main__            import parserSA
+
+l_template  = [
+    '%PatientID-%PatientAge',
+    '%PatientID-%StudyDate-%_md5|8_AccessionNumber',
+    '%_md5|7_PatientID-%_strmsk|******01_PatientBirthDate-%Modality',
+    '%_nospc|-_SeriesDescription-%ProtocolName.dcm',
+    '%_name|patientID_PatientName-%_md5|4_PatientID-%StudyDate'
+]
+
+# The tags a typical tag-extract tool reports
+l_tagsToUse = ['PatientID', 'PatientAge', 'StudyDate', 'Modality',
+               'SeriesDescription', 'SeriesInstanceUID']
+
+def dataset_make(series, instance, str_seriesUID, tags, rows):
+    """
+    A synthetic MR slice with <tags> extra private elements and a
+    <rows> x <rows> 16 bit image (no pixel data if <rows> is 0).
+    """
+    meta                            = FileMetaDataset()
+    meta.MediaStorageSOPClassUID    = '1.2.840.10008.5.1.4.1.1.4'
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID          = ExplicitVRLittleEndian
+
+    ds                              = Dataset()
+    ds.file_meta                    = meta
+    ds.is_little_endian             = True
+    ds.is_implicit_VR               = False
+    ds.SOPClassUID                  = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID               = meta.MediaStorageSOPInstanceUID
+    ds.PatientName                  = 'Doe%03d^John' % (series % 997)
+    ds.PatientID                    = '%07d' % (4412364 + series)
+    ds.PatientAge                   = '%03dY' % (series % 90)
+    ds.PatientBirthDate             = '20140317'
+    ds.AccessionNumber              = '%08d' % (22681485 + series)
+    ds.StudyDate                    = '20200101'
+    ds.Modality                     = 'MR'
+    ds.SeriesDescription            = 'AX T1 MPRAGE (post) %d' % series
+    ds.ProtocolName                 = 'T1 MPRAGE'
+    ds.SeriesInstanceUID            = str_seriesUID
+    ds.SeriesNumber                 = series + 1
+    ds.InstanceNumber               = instance + 1
+    ds.add_new((0x0019, 0x0010), 'LO', 'PFDICOM BENCH')
+    for i in range(tags):
+        ds.add_new((0x0019, 0x1000 + i), 'LO', 'private value %d' % i)
+    if rows:
+        ds.Rows                         = rows
+        ds.Columns                      = rows
+        ds.SamplesPerPixel              = 1
+        ds.PhotometricInterpretation    = 'MONOCHROME2'
+        ds.BitsAllocated                = 16
+        ds.BitsStored                   = 12
+        ds.HighBit                      = 11
+        ds.PixelRepresentation          = 0
+        ds.PixelData                    = os.urandom(rows * rows * 2)
+    return ds
+
+def tree_generate(str_rootDir, **kwargs):
+    """
+    Write a synthetic DICOM tree under <str_rootDir> and return a
+    description of it.
+
+    kwargs:
+
+        depth       = <number of directory levels above each series>
+        series      = <number of series (leaf directories)>
+        files       = <files per series>
+        tags        = <extra private tags per file>
+        rows        = <image rows and columns; 0 for no pixel data>
+        malformed   = <malformed files per series: alternately a file
+                       truncated in its header and a non-DICOM file>
+    """
+    depth       = 2
+    series      = 8
+    files       = 16
+    tags        = 50
+    rows        = 256
+    malformed   = 0
+    for k, v in kwargs.items():
+        if k == 'depth':        depth       = int(v)
+        if k == 'series':       series      = int(v)
+        if k == 'files':        files       = int(v)
+        if k == 'tags':         tags        = int(v)
+        if k == 'rows':         rows        = int(v)
+        if k == 'malformed':    malformed   = int(v)
+
+    filesWritten    = 0
+    bytesWritten    = 0
+    for s in range(series):
+        l_level     = ['level%d-%02d' % (d, (s >> (2 * d)) % 4) for d in range(depth)]
+        str_dir     = os.path.join(str_rootDir, *l_level, 'series-%04d' % s)
+        os.makedirs(str_dir, exist_ok = True)
+        str_seriesUID   = generate_uid()
+        for i in range(files):
+            str_file    = os.path.join(str_dir, 'image-%04d.dcm' % i)
+            dataset_make(s, i, str_seriesUID, tags, rows).save_as(
+                str_file, write_like_original = False
+            )
+            filesWritten    += 1
+            bytesWritten    += os.path.getsize(str_file)
+        for i in range(malformed):
+            str_file    = os.path.join(str_dir, 'malformed-%04d.dcm' % i)
+            if i % 2:
+                with open(str_file, 'wb') as fp:
+                    fp.write(b'not a DICOM file\n' * 64)
+            else:
+                with open(os.path.join(str_dir, 'image-0000.dcm'), 'rb') as fp:
+                    str_head    = fp.read(400)
+                with open(str_file, 'wb') as fp:
+                    fp.write(str_head)
+            filesWritten    += 1
+            bytesWritten    += os.path.getsize(str_file)
+
+    return {
+        'rootDir':      str_rootDir,
+        'depth':        depth,
+        'series':       series,
+        'filesPerSeries':   files,
+        'tags':         tags,
+        'rows':         rows,
+        'malformed':    malformed,
+        'files':        filesWritten,
+        'bytes':        bytesWritten
+    }
+
+def peakRSS_get():
+    """
+    The peak RSS (in kB) of this process.
+    """
+    try:
+        with open('/proc/self/status') as fp:
+            for str_line in fp:
+                if str_line.startswith('VmHWM:'):
+                    return int(str_line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def files_list(str_rootDir):
+    """
+    All the files in the tree, in walk order.
+    """
+    l_file  = []
+    for str_dir, l_dirs, l_files in os.walk(str_rootDir):
+        l_dirs.sort()
+        l_file.extend(os.path.join(str_dir, f) for f in sorted(l_files)
+                        if not f.startswith('.'))
+    return l_file
+
+def pfdicom_make(str_inputDir, str_outputDir, l_args = [], cls = None):
+    """
+    A pfdicom (or <cls>) object for the tree, with the extra CLI <l_args>.
+    """
+    d_args  = vars(parserSA.parse_args([
+        '--inputDir',       str_inputDir,
+        '--outputDir',      str_outputDir,
+        '--outputFileStem', l_template[1],
+        '--verbosity',      '0'
+    ] + l_args))
+    d_args['str_desc']  = ''
+    return (cls or pfdicom.pfdicom)(d_args)
+
+class benchDICOM(pfdicom.pfdicom):
+    """
+    A minimal tag-extract tool: read every file of a directory, collect
+    the output file stems, and write them out.
+    """
+
+    def inputReadCallback(self, *args, **kwargs):
+        str_path, l_file    = args[0]
+        l_DCMRead           = [self.DICOMfile_read(file = os.path.join(str_path, f))
+                                for f in l_file]
+        return {
+            'status':       True,
+            'l_DCMRead':    l_DCMRead,
+            'filesRead':    len(l_DCMRead)
+        }
+
+    def inputAnalyzeFile(self, *args, **kwargs):
+        str_path, d_read    = args[0]
+        return {
+            'status':       True,
+            'l_file':       [d['outputFileStem'] for d in d_read['l_DCMRead'] if d['status']]
+        }
+
+    def outputSaveCallback(self, at_data, **kwargs):
+        str_path, d_analysis    = at_data
+        os.makedirs(str_path, exist_ok = True)
+        with open(os.path.join(str_path, 'stems.json'), 'w') as fp:
+            json.dump(d_analysis['l_file'], fp)
+        return {
+            'status':       True,
+            'filesSaved':   1
+        }
+
+    def run(self, *args, **kwargs):
+        d_pfdicom   = super().run(JSONprint = False, timerStart = False)
+        return self.tree_process(
+            inputReadCallback       = self.inputReadCallback,
+            analysisCallback        = self.inputAnalyzeFile,
+            outputWriteCallback     = self.outputSaveCallback,
+            persistAnalysisResults  = False
+        )
+
+def read_bench(d_tree, l_args):
+    """
+    DICOMfile_read() over every file of the tree.
+    """
+    pf_dicom    = pfdicom_make(d_tree['rootDir'], tempfile.gettempdir(), l_args)
+    l_file      = files_list(d_tree['rootDir'])
+    tic         = time.perf_counter()
+    for str_file in l_file:
+        pf_dicom.DICOMfile_read(file = str_file)
+    return len(l_file), time.perf_counter() - tic
+
+def dir_bench(d_tree, l_args):
+    """
+    The <l_tagsToUse> of every file of the tree, read file by file with
+    DICOMfile_read() or, with the 'dir' pseudo-argument, a directory at a
+    time with DICOMdir_read().
+    """
+    b_dir       = 'dir' in l_args
+    pf_dicom    = pfdicom_make(d_tree['rootDir'], tempfile.gettempdir(),
+                               [a for a in l_args if a != 'dir'])
+    l_file      = files_list(d_tree['rootDir'])
+    d_dir       = {}
+    for str_file in l_file:
+        d_dir.setdefault(os.path.dirname(str_file), []).append(os.path.basename(str_file))
+    tic         = time.perf_counter()
+    for str_dir, l_dirFile in d_dir.items():
+        if b_dir:
+            pf_dicom.DICOMdir_read(str_dir, l_tagsToUse, l_file = l_dirFile)
+            continue
+        for str_file in l_dirFile:
+            d_read  = pf_dicom.DICOMfile_read(file = os.path.join(str_dir, str_file),
+                                              l_tagsToUse = list(l_tagsToUse))
+            if d_read['status']:
+                [d_read['d_DICOM']['d_dicomSimple'][t] for t in l_tagsToUse]
+    return len(l_file), time.perf_counter() - tic
+
+def template_bench(d_tree, l_args, astr, repeat):
+    """
+    tagsInString_process() of <astr> over the first series of the tree,
+    <repeat> times.
+    """
+    pf_dicom    = pfdicom_make(d_tree['rootDir'], tempfile.gettempdir(), l_args)
+    l_DICOM     = [pf_dicom.DICOMfile_read(file = f)['d_DICOM']
+                    for f in files_list(d_tree['rootDir'])[0:d_tree['filesPerSeries']]]
+    tic         = time.perf_counter()
+    for i in range(repeat):
+        for d_DICOM in l_DICOM:
+            pf_dicom.tagsInString_process(d_DICOM, astr)
+    return repeat * len(l_DICOM), time.perf_counter() - tic
+
+def run_bench(d_tree, l_args):
+    """
+    A full run() of a tag-extract tool over the tree.
+    """
+    str_outputDir   = tempfile.mkdtemp(prefix = 'pfdicom-bench-out-')
+    try:
+        pf_dicom    = pfdicom_make(d_tree['rootDir'], str_outputDir,
+                                   ['--fileFilter', 'dcm'] + l_args, benchDICOM)
+        tic         = time.perf_counter()
+        d_run       = pf_dicom.run()
+        f_time      = time.perf_counter() - tic
+    finally:
+        shutil.rmtree(str_outputDir, ignore_errors = True)
+    return d_run['filesRead'], f_time
+
+def case_run(fn_bench, *args):
+    """
+    Run <fn_bench>(*args) -> (files, seconds) in a child process (if
+    possible), so that the peak RSS is the benchmark's own.
+    """
+    def child(conn):
+        files, f_time   = fn_bench(*args)
+        conn.send((files, f_time, peakRSS_get()))
+        conn.close()
+
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        files, f_time   = fn_bench(*args)
+        return files, f_time, peakRSS_get()
+    ctx             = multiprocessing.get_context('fork')
+    conn, conn_child    = ctx.Pipe(duplex = False)
+    proc            = ctx.Process(target = child, args = (conn_child,))
+    proc.start()
+    conn_child.close()
+    t_result        = conn.recv()
+    proc.join()
+    return t_result
+
+def result_make(d_tree, str_bench, str_case, t_result, b_bytes = True):
+    files, f_time, peakRSS  = t_result
+    d_result    = {
+        'bench':        str_bench,
+        'case':         str_case,
+        'files':        files,
+        'seconds':      round(f_time, 6),
+        'filesPerSec':  round(files / f_time, 2) if f_time else 0.0,
+        'peakRSS_kB':   peakRSS
+    }
+    if b_bytes:
+        MB                      = d_tree['bytes'] * files / max(d_tree['files'], 1) / 1e6
+        d_result['MBPerSec']    = round(MB / f_time, 2) if f_time else 0.0
+    return d_result
+
+def main(argv = None):
+    parser  = argparse.ArgumentParser(
+        description     = 'Benchmark pfdicom on a synthetic DICOM tree.'
+    )
+    parser.add_argument('--rootDir',    default = '',
+                        help = 'tree location (default: a temporary directory)')
+    parser.add_argument('--keep',       action = 'store_true', default = False,
+                        help = 'keep the tree, and reuse a kept tree of the same shape')
+    parser.add_argument('--depth',      type = int, default = 2)
+    parser.add_argument('--series',     type = int, default = 8)
+    parser.add_argument('--files',      type = int, default = 16)
+    parser.add_argument('--tags',       type = int, default = 50)
+    parser.add_argument('--rows',       type = int, default = 256)
+    parser.add_argument('--malformed',  type = int, default = 0)
+    parser.add_argument('--modes',      default = 'default,headerOnly,mmap',
+                        help = 'DICOMfile_read modes to time')
+    parser.add_argument('--workers',    default = '1,%d' % (os.cpu_count() or 1),
+                        help = 'thread/process counts for the full run')
+    parser.add_argument('--repeat',     type = int, default = 200,
+                        help = 'tagsInString_process repeats')
+    parser.add_argument('--benches',    default = 'read,dir,template,run')
+    parser.add_argument('--output',     default = '',
+                        help = 'JSON results file (default: stdout)')
+    args    = parser.parse_args(argv)
+
+    d_modeArgs  = {
+        'default':      [],
+        'headerOnly':   ['--headerOnly'],
+        'mmap':         ['--mmap']
+    }
+    l_modes     = [m for m in args.modes.split(',') if m]
+    l_workers   = [int(w) for w in args.workers.split(',') if w]
+    l_benches   = args.benches.split(',')
+
+    str_rootDir = args.rootDir or tempfile.mkdtemp(prefix = 'pfdicom-bench-')
+    d_treeArgs  = {k : getattr(args, k)
+                    for k in ['depth', 'series', 'files', 'tags', 'rows', 'malformed']}
+    str_treeFile    = os.path.join(str_rootDir, '.pfdicom-bench.json')
+    d_tree          = {}
+    if args.keep and os.path.exists(str_treeFile):
+        with open(str_treeFile) as fp:
+            d_tree  = json.load(fp)
+        if d_tree.get('d_args') != d_treeArgs:
+            d_tree  = {}
+    l_result    = []
+    try:
+        if not d_tree:
+            d_tree  = tree_generate(str_rootDir, **d_treeArgs)
+            d_tree['d_args']    = d_treeArgs
+            if args.keep:
+                with open(str_treeFile, 'w') as fp:
+                    json.dump(d_tree, fp)
+        d_tree['rootDir']   = str_rootDir
+
+        if 'read' in l_benches:
+            for str_mode in l_modes:
+                l_result.append(result_make(d_tree, 'DICOMfile_read', str_mode,
+                    case_run(read_bench, d_tree, d_modeArgs[str_mode])))
+        if 'dir' in l_benches:
+            for str_case, l_args in [('DICOMfile_read', ['--headerOnly']),
+                                     ('DICOMdir_read',  ['--headerOnly', 'dir'])]:
+                l_result.append(result_make(d_tree, 'tag columns', str_case,
+                    case_run(dir_bench, d_tree, l_args)))
+        if 'template' in l_benches:
+            for astr in l_template:
+                l_result.append(result_make(d_tree, 'tagsInString_process', astr,
+                    case_run(template_bench, d_tree, [], astr, args.repeat),
+                    b_bytes = False))
+        if 'run' in l_benches:
+            for str_executor in ['thread', 'process']:
+                for workers in l_workers:
+                    l_result.append(result_make(d_tree, 'run',
+                        '%s x %d' % (str_executor, workers),
+                        case_run(run_bench, d_tree,
+                                 ['--executor', str_executor, '--workers', str(workers)])))
+    finally:
+        # Only a tree in a temporary directory of our own is removed
+        if not args.keep and not args.rootDir:
+            shutil.rmtree(str_rootDir, ignore_errors = True)
+
+    d_ret   = {
+        'version':      pfdicom.__version__,
+        'python':       sys.version.split()[0],
+        'pydicom':      dicom.__version__,
+        'cpus':         os.cpu_count(),
+        'd_tree':       d_tree,
+        'l_result':     l_result
+    }
+    str_json    = json.dumps(d_ret, indent = 4)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            fp.write(str_json + '\n')
+    else:
+        print(str_json)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""
+A persistent, on-disk index of the tags extracted from DICOM files.
+
+The index is an SQLite database that stores, for each file, the list
+of tags in the file and the 'd_dicomSimple' value of each tag. Entries
+are keyed on the absolute file path and are only valid as long as the
+file's mtime, size and inode are unchanged -- so an index serves the
+runs over the files where they are, but never a copy (or restore) of
+them, or the same files on another machine.
+
+The index only ever holds data: the tags are stored as JSON, with the
+pydicom value types (person names, integer and decimal strings, UIDs,
+tags, multi-values, sequences and bytes) encoded so that they are
+decoded to the same type and value (see value_encode()). A file with a
+value that cannot be encoded is not indexed.
+"""
+
+import      os
+import      time
+import      json
+import      base64
+import      threading
+
+from        pydicom.valuerep    import  PersonName, IS, DSfloat, DSdecimal, DS
+from        pydicom.multival    import  MultiValue
+from        pydicom.sequence    import  Sequence
+from        pydicom.dataset     import  Dataset
+from        pydicom.tag         import  BaseTag, Tag
+from        pydicom.uid         import  UID
+
+def value_encode(value):
+    """
+    The 'd_dicomSimple' <value> as a JSON value that value_decode() turns
+    back into an equal value of the same type. The plain JSON types are
+    kept as they are; the pydicom value types are JSON objects of one
+    key, which says the type. Raises TypeError for any other type.
+    """
+    if value is None or type(value) in [str, int, float, bool]:
+        return value
+    if isinstance(value, PersonName):
+        return {'PN':   str(value)}
+    if isinstance(value, IS):
+        return {'IS':   str(value)}
+    if isinstance(value, (DSfloat, DSdecimal)):
+        return {'DS':   str(value)}
+    if isinstance(value, UID):
+        return {'UI':   str(value)}
+    if isinstance(value, BaseTag):
+        return {'AT':   int(value)}
+    if isinstance(value, bytes):
+        return {'OB':   base64.b64encode(value).decode('ascii')}
+    if isinstance(value, Sequence):
+        return {'SQ':   [[[int(elem.tag), elem.VR, value_encode(elem.value)] for elem in ds]
+                            for ds in value]}
+    if isinstance(value, MultiValue):
+        return {'VM':   [value_encode(v) for v in value]}
+    if type(value) is list:
+        return {'VL':   [value_encode(v) for v in value]}
+    raise TypeError('cannot index a value of type %s' % type(value).__name__)
+
+def value_decode(value):
+    """
+    The value that value_encode() encoded as <value>.
+    """
+    if not isinstance(value, dict):
+        return value
+    str_type, v     = next(iter(value.items()))
+    if str_type == 'PN':    return PersonName(v)
+    if str_type == 'IS':    return IS(v)
+    if str_type == 'DS':    return DS(v)
+    if str_type == 'UI':    return UID(v)
+    if str_type == 'AT':    return Tag(v)
+    if str_type == 'OB':    return base64.b64decode(v)
+    if str_type == 'VM':    return MultiValue(lambda x: x, [value_decode(x) for x in v])
+    if str_type == 'VL':    return [value_decode(x) for x in v]
+    if str_type == 'SQ':
+        l_ds    = []
+        for l_elem in v:
+            ds  = Dataset()
+            for tag, str_vr, x in l_elem:
+                ds.add_new(tag, str_vr, value_decode(x))
+            l_ds.append(ds)
+        return Sequence(l_ds)
+    raise ValueError('unknown indexed value type %s' % str_type)
+
+class tagIndex(object):
+    """
+    The tag index for one cache directory. An object can be shared by
+    threads and survives a fork: each thread of each process lazily
+    opens its own connection to the database.
+    """
+
+    str_dbName  = 'pfdicom-tagIndex.sqlite'
+
+    # The schema version: 3 stores typed JSON values (earlier indexes
+    # are dropped)
+    version     = 3
+
+    def __init__(self, str_cacheDir, **kwargs):
+        """
+        kwargs:
+
+            maxEntries  = <evict the oldest entries beyond this many
+                           when evict() is called; 0 for no limit>
+        """
+        self.str_cacheDir   = str_cacheDir
+        self.str_db         = os.path.join(str_cacheDir, self.str_dbName)
+        self.maxEntries     = 0
+        self.d_conn         = {}
+        self.lock           = threading.Lock()
+        self.hits           = 0
+        self.misses         = 0
+        self.stores         = 0
+        self.evicted        = 0
+        for k, v in kwargs.items():
+            if k == 'maxEntries':   self.maxEntries = int(v)
+
+        os.makedirs(str_cacheDir, exist_ok = True)
+        conn    = self.conn()
+        if conn.execute('PRAGMA user_version').fetchone()[0] < self.version:
+            conn.execute('DROP TABLE IF EXISTS tagIndex')
+            conn.execute('PRAGMA user_version = %d' % self.version)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tagIndex (
+                path            TEXT PRIMARY KEY,
+                mtime_ns        INTEGER,
+                size            INTEGER,
+                inode           INTEGER,
+                stored          REAL,
+                l_tagRaw        TEXT,
+                d_dicomSimple   TEXT
+            )
+        """)
+
+    def conn(self):
+        """
+        The connection for the calling process/thread.
+        """
+        t_id    = (os.getpid(), threading.get_ident())
+        if t_id not in self.d_conn:
+            import  sqlite3
+            conn    = sqlite3.connect(self.str_db,
+                                      timeout           = 60,
+                                      isolation_level   = None,
+                                      check_same_thread = False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.d_conn[t_id]   = conn
+        return self.d_conn[t_id]
+
+    def count(self, str_counter):
+        with self.lock:
+            setattr(self, str_counter, getattr(self, str_counter) + 1)
+
+    @staticmethod
+    def fingerprint(str_file):
+        """
+        The (absolute path, mtime, size, inode) of <str_file>, or None if
+        the file cannot be stat'ed.
+        """
+        try:
+            st  = os.stat(str_file)
+        except OSError:
+            return None
+        return (os.path.abspath(str_file), st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def get(self, str_file):
+        """
+        Return the indexed {'l_tagRaw': [...], 'd_dicomSimple': {...}} for
+        <str_file>, or None if the file is not (validly) indexed.
+        """
+        t_fp    = self.fingerprint(str_file)
+        row     = None
+        if t_fp:
+            row = self.conn().execute(
+                'SELECT l_tagRaw, d_dicomSimple FROM tagIndex '
+                'WHERE path = ? AND mtime_ns = ? AND size = ? AND inode = ?',
+                t_fp
+            ).fetchone()
+        try:
+            d_index = {
+                'l_tagRaw':         json.loads(row[0]),
+                'd_dicomSimple':    {k : value_decode(v)
+                                        for k, v in json.loads(row[1]).items()}
+            } if row else None
+        except (TypeError, ValueError, KeyError, StopIteration):
+            d_index = None
+        if d_index is None:
+            self.count('misses')
+            return None
+        self.count('hits')
+        return d_index
+
+    def put(self, str_file, l_tagRaw, d_dicomSimple):
+        """
+        Index the tags of <str_file>.
+        """
+        import  sqlite3
+        t_fp    = self.fingerprint(str_file)
+        if not t_fp:
+            return False
+        try:
+            self.conn().execute(
+                'INSERT OR REPLACE INTO tagIndex VALUES (?, ?, ?, ?, ?, ?, ?)',
+                t_fp + (time.time(),
+                        json.dumps(list(l_tagRaw)),
+                        json.dumps({k : value_encode(v) for k, v in d_dicomSimple.items()}))
+            )
+        except (sqlite3.Error, TypeError, ValueError):
+            return False
+        self.count('stores')
+        return True
+
+    def evict(self):
+        """
+        Remove the entries of files that no longer exist and, if there
+        are more than <maxEntries>, the oldest entries beyond that.
+        Then vacuum the database.
+        """
+        conn        = self.conn()
+        l_gone      = [(path,) for (path,) in conn.execute('SELECT path FROM tagIndex')
+                            if not os.path.exists(path)]
+        conn.executemany('DELETE FROM tagIndex WHERE path = ?', l_gone)
+        evicted     = len(l_gone)
+        if self.maxEntries:
+            cur     = conn.execute(
+                'DELETE FROM tagIndex WHERE path IN ('
+                '   SELECT path FROM tagIndex ORDER BY stored DESC LIMIT -1 OFFSET ?'
+                ')',
+                (self.maxEntries,)
+            )
+            evicted += max(cur.rowcount, 0)
+        conn.execute('VACUUM')
+        with self.lock:
+            self.evicted    += evicted
+        return evicted
+
+    def stats(self):
+        """
+        The hit/miss counters.
+        """
+        return {
+            'cacheDir': self.str_cacheDir,
+            'hits':     self.hits,
+            'misses':   self.misses,
+            'stores':   self.stores,
+            'evicted':  self.evicted
+        }
+
+    def stats_add(self, d_stats):
+        """
+        Add counters (for example from a worker process) to this index.
+        """
+        with self.lock:
+            for k in ['hits', 'misses', 'stores', 'evicted']:
+                setattr(self, k, getattr(self, k) + d_stats.get(k, 0))
@@ -0,0 +1,299 @@
+"""
+Columnar (Parquet or Arrow IPC) export of the tags read in a run.
+
+Every file read by the input read callback of a run becomes one row,
+with the columns 'inputPath', 'inputFilename', 'outputFileStem' and one
+per tag. The rows of each directory are written as they come, as one
+row group (Parquet) or record batch (Arrow), so the whole run is never
+held in memory.
+
+Tag columns are typed from the DICOM data dictionary: single valued
+dates become dates, integer VRs (and IS) 64 bit integers, floating
+point VRs (and DS) doubles, and everything else strings. A value that
+does not convert (or a tag a file does not have) is null.
+
+If the tag columns are given, any other tag is dropped (and listed in
+'l_tagsDropped', and counted in 'tagsDropped'). Otherwise the columns
+are all the tags of all the files. As they are only known once the run
+is done, rows are written to part files next to the export file, and a
+new part is started whenever a directory brings new tags. On close the
+parts are copied, one row group at a time, into the export file with
+the columns of the last part (which has all of them), the tags a part
+lacks being null.
+
+Needs pyarrow.
+"""
+
+import      os
+import      datetime
+import      threading
+
+import      pydicom             as      dicom
+
+try:
+    from    .dicommap           import d_keywordTable
+except:
+    from    dicommap            import d_keywordTable
+
+# See pyarrow_load()
+pyarrow         = None
+
+def pyarrow_load():
+    """
+    Import pyarrow (and its Parquet and IPC modules) on first use.
+    """
+    global pyarrow
+    if pyarrow is None:
+        try:
+            import  pyarrow
+            import  pyarrow.parquet
+            import  pyarrow.ipc
+        except ImportError:
+            pyarrow = None
+            raise ImportError('pyarrow is needed for the columnar tag export')
+    return pyarrow
+
+l_metaColumn    = ['inputPath', 'inputFilename', 'outputFileStem']
+
+d_kindVR        = {
+    'DA':   'date',
+    'IS':   'int',  'SL':   'int',  'SS':   'int',  'SV':   'int',
+    'UL':   'int',  'US':   'int',  'UV':   'int',
+    'DS':   'float','FD':   'float','FL':   'float'
+}
+
+# The extensions that select the Arrow IPC (file) format
+l_arrowExtension    = ['.arrow', '.feather', '.ipc']
+
+d_tagKind       = {}
+
+def tag_kind(str_tag):
+    """
+    The column kind ('date', 'int', 'float' or 'string') of the tag with
+    keyword <str_tag>.
+    """
+    str_kind    = d_tagKind.get(str_tag)
+    if str_kind is None:
+        str_kind    = 'string'
+        t_entry     = d_keywordTable.get(str_tag)
+        if t_entry is not None and dicom.datadict.dictionary_VM(t_entry[0]) == '1':
+            l_kind  = {d_kindVR.get(VR, 'string') for VR in t_entry[1].split(' or ')}
+            if len(l_kind) == 1:
+                str_kind    = l_kind.pop()
+        d_tagKind[str_tag]  = str_kind
+    return str_kind
+
+def value_convert(str_tag, value):
+    """
+    <value> of the tag <str_tag> as the Python type of its column, or
+    None if it does not convert.
+    """
+    if value is None or value == "no attribute":
+        return None
+    str_kind    = tag_kind(str_tag)
+    try:
+        if str_kind == 'date':
+            if isinstance(value, datetime.date):
+                return datetime.date(value.year, value.month, value.day)
+            str_date    = str(value).strip().replace('.', '')
+            if len(str_date) != 8:
+                return None
+            return datetime.date(int(str_date[0:4]), int(str_date[4:6]), int(str_date[6:8]))
+        if str_kind == 'int':
+            return int(value)
+        if str_kind == 'float':
+            return float(value)
+    except (TypeError, ValueError):
+        return None
+    return str(value)
+
+def row_make(str_path, str_filename, str_outputFileStem, d_tag):
+    """
+    The export row of one file, with its tag values <d_tag> converted.
+    """
+    d_row   = {
+        'inputPath':        str_path,
+        'inputFilename':    str_filename,
+        'outputFileStem':   str_outputFileStem
+    }
+    for k, v in d_tag.items():
+        if k in d_row or k == 'PixelData': continue
+        d_row[k]    = value_convert(k, v)
+    return d_row
+
+class tagTable(object):
+    """
+    The export file of a run. Rows are passed in per directory with
+    batch_add(); in a forked worker process they are only kept, to be
+    sent back to the parent (see pending_drain()), which writes them.
+    """
+
+    def __init__(self, str_file, **kwargs):
+        """
+        kwargs:
+
+            format      = <'parquet' or 'arrow'; default from the file
+                           extension (.arrow, .feather and .ipc are Arrow)>
+            l_tags      = <the tag columns; default all the tags of all
+                           the files>
+        """
+        pyarrow_load()
+        self.str_file       = str_file
+        self.str_format     = 'arrow' if os.path.splitext(str_file)[1].lower() in \
+                                l_arrowExtension else 'parquet'
+        self.l_tags         = None
+        for k, v in kwargs.items():
+            if k == 'format':       self.str_format = v
+            if k == 'l_tags':       self.l_tags     = list(v)
+
+        self.pid            = os.getpid()
+        self.lock           = threading.Lock()
+        self.schema         = None
+        self.writer         = None
+        self.l_part         = []
+        self.b_closed       = False
+        self.l_pending      = []
+        self.s_tagsDropped  = set()
+        self.d_count        = {
+            'rowGroups':    0,
+            'rows':         0,
+            'parts':        0
+        }
+
+    def schema_make(self, l_row):
+        """
+        The table schema: the meta columns, then the tag columns in
+        keyword order -- the given ones, or those of the current schema
+        and of the rows <l_row>.
+        """
+        d_type  = {
+            'date':     pyarrow.date32(),
+            'int':      pyarrow.int64(),
+            'float':    pyarrow.float64(),
+            'string':   pyarrow.string()
+        }
+        l_tags  = self.l_tags
+        if l_tags is None:
+            l_tags  = sorted(set().union(self.schema.names if self.schema else [], *l_row) -
+                             set(l_metaColumn))
+        l_field = [pyarrow.field(c, pyarrow.string()) for c in l_metaColumn]
+        l_field.extend(pyarrow.field(t, d_type[tag_kind(t)]) for t in l_tags
+                        if t not in l_metaColumn and t != 'PixelData')
+        return pyarrow.schema(l_field)
+
+    def writer_open(self, str_file):
+        os.makedirs(os.path.dirname(os.path.abspath(str_file)), exist_ok = True)
+        if self.str_format == 'arrow':
+            return pyarrow.ipc.new_file(str_file, self.schema)
+        return pyarrow.parquet.ParquetWriter(str_file, self.schema)
+
+    def table_write(self, table):
+        if self.str_format == 'arrow':
+            for batch in table.to_batches():
+                self.writer.write_batch(batch)
+        else:
+            self.writer.write_table(table, row_group_size = table.num_rows)
+
+    def part_open(self, l_row):
+        """
+        Widen the schema to the tags of the rows <l_row>, if they are not
+        all columns yet, and start a new part file with it.
+        """
+        if self.schema is not None and (self.l_tags is not None or
+                set().union(*l_row) <= set(self.schema.names)):
+            return
+        if self.writer:
+            self.writer.close()
+        self.schema         = self.schema_make(l_row)
+        str_part            = '%s.part%d' % (self.str_file, len(self.l_part))
+        self.writer         = self.writer_open(str_part)
+        self.l_part.append(str_part)
+        self.d_count['parts']   += 1
+
+    def part_tables(self, str_part):
+        """
+        The row groups (record batches) of the part file <str_part>, as
+        tables, one at a time.
+        """
+        if self.str_format == 'arrow':
+            with pyarrow.memory_map(str_part) as source:
+                reader  = pyarrow.ipc.open_file(source)
+                for i in range(reader.num_record_batches):
+                    yield pyarrow.Table.from_batches([reader.get_batch(i)])
+        else:
+            partFile    = pyarrow.parquet.ParquetFile(str_part)
+            for i in range(partFile.num_row_groups):
+                yield partFile.read_row_group(i)
+
+    def parts_unify(self):
+        """
+        Write the export file from the parts, with the columns of the
+        last, and remove them.
+        """
+        if len(self.l_part) == 1:
+            os.replace(self.l_part[0], self.str_file)
+            self.l_part = []
+            return
+        self.writer     = self.writer_open(self.str_file)
+        for str_part in self.l_part:
+            for table in self.part_tables(str_part):
+                for field in self.schema:
+                    if field.name not in table.column_names:
+                        table   = table.append_column(field,
+                                                      pyarrow.nulls(table.num_rows, field.type))
+                self.table_write(table.select(self.schema.names))
+            os.remove(str_part)
+        self.writer.close()
+        self.writer     = None
+        self.l_part     = []
+
+    def batch_add(self, l_row):
+        """
+        Write the rows <l_row> of one directory as a row group. Raises
+        ValueError once the file is closed.
+        """
+        if not len(l_row):
+            return
+        if os.getpid() != self.pid:
+            self.l_pending.append(l_row)
+            return
+        with self.lock:
+            if self.b_closed:
+                raise ValueError('the tag export %s is closed' % self.str_file)
+            self.part_open(l_row)
+            self.table_write(pyarrow.Table.from_pylist(l_row, schema = self.schema))
+            self.d_count['rowGroups']   += 1
+            self.d_count['rows']        += len(l_row)
+            self.s_tagsDropped.update(set().union(*l_row) - set(self.schema.names))
+
+    def pending_drain(self):
+        """
+        The row batches kept in a worker process (and forget them).
+        """
+        l_pending       = self.l_pending
+        self.l_pending  = []
+        return l_pending
+
+    def stats(self):
+        return {
+            'file':             self.str_file,
+            'format':           self.str_format,
+            'columns':          len(self.schema.names) if self.schema else 0,
+            **self.d_count,
+            'tagsDropped':      len(self.s_tagsDropped),
+            'l_tagsDropped':    sorted(self.s_tagsDropped)
+        }
+
+    def close(self):
+        """
+        Finish the file, and return its stats. No more rows can be added
+        once it is closed; closing it again only returns the stats.
+        """
+        with self.lock:
+            if self.writer:
+                self.writer.close()
+                self.writer = None
+                self.parts_unify()
+            self.b_closed   = True
+            self.l_pending  = []
+            return self.stats()
@@ -0,0 +1,249 @@
+"""
+A long-running pfdicom server, so that the start-up cost of a run (the
+imports, and building the tool's class) is paid once rather than on
+every invocation.
+
+What is kept warm is the interpreter: the modules imported, the tool's
+class and argument parser, and what is built once per process (the
+Faker instance, the tag keyword table). The tool object and, with the
+'process' executor, its pool are made anew for each job. A pool's
+workers are forked with the job's object and callbacks, which a pool
+forked once could not run, but being forked from the warm server they
+start without any import cost.
+
+The server reads jobs as NDJSON, one JSON object per line, either from
+stdin or from the connections to a Unix socket, and writes one result
+line back for each. A job gives the command line arguments of a run,
+as a list, and/or by their (argparse 'dest') names:
+
+    {"id": "j1", "inputDir": "/in/dir", "outputDir": "/out/dir",
+     "outputFileStem": "%PatientID-%SeriesDescription"}
+    {"id": "j2", "args": ["--inputDir", "/in/dir", "--outputDir", "/out"]}
+
+and is run as a new object of the tool's class. That class is the one
+the server was started with ('--class'): a job can only set the tool's
+options, and a job with any other key fails. The result of a job is
+
+    {"record": "job", "id": <the job's id>, "status": <bool>,
+     "jobTime": <seconds>, "d_ret": <what run() returned>}
+
+or, if the job failed, has the "error" instead of "d_ret". With
+"jsonStream", the per-directory records of the run (see
+pfdicom.jsonStream_emit()) are sent back, with the job's "id", as they
+come. The job {"command": "shutdown"} stops the server.
+
+Jobs are run one at a time, since a run may change the working
+directory. Anything that a run prints is sent to stderr, so that stdout
+carries only the results.
+
+A job can read and write any path that the server can, so the Unix
+socket is only accessible to the user running the server (mode 0600).
+"""
+
+import      os
+import      sys
+import      json
+import      time
+import      socket
+import      threading
+import      importlib
+import      contextlib
+import      socketserver
+
+def class_load(str_class):
+    """
+    The class <str_class> given as '<module>:<class>'.
+    """
+    str_module, str_name    = str_class.split(':')
+    return getattr(importlib.import_module(str_module), str_name)
+
+class jobServer(object):
+    """
+    The warm state of the server: the tool's class and its argument
+    parser, and the lock that serializes the jobs.
+    """
+
+    def __init__(self, cls, parser, **kwargs):
+        """
+        kwargs:
+
+            verbosity   = <the verbosity of the runs unless a job sets it;
+                           default '0'>
+        """
+        self.cls        = cls
+        self.parser     = parser
+        self.verbosity  = '0'
+        for k, v in kwargs.items():
+            if k == 'verbosity':    self.verbosity  = str(v)
+        self.lock       = threading.Lock()
+        self.b_shutdown = False
+        self.d_count    = {
+            'jobs':     0,
+            'failed':   0
+        }
+
+    def args_make(self, d_job):
+        """
+        The arguments of the tool's class for the job <d_job>. A job only
+        sets the tool's options: anything else (such as a class of its
+        own) is refused.
+        """
+        d_args  = vars(self.parser.parse_args(
+                    ['--verbosity', self.verbosity] + [str(a) for a in d_job.get('args', [])]
+                  ))
+        l_bad   = [k for k in d_job if k not in d_args and k not in ['id', 'args', 'command']]
+        if l_bad:
+            raise ValueError('not options of the tool: %s' % ', '.join(sorted(l_bad)))
+        for k, v in d_job.items():
+            if k in ['id', 'args', 'command']: continue
+            d_args[k]   = v
+        d_args['str_desc']  = ''
+        return d_args
+
+    def job_run(self, d_job, fn_emit):
+        """
+        Run the job <d_job> and return its result record. The records
+        that the run streams are passed to <fn_emit>.
+        """
+        d_result    = {
+            'record':   'job',
+            'id':       d_job.get('id'),
+            'status':   False
+        }
+        if d_job.get('command') == 'shutdown':
+            self.b_shutdown     = True
+            return {**d_result, 'record': 'shutdown', 'status': True, **self.d_count}
+        tic         = time.perf_counter()
+        with self.lock:
+            str_cwd = os.getcwd()
+            try:
+                with contextlib.redirect_stdout(sys.stderr):
+                    o_tool  = self.cls(self.args_make(d_job))
+                    o_tool.fn_jsonStream    = lambda d_record: \
+                        fn_emit({**d_record, 'id': d_result['id']})
+                    d_ret   = o_tool.run(JSONprint = False)
+                d_result['status']  = bool(d_ret.get('status'))
+                d_result['d_ret']   = d_ret
+            except SystemExit as e:
+                # argparse exits on bad arguments
+                d_result['error']   = 'bad arguments (exit %s)' % e.code
+            except Exception as e:
+                d_result['error']   = '%s: %s' % (type(e).__name__, e)
+            finally:
+                os.chdir(str_cwd)
+            self.d_count['jobs']    += 1
+            if not d_result['status']:
+                self.d_count['failed']  += 1
+        d_result['jobTime']     = time.perf_counter() - tic
+        return d_result
+
+    def line_process(self, str_line, fn_write):
+        """
+        Run the job of the line <str_line>, and write its result line (and
+        any records it streams) with <fn_write>(<line>).
+        """
+        def emit(d_record):
+            fn_write(json.dumps(d_record, default = str) + '\n')
+
+        str_line    = str_line.strip()
+        if not str_line:
+            return
+        try:
+            d_job   = json.loads(str_line)
+            if not isinstance(d_job, dict):
+                raise ValueError('a job is a JSON object')
+        except ValueError as e:
+            d_result    = {
+                'record':   'job',
+                'id':       None,
+                'status':   False,
+                'error':    'bad job: %s' % e
+            }
+        else:
+            d_result    = self.job_run(d_job, emit)
+        emit(d_result)
+
+    def ready(self):
+        """
+        The line that the server writes first on each stream.
+        """
+        return json.dumps({
+            'record':   'ready',
+            'pid':      os.getpid(),
+            'class':    self.cls.__name__
+        })
+
+    def stream_serve(self, fp_in, fp_out):
+        """
+        Serve the jobs of the stream <fp_in>, writing the results to
+        <fp_out>, until it ends or a shutdown job.
+        """
+        def write(str_line):
+            fp_out.write(str_line)
+            fp_out.flush()
+
+        write(self.ready() + '\n')
+        for str_line in fp_in:
+            self.line_process(str_line, write)
+            if self.b_shutdown:
+                break
+        return self.d_count
+
+    def socket_serve(self, str_socket):
+        """
+        Serve the jobs of the connections to the Unix socket <str_socket>
+        until a shutdown job.
+        """
+        server_self = self
+
+        class handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                def write(str_line):
+                    self.wfile.write(str_line.encode())
+                    self.wfile.flush()
+
+                write(server_self.ready() + '\n')
+                for line in self.rfile:
+                    server_self.line_process(line.decode(), write)
+                    if server_self.b_shutdown:
+                        threading.Thread(target = server.shutdown, daemon = True).start()
+                        break
+
+        if os.path.exists(str_socket):
+            os.unlink(str_socket)
+        # Created without group or other access, rather than with the
+        # umask of the process
+        umask   = os.umask(0o177)
+        try:
+            server  = socketserver.ThreadingUnixStreamServer(str_socket, handler)
+        finally:
+            os.umask(umask)
+        os.chmod(str_socket, 0o600)
+        server.daemon_threads   = True
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            if os.path.exists(str_socket):
+                os.unlink(str_socket)
+        return self.d_count
+
+def job_send(str_socket, l_job):
+    """
+    Send the jobs <l_job> to the server on the Unix socket <str_socket>
+    and return their result records (and the records they streamed).
+    """
+    l_result    = []
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str_socket)
+        fp      = sock.makefile('rw')
+        json.loads(fp.readline())
+        for d_job in l_job:
+            fp.write(json.dumps(d_job) + '\n')
+            fp.flush()
+            while True:
+                d_record    = json.loads(fp.readline())
+                l_result.append(d_record)
+                if d_record['record'] in ['job', 'shutdown']:
+                    break
+    return l_result
@@ -0,0 +1,435 @@
+"""
+A lazy, dict-compatible representation of a parsed DICOM file.
+"""
+
+import      time
+
+import      pydicom             as      dicom
+
+try:
+    from    .                   import mmapread
+except:
+    import                             mmapread
+
+# keyword -> (tag, VR) of every tag in the DICOM data dictionary, built
+# once so that tags are looked up by number rather than by keyword
+d_keywordTable  = {
+    t_entry[4] : (tag, t_entry[0])
+        for tag, t_entry in dicom.datadict.DicomDictionary.items() if t_entry[4]
+}
+
+def element_get(dcm, str_keyword):
+    """
+    The data element of <dcm> with keyword <str_keyword>, or None if the
+    keyword is unknown, the dataset does not have it, or it cannot be
+    read.
+    """
+    t_entry     = d_keywordTable.get(str_keyword)
+    if t_entry is None:
+        return None
+    try:
+        return dcm[t_entry[0]] if t_entry[0] in dcm else None
+    except Exception:
+        return None
+
+def dcm_dict(dcm):
+    """
+    dict(<dcm>) -- except that an element that fails to convert from the
+    raw element it was read as is kept raw, instead of failing the whole.
+    """
+    d_dcm   = {}
+    for tag in dcm.keys():
+        try:
+            d_dcm[tag]  = dcm[tag]
+        except Exception:
+            d_dcm[tag]  = dcm.get_item(tag)
+    return d_dcm
+
+class DICOMmap(dict):
+    """
+    The 'DICOMmap' is what DICOMfile_read() returns as its 'd_DICOM'.
+    It is a real dictionary with the keys
+
+        'dcm', 'd_dcm', 'strRaw', 'l_tagRaw',
+        'd_json', 'd_dicom', 'd_dicomSimple'
+
+    but only 'dcm' is set on construction (and even that can be deferred
+    to a reader callable). Every other key is computed
+    from the pydicom dataset the first time it is accessed, and then
+    cached in the dictionary. In particular the (expensive) pretty-printed
+    'strRaw' dump is never built unless some caller asks for it.
+
+    Any operation that needs the whole dictionary (iteration, len(),
+    items(), dict(), copy(), comparison, ...) first materializes all
+    the keys, so callers that treat the 'd_DICOM' as a plain dictionary
+    see exactly what they always saw.
+
+    Individual tag values used for templating can be looked up with
+    tagSimple_get() without building the full 'd_dicomSimple'.
+    """
+
+    l_lazyKey   = ['dcm', 'd_dcm', 'strRaw', 'l_tagRaw', 'd_json', 'd_dicom', 'd_dicomSimple']
+
+    # The keys that heavy_drop() forgets
+    l_heavyKey  = ['dcm', 'd_dcm', 'strRaw']
+
+    __slots__   = ['l_tagsToUse', 'fn_strRaw', 'fn_strRawSkip', 'fn_dcmRead',
+                   'fn_pixelData', 'profile', 'd_simple', 'b_indexed', 's_known',
+                   'b_strRaw', 'ref_record']
+
+    def __init__(self, dcm = None, **kwargs):
+        """
+        kwargs:
+
+            l_tagsToUse     = <list of tags to populate in the per-tag dicts>
+            strRawFallback  = <callable(d_dcm) -> (str_raw, b_status) that is
+                               used when str(dcm) fails>
+            strRawSkip      = <callable(dcm) -> True if str(dcm) is known
+                               to fail, so that it is not even tried>
+            dcmReader       = <callable() -> dcm that reads the dataset on
+                               first access, instead of passing <dcm>>
+            d_index         = <{'l_tagRaw': [...], 'd_dicomSimple': {...}}
+                               of all the tags in the file, typically from
+                               a tagIndex, to serve tag lookups from>
+            d_known         = <{'s_tag': <keywords>, 'd_dicomSimple': {...}}:
+                               the values of those of the tags <keywords>
+                               that the file has (the others it does not
+                               have), for example shared by a series
+                               representative; any other tag is read from
+                               the dataset>
+            pixelDataReader = <callable() -> memoryview of the pixel data,
+                               for datasets read without their pixels>
+            profile         = <stageProfile that times building the 'strRaw'
+                               and per-tag dictionaries>
+        """
+        super().__init__()
+        self.l_tagsToUse    = None
+        self.fn_strRaw      = None
+        self.fn_strRawSkip  = None
+        self.fn_dcmRead     = None
+        self.fn_pixelData   = None
+        self.profile        = None
+        self.d_simple       = {}
+        self.b_indexed      = False
+        self.s_known        = frozenset()
+        self.b_strRaw       = True
+        self.ref_record     = None
+        for k, v in kwargs.items():
+            if k == 'l_tagsToUse':      self.l_tagsToUse    = v
+            if k == 'strRawFallback':   self.fn_strRaw      = v
+            if k == 'strRawSkip':       self.fn_strRawSkip  = v
+            if k == 'dcmReader':        self.fn_dcmRead     = v
+            if k == 'pixelDataReader':  self.fn_pixelData   = v
+            if k == 'profile':          self.profile        = v
+            if k == 'd_index':
+                dict.__setitem__(self, 'l_tagRaw', v['l_tagRaw'])
+                self.d_simple       = dict(v['d_dicomSimple'])
+                self.b_indexed      = True
+            if k == 'd_known':
+                self.s_known        = v['s_tag']
+                self.d_simple       = dict(v['d_dicomSimple'])
+        if not self.fn_dcmRead:
+            dict.__setitem__(self, 'dcm', dcm)
+
+    def tagsToUse(self):
+        """
+        The tags that populate the per-tag dictionaries. Unless explicitly
+        set, this is the full list of tags in the file.
+        """
+        if self.l_tagsToUse is None:
+            return self['l_tagRaw']
+        return self.l_tagsToUse
+
+    def tagSimple_has(self, key):
+        """
+        Is <key> a member of the 'd_dicomSimple' dictionary?
+        """
+        if dict.__contains__(self, 'd_dicomSimple'):
+            return key in dict.__getitem__(self, 'd_dicomSimple')
+        return key in self.tagsToUse()
+
+    def tagSimple_get(self, key):
+        """
+        Return d_DICOM['d_dicomSimple'][key] -- computing (and caching) only
+        that one value if the full dictionary has not been built yet.
+        """
+        if dict.__contains__(self, 'd_dicomSimple'):
+            return dict.__getitem__(self, 'd_dicomSimple')[key]
+        if key not in self.d_simple and key not in self.tagsToUse():
+            raise KeyError(key)
+        return self.tagValue_get(key)
+
+    def tagValue_has(self, key):
+        """
+        Does the file have the tag <key>? Unlike tagSimple_has(), this is
+        not limited to the tags to use.
+        """
+        if key in self.s_known:
+            return key in self.d_simple
+        return key in self['l_tagRaw']
+
+    def tagRaw_among(self, l_tag):
+        """
+        The tags among <l_tag> that the file has, in 'l_tagRaw' order --
+        without building 'l_tagRaw' if they are all known tags.
+        """
+        if dict.__contains__(self, 'l_tagRaw') or not all(t in self.s_known for t in l_tag):
+            s_tag   = set(l_tag)
+            return [t for t in self['l_tagRaw'] if t in s_tag]
+        return sorted(t for t in set(l_tag) if t in self.d_simple)
+
+    def tagValue_get(self, key):
+        """
+        The value of the tag <key>, as tagSimple_get() has it, for any tag
+        of the file -- not only the tags to use, since an output file stem
+        template may need others.
+        """
+        if dict.__contains__(self, 'd_dicomSimple'):
+            d_dicomSimple   = dict.__getitem__(self, 'd_dicomSimple')
+            if key in d_dicomSimple:
+                return d_dicomSimple[key]
+        if key not in self.d_simple:
+            if self.b_indexed or key in self.s_known:
+                return "no attribute"
+            elem                = element_get(self['dcm'], key)
+            self.d_simple[key]  = elem.value if elem is not None else "no attribute"
+        return self.d_simple[key]
+
+    def pixelData_view(self):
+        """
+        The pixel data as a memoryview -- for a memory-mapped read, a
+        zero-copy view of the file. None if there is no pixel data.
+        """
+        dcm     = self['dcm']
+        if self.fn_pixelData:
+            return self.fn_pixelData()
+        if dcm is None or 'PixelData' not in dcm:
+            return None
+        return memoryview(dcm.PixelData)
+
+    def pixelArray_view(self):
+        """
+        The native pixel data as a flat numpy array view (needs numpy).
+        """
+        mv_pixel    = self.pixelData_view()
+        if mv_pixel is None:
+            return None
+        return mmapread.pixelArray_view(mv_pixel, self['dcm'])
+
+    def strRaw_get(self):
+        """
+        The full string representation of the DICOM dataset. If str(dcm)
+        fails, it is built by the 'strRawFallback' instead, and if that
+        too fails for any element, self.b_strRaw is set False, and so is
+        the status of the record that watches it (see record.py).
+        """
+        str_raw     = ''
+        dcm         = self['dcm']
+        if dcm is None:
+            return str_raw
+        if not (self.fn_strRawSkip and self.fn_strRawSkip(dcm)):
+            try:
+                return str(dcm)
+            except:
+                pass
+        b_status    = False
+        if self.fn_strRaw:
+            str_raw, b_status   = self.fn_strRaw(self['d_dcm'])
+        self.b_strRaw   = b_status
+        record          = self.ref_record() if self.ref_record else None
+        if not b_status and record is not None:
+            record.strRaw_failed()
+        return str_raw
+
+    def __missing__(self, key):
+        if key not in self.l_lazyKey:
+            raise KeyError(key)
+        if not self.profile or key == 'dcm':
+            return self.lazy_compute(key)
+        tic     = time.perf_counter()
+        value   = self.lazy_compute(key)
+        self.profile.add('strRaw' if key == 'strRaw' else 'tags',
+                         time.perf_counter() - tic)
+        return value
+
+    def lazy_compute(self, key):
+        """
+        Compute (and cache) the lazy <key>.
+        """
+        value   = None
+        if key == 'dcm':
+            value   = self.fn_dcmRead() if self.fn_dcmRead else None
+            dict.__setitem__(self, key, value)
+            return value
+        if key in ['d_dicomSimple', 'd_json'] and (self.b_indexed or self.s_known):
+            value   = {k : self.tagSimple_get(k) for k in self.tagsToUse()}
+            if key == 'd_json':
+                value   = {k : str(v) for k, v in value.items()}
+            dict.__setitem__(self, key, value)
+            return value
+        if key in ['d_dicom', 'd_dicomSimple', 'd_json']:
+            self.tags_compute()
+            return dict.__getitem__(self, key)
+        dcm     = self['dcm']
+        if key == 'strRaw':
+            value   = self.strRaw_get()
+        elif dcm is None:
+            value   = [] if key == 'l_tagRaw' else {}
+        elif key == 'd_dcm':
+            value   = dcm_dict(dcm)
+        elif key == 'l_tagRaw':
+            value   = dcm.dir()
+        dict.__setitem__(self, key, value)
+        return value
+
+    def tags_compute(self):
+        """
+        Build the 'd_dicom', 'd_dicomSimple' and 'd_json' dictionaries
+        (those not built yet) in one pass over the tags to use. A tag that
+        the dataset does not have is None in 'd_dicom' and "no attribute"
+        in the others. For an indexed map, whose tag values come from the
+        index, or a map with known tags, only 'd_dicom' is built here.
+        """
+        dcm         = self['dcm']
+        d_dicom     = {}
+        d_dicomSimple   = {}
+        d_json      = {}
+        for k in self.tagsToUse():
+            elem    = element_get(dcm, k) if dcm is not None else None
+            value   = elem.value if elem is not None else "no attribute"
+            d_dicom[k]          = elem
+            d_dicomSimple[k]    = value
+            d_json[k]           = str(value)
+        for key, value in [('d_dicom', d_dicom), ('d_dicomSimple', d_dicomSimple),
+                           ('d_json', d_json)]:
+            if dict.__contains__(self, key) or \
+               ((self.b_indexed or self.s_known) and key != 'd_dicom'):
+                continue
+            dict.__setitem__(self, key, value)
+
+    def heavy_drop(self):
+        """
+        Forget the pydicom dataset, and the 'd_dcm' and 'strRaw' built
+        from it, once they are no longer needed. The tag dictionaries are
+        built first (if they have not been), so that they stay as they
+        were; afterwards 'dcm' is None and 'd_dcm' and 'strRaw' are empty.
+        A dataset that has not been read (yet) is left to its reader.
+        """
+        if not dict.__contains__(self, 'dcm'):
+            return self
+        for key in ['l_tagRaw', 'd_dicom', 'd_dicomSimple', 'd_json']:
+            self[key]
+        for key in DICOMmap.l_heavyKey:
+            dict.pop(self, key, None)
+        dict.__setitem__(self, 'dcm', None)
+        self.fn_dcmRead     = None
+        self.fn_pixelData   = None
+        return self
+
+    def materialize(self):
+        """
+        Compute all the lazy keys.
+        """
+        for key in self.l_lazyKey:
+            if not dict.__contains__(self, key):
+                self[key]
+        return self
+
+    def __contains__(self, key):
+        return key in self.l_lazyKey or dict.__contains__(self, key)
+
+    def get(self, key, default = None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def setdefault(self, key, default = None):
+        if key in self:
+            return self[key]
+        self[key]   = default
+        return default
+
+    def pop(self, key, *args):
+        if key in self.l_lazyKey:
+            self.materialize()
+        return dict.pop(self, key, *args)
+
+    def keys(self):
+        return dict.keys(self.materialize())
+
+    def values(self):
+        return dict.values(self.materialize())
+
+    def items(self):
+        return dict.items(self.materialize())
+
+    def __iter__(self):
+        return dict.__iter__(self.materialize())
+
+    def __len__(self):
+        return dict.__len__(self.materialize())
+
+    def __eq__(self, other):
+        if isinstance(other, DICOMmap):
+            other.materialize()
+        return dict.__eq__(self.materialize(), other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return dict.__repr__(self.materialize())
+
+    def copy(self):
+        return dict(self.materialize())
+
+    __hash__    = None
+
+def tagSimple_has(d_DICOM, key):
+    """
+    Is <key> in d_DICOM['d_dicomSimple']? Works for a DICOMmap as well
+    as for a plain dictionary.
+    """
+    if isinstance(d_DICOM, DICOMmap):
+        return d_DICOM.tagSimple_has(key)
+    return key in d_DICOM['d_dicomSimple']
+
+def tagSimple_get(d_DICOM, key):
+    """
+    Return d_DICOM['d_dicomSimple'][key]. Works for a DICOMmap as well
+    as for a plain dictionary.
+    """
+    if isinstance(d_DICOM, DICOMmap):
+        return d_DICOM.tagSimple_get(key)
+    return d_DICOM['d_dicomSimple'][key]
+
+def tagValue_has(d_DICOM, key):
+    """
+    Does the file of <d_DICOM> have the tag <key> (see
+    DICOMmap.tagValue_has())? For a plain dictionary, is <key> in its
+    'd_dicomSimple'?
+    """
+    if isinstance(d_DICOM, DICOMmap):
+        return d_DICOM.tagValue_has(key)
+    return key in d_DICOM['d_dicomSimple']
+
+def tagRaw_among(d_DICOM, l_tag):
+    """
+    The tags among <l_tag> in d_DICOM['l_tagRaw'], in its order (see
+    DICOMmap.tagRaw_among()).
+    """
+    if isinstance(d_DICOM, DICOMmap):
+        return d_DICOM.tagRaw_among(l_tag)
+    s_tag   = set(l_tag)
+    return [t for t in d_DICOM['l_tagRaw'] if t in s_tag]
+
+def tagValue_get(d_DICOM, key):
+    """
+    The value of the tag <key> of the file of <d_DICOM>, whether or not
+    it is one of the tags to use (see DICOMmap.tagValue_get()). For a
+    plain dictionary, d_DICOM['d_dicomSimple'][key].
+    """
+    if isinstance(d_DICOM, DICOMmap):
+        return d_DICOM.tagValue_get(key)
+    return d_DICOM['d_dicomSimple'][key]
@@ -0,0 +1,124 @@
+"""
+The manifest of a previous run over an input tree, used to only
+re-process the directories whose files have changed since.
+
+The manifest is a JSON file that records, for each input directory
+that was successfully processed (and, if the run writes outputs, whose
+output was written), the (mtime, size, inode) fingerprint of each of
+its files and the output file stem that was generated for it. It also
+records the settings of the run that determine the output, and is only
+used if these are unchanged.
+"""
+
+import      os
+import      json
+
+class runManifest(object):
+    """
+    The manifest of the run in <outputDir>.
+    """
+
+    str_fileName    = '.pfdicom-manifest.json'
+
+    def __init__(self, str_outputDir, d_config, **kwargs):
+        """
+        <d_config> holds the run settings that the manifest is valid for;
+        values that JSON cannot hold are kept as strings.
+
+        kwargs:
+
+            fileName    = <the manifest file name in <outputDir>>
+        """
+        for k, v in kwargs.items():
+            if k == 'fileName':     self.str_fileName   = v
+        self.str_file       = os.path.join(str_outputDir, self.str_fileName)
+        self.d_config       = json.loads(json.dumps(d_config, default = str))
+        self.d_dir          = {}
+        self.d_dirPrev      = {}
+        self.d_fileStem     = {}
+        self.d_written      = {}
+        self.load()
+
+    def load(self):
+        """
+        Read the previous manifest, if there is one that is valid for
+        this run's settings.
+        """
+        try:
+            with open(self.str_file) as fp:
+                d_manifest  = json.load(fp)
+        except (OSError, ValueError):
+            return False
+        if d_manifest.get('d_config') != self.d_config:
+            return False
+        self.d_dirPrev  = d_manifest.get('d_dir', {})
+        return True
+
+    @staticmethod
+    def fingerprint(str_dir, l_file):
+        """
+        The {<file>: [mtime_ns, size, inode]} of the <l_file> in <str_dir>.
+        A file that cannot be stat'ed has no fingerprint.
+        """
+        d_fingerprint   = {}
+        for str_file in l_file:
+            try:
+                st  = os.stat(os.path.join(str_dir, str_file))
+            except OSError:
+                d_fingerprint[str_file] = None
+                continue
+            d_fingerprint[str_file] = [st.st_mtime_ns, st.st_size, st.st_ino]
+        return d_fingerprint
+
+    def unchanged(self, str_path, d_fingerprint):
+        """
+        Are the files in <str_path> the same as in the previous run?
+        If so, the directory's manifest entry is carried over.
+        """
+        d_prev  = self.d_dirPrev.get(str_path)
+        if not d_prev or None in d_fingerprint.values() or \
+           d_prev['d_fingerprint'] != d_fingerprint:
+            return False
+        self.d_dir[str_path]    = d_prev
+        return True
+
+    def written(self, str_outputPath):
+        """
+        Was the output of the run to <str_outputPath> written (and is it
+        forgotten now)? A write that failed, or was not done, is not.
+        """
+        return self.d_written.pop(str_outputPath, False)
+
+    def record(self, str_path, str_dir, d_fingerprint):
+        """
+        Add the processed directory <str_path> (found at <str_dir>) to the
+        manifest, with the output file stems generated for its files.
+        """
+        d_stem  = {}
+        for str_file in d_fingerprint:
+            str_stem    = self.d_fileStem.pop(
+                            os.path.abspath(os.path.join(str_dir, str_file)), None)
+            if str_stem is not None:
+                d_stem[str_file]    = str_stem
+        self.d_dir[str_path]    = {
+            'd_fingerprint':    d_fingerprint,
+            'd_stem':           d_stem
+        }
+
+    def save(self):
+        """
+        Write the manifest, replacing the previous one.
+        """
+        str_tmp     = '%s.%d' % (self.str_file, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(self.str_file) or '.', exist_ok = True)
+            with open(str_tmp, 'w') as fp:
+                json.dump({'d_config': self.d_config, 'd_dir': self.d_dir}, fp)
+            os.replace(str_tmp, self.str_file)
+        except OSError:
+            return False
+        self.d_dirPrev  = self.d_dir
+        self.d_dir      = {}
+        self.d_fileStem = {}
+        self.d_written  = {}
+        return True
@@ -0,0 +1,106 @@
+"""
+A memory-mapped DICOM read path.
+
+The file is mapped rather than read: pydicom parses the header
+straight from the map and stops at the pixel data, so only the pages
+of the header are ever touched. The pixel data is then available as a
+zero-copy memoryview (or, if numpy is installed, an ndarray view) of
+the mapped file.
+
+A map holds a (duplicated) file descriptor for as long as it is open,
+and a run keeps the record of every file it reads. So the map of the
+header is closed as soon as the header is parsed, and the file is
+mapped again, for as long as the caller holds the view, only when its
+pixel data is asked for.
+"""
+
+import      mmap
+import      struct
+
+import      pydicom             as      dicom
+
+try:
+    import  numpy
+except ImportError:
+    numpy   = None
+
+# The elements at which pydicom's 'stop_before_pixels' stops
+l_pixelTag  = [(0x7fe0, 0x0008), (0x7fe0, 0x0009), (0x7fe0, 0x0010)]
+
+# Explicit VRs with a 2 byte reserved field and a 4 byte length
+l_longVR    = [b'OB', b'OD', b'OF', b'OL', b'OV', b'OW', b'SQ', b'UC', b'UN', b'UR', b'UT']
+
+def file_map(str_file):
+    """
+    A read-only memory map of <str_file>.
+    """
+    with open(str_file, 'rb') as fp:
+        return mmap.mmap(fp.fileno(), 0, access = mmap.ACCESS_READ)
+
+def dcm_read(str_file, **kwargs):
+    """
+    Parse the header of <str_file> from a memory map of the file, and
+    return the (header only) dataset and a callable that returns the
+    pixel data view (see pixelData_view()). An already made map of the
+    file can be passed as <mm>. Other <kwargs> are passed to pydicom.
+
+    The map (also one passed as <mm>) is closed before returning.
+    """
+    kwargs['stop_before_pixels']    = True
+    mm          = kwargs.pop('mm', None) or file_map(str_file)
+    try:
+        dcm     = dicom.dcmread(mm, **kwargs)
+        offset  = mm.tell()
+    finally:
+        mm.close()
+    return dcm, lambda: pixelData_view(str_file, offset, dcm)
+
+def pixelData_view(str_file, offset, dcm):
+    """
+    A memoryview of the value of the pixel data element that starts at
+    <offset> in the <dcm> file <str_file>, or None if the file has no
+    pixel data. For encapsulated (compressed) pixel data the view holds
+    the item sequence, up to the end of the file.
+
+    The file is mapped anew for the view, and the map (and its file
+    descriptor) is released once the view is.
+
+    Deflated files cannot be viewed in place -- their pixel data is
+    read (and copied) by pydicom instead.
+    """
+    str_syntax  = getattr(getattr(dcm, 'file_meta', None), 'TransferSyntaxUID', '')
+    if str_syntax == dicom.uid.DeflatedExplicitVRLittleEndian:
+        dcm_full    = dicom.dcmread(str_file)
+        return memoryview(dcm_full.PixelData) if 'PixelData' in dcm_full else None
+
+    mm          = file_map(str_file)
+    str_endian  = '<' if dcm.is_little_endian else '>'
+    if offset + 8 > len(mm) or \
+       struct.unpack(str_endian + 'HH', mm[offset:offset + 4]) not in l_pixelTag:
+        mm.close()
+        return None
+    if dcm.is_implicit_VR:
+        (length,)   = struct.unpack(str_endian + 'L', mm[offset + 4:offset + 8])
+        start       = offset + 8
+    elif mm[offset + 4:offset + 6] in l_longVR:
+        (length,)   = struct.unpack(str_endian + 'L', mm[offset + 8:offset + 12])
+        start       = offset + 12
+    else:
+        (length,)   = struct.unpack(str_endian + 'H', mm[offset + 6:offset + 8])
+        start       = offset + 8
+    end         = len(mm) if length == 0xffffffff else min(start + length, len(mm))
+    return memoryview(mm)[start:end]
+
+def pixelArray_view(mv_pixel, dcm):
+    """
+    A flat numpy view of the native (uncompressed) pixel data in the
+    memoryview <mv_pixel>, typed from the <dcm> BitsAllocated. Needs
+    numpy.
+    """
+    if numpy is None:
+        raise ImportError('numpy is needed for pixel array views')
+    str_dtype   = {8: 'u1', 16: 'u2', 32: 'u4', 64: 'u8'}[int(dcm.BitsAllocated)]
+    if int(getattr(dcm, 'PixelRepresentation', 0)) == 1:
+        str_dtype   = 'i' + str_dtype[1:]
+    str_dtype   = ('<' if dcm.is_little_endian else '>') + str_dtype
+    return numpy.frombuffer(mv_pixel, dtype = str_dtype)
@@ -0,0 +1,98 @@
+"""
+Pseudonyms for the '%_name' tag function.
+
+By default a name is what the faker 'en_US' provider gives when seeded
+with the seed as pfdicom has always seeded it, so that a seeded name is
+the pseudonym earlier runs gave (with the same faker version). Each
+thread has its own Faker instance, seeded for each name, so no global
+random state is touched and a seeded name is the same in every thread
+and process. Seeded names are memoized.
+
+With the name table ('nameTable'), names are drawn from a table of the
+provider's first and last names by a hash of the seed. This is faster,
+but does not give the names of the default: a tree pseudonymized one
+way does not link with one pseudonymized the other.
+"""
+
+import      random
+import      hashlib
+import      threading
+import      functools
+
+# Per-thread Faker instance and generator for unseeded names
+d_thread    = threading.local()
+
+def seed_number(str_seed):
+    """
+    The number that pfdicom has always seeded faker with for <str_seed>:
+    its bytes as a little endian integer.
+    """
+    return int.from_bytes(str(str_seed).encode(), 'little')
+
+def faker_thread():
+    """
+    This thread's Faker instance (faker is only imported here).
+    """
+    if not hasattr(d_thread, 'fake'):
+        from    faker               import  Faker
+        d_thread.fake   = Faker()
+    return d_thread.fake
+
+def name_faker(seed = None):
+    """
+    The 'LAST^FIRST^ANON' name from the first two words of a faker name,
+    seeded by <seed> if it is not None.
+    """
+    fake            = faker_thread()
+    fake.seed_instance(seed)
+    l_firstLast     = fake.name().split()
+    return '%s^%s^ANON' % (l_firstLast[1].upper(), l_firstLast[0].upper())
+
+@functools.lru_cache(maxsize = 65536)
+def name_fakerSeeded(str_seed):
+    """
+    The (default) name for <str_seed>: always the same for the same seed.
+    """
+    return name_faker(seed_number(str_seed))
+
+@functools.lru_cache(maxsize = None)
+def table_get():
+    """
+    The (upper case) (first names, last names) table.
+    """
+    from    faker.providers.person.en_US    import Provider
+    return (tuple(sorted({name.upper() for name in Provider.first_names})),
+            tuple(sorted({name.upper() for name in Provider.last_names})))
+
+def name_make(index):
+    """
+    The 'LAST^FIRST^ANON' name at position <index> of the name table.
+    """
+    t_first, t_last = table_get()
+    first, last     = divmod(index % (len(t_first) * len(t_last)), len(t_last))
+    return '%s^%s^ANON' % (t_last[last], t_first[first])
+
+@functools.lru_cache(maxsize = 65536)
+def name_fromSeed(str_seed):
+    """
+    The name table name for <str_seed>: always the same for the same seed.
+    """
+    digest  = hashlib.blake2b(str(str_seed).encode('utf-8'), digest_size = 8).digest()
+    return name_make(int.from_bytes(digest, 'little'))
+
+def name_random():
+    """
+    A random name table name, from this thread's generator.
+    """
+    if not hasattr(d_thread, 'rng'):
+        d_thread.rng    = random.Random()
+    return name_make(d_thread.rng.getrandbits(64))
+
+def name_generate(str_seed = None, b_table = False):
+    """
+    A 'LAST^FIRST^ANON' name: deterministic for a <str_seed>, otherwise
+    random. With <b_table>, from the name table.
+    """
+    if b_table:
+        return name_random() if str_seed is None else name_fromSeed(str_seed)
+    return name_faker() if str_seed is None else name_fakerSeeded(str_seed)
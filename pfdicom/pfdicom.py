@@ -1,13 +1,16 @@
 # System imports
 import      os
+import      sys
+import      time
 import      getpass
 import      argparse
+import      io
 import      json
-import      pprint
 import      re
-from        faker               import  Faker
 import      math
+import      functools
 import      logging
+import      collections
 
 # Project specific imports
 import      pfmisc
@@ -21,14 +24,63 @@ from        pftree              import  pftree
 
 try:
     from    .                   import __name__, __version__
+    from    .dicommap           import DICOMmap, tagSimple_get, tagSimple_has, tagValue_get, \
+                                       tagValue_has, tagRaw_among, d_keywordTable
+    from    .template           import tagTemplate, stemMemo, column_transform
+    from    .                   import pool
+    from    .cache              import tagIndex
+    from    .manifest           import runManifest
+    from    .                   import names
+    from    .                   import mmapread
+    from    .profiling          import stageProfile
+    from    .series             import seriesCache, dcm_tags
+    from    .prefetch           import filePrefetch
+    from    .columnar           import tagTable, row_make
+    from    .                   import sniff
+    from    .strraw             import strRawExplicit
+    from    .record             import fileRecord
+    from    .                   import shard
+    from    .                   import stream
 except:
     from    __init__            import __name__, __version__
+    from    dicommap            import DICOMmap, tagSimple_get, tagSimple_has, tagValue_get, \
+                                       tagValue_has, tagRaw_among, d_keywordTable
+    from    template            import tagTemplate, stemMemo, column_transform
+    import                             pool
+    from    cache               import tagIndex
+    from    manifest            import runManifest
+    import                             names
+    import                             mmapread
+    from    profiling           import stageProfile
+    from    series              import seriesCache, dcm_tags
+    from    prefetch            import filePrefetch
+    from    columnar            import tagTable, row_make
+    import                             sniff
+    from    strraw              import strRawExplicit
+    from    record              import fileRecord
+    import                             shard
+    import                             stream
 
 
-import      pudb
 import      hashlib
 import      threading
 
+@functools.lru_cache(maxsize = None)
+def faker_get():
+    """
+    The (one, shared) Faker instance. Building it loads all of faker's
+    locale providers, so it is only done on first use.
+    """
+    from    faker               import  Faker
+    return Faker()
+
+class fakerAttribute(object):
+    """
+    The 'fake' class attribute of pfdicom: faker_get(), on first access.
+    """
+    def __get__(self, obj, cls = None):
+        return faker_get()
+
 class pfdicom(object):
     """
     The 'pfdicom' class essentially just wraps around a pydicom
@@ -46,10 +98,22 @@ class pfdicom(object):
     """
 
     # Turn off logging for the 'faker' module and create a class instance
-    # of the object
+    # of the object (on first access, since it is slow to build)
     fakelogger              = logging.getLogger('faker')
     fakelogger.propagate    = False
-    fake                    = Faker()
+    fake                    = fakerAttribute()
+
+    # The arguments that only change how a run is executed, not what it
+    # outputs: all others are part of the settings an '--incremental'
+    # run manifest is valid for. Derived classes with such arguments of
+    # their own extend this list.
+    l_manifestSkipArg       = [
+        'str_desc', 'verbosity', 'json', 'printElapsedTime', 'syslog', 'man',
+        'synopsis', 'b_version', 'threads', 'executor', 'workers', 'stream',
+        'ioConcurrency', 'ioOpen', 'mmap', 'dropDatasets', 'cacheDir',
+        'cacheMaxEntries', 'stemMemoSize', 'incremental', 'jsonStream',
+        'profile', 'profileExport', 'shard', 'shardBy'
+    ]
 
     def declare_selfvars(self):
         """
@@ -69,9 +133,85 @@ class pfdicom(object):
         self.dp                         = None
         self.log                        = None
         self.tic_start                  = 0.0
-        self.pp                         = pprint.PrettyPrinter(indent=4)
         self.verbosityLevel             = 1
 
+        # DICOM read behaviour
+        self.b_headerOnly               = False
+        self.b_mmap                     = False
+        self.readLog                    = sniff.readLog()
+        self.strRaw                     = strRawExplicit()
+        self.b_dropDatasets             = False
+
+        # Asynchronous read-ahead of file contents
+        self.ioConcurrency              = 0
+        self.ioLookahead                = 2
+        self.fn_ioOpen                  = open
+        self.prefetch                   = None
+
+        # Compiled output file stem templates, and the memory of their
+        # results
+        self.d_template                 = {}
+        self.d_templateTags             = {}
+        self.stemMemoSize               = 4096
+        self.stemMemo                   = None
+
+        # Pseudonyms from the hashed name table instead of seeded faker
+        self.b_nameTable                = False
+
+        # Persistent tag index
+        self.str_cacheDir               = ''
+        self.cacheMaxEntries            = 0
+        self.tagIndex                   = None
+
+        # Series-level reading
+        self.b_seriesLevel              = False
+        self.f_seriesSpotCheck          = 0.0
+        self.seriesCache                = None
+
+        # Incremental re-runs
+        self.b_incremental              = False
+        self.manifest                   = None
+
+        # Per-stage profiling
+        self.b_profile                  = False
+        self.str_profileExport          = ''
+        self.profile                    = None
+
+        # Columnar (Parquet/Arrow) export of the tags read
+        self.str_tagExport              = ''
+        self.l_exportTags               = []
+        self.tagExport                  = None
+        self.tls_tagExport              = threading.local()
+
+        # Streaming NDJSON output
+        self.b_jsonStream               = False
+        self.lock_jsonStream            = threading.Lock()
+        self.fn_jsonStream              = None
+
+        # Streaming traversal: the input tree is walked as it is processed
+        self.b_stream                   = False
+        self.fn_dirStream               = None
+
+        # Sharded runs: this run is shard <shardIndex> of <shardCount>
+        self.str_shard                  = ''
+        self.str_shardBy                = 'hash'
+        self.shardIndex                 = 0
+        self.shardCount                 = 0
+        self.d_shard                    = {}
+        self.l_stage                    = []
+
+        # Execution backend for tree_process()
+        self.str_executor               = 'thread'
+        self.numWorkers                 = 0
+
+    @functools.cached_property
+    def pp(self):
+        """
+        A pretty printer, built (and pprint imported) on first use.
+        """
+        import  pprint
+        return pprint.PrettyPrinter(indent=4)
+
     def __init__(self, *args, **kwargs):
         """
         A "base" class for all pfdicom objects. This class is typically never
@@ -91,12 +231,12 @@ class pfdicom(object):
             else:
                 self.str_outputDir  = str_outputDir
 
-        # pudb.set_trace()
+        # import pudb; pudb.set_trace()
         # The 'self' isn't fully instantiated, so
         # we call the following method on the class
         # directly.
-        pfdicom.declare_selfvars(self)
         self.args                       = args[0]
+        pfdicom.declare_selfvars(self)
         self.str_desc                   = self.args['str_desc']
         if len(self.args):
             kwargs  = {**self.args, **kwargs}
@@ -114,6 +254,79 @@ class pfdicom(object):
             if key == 'verbosity':          self.verbosityLevel         = int(value)
             if key == 'json':               self.b_json                 = bool(value)
             if key == 'followLinks':        self.b_followLinks          = bool(value)
+            if key == 'headerOnly':         self.b_headerOnly           = bool(value)
+            if key == 'mmap':               self.b_mmap                 = bool(value)
+            if key == 'dropDatasets':       self.b_dropDatasets         = bool(value)
+            if key == 'ioConcurrency':      self.ioConcurrency          = int(value)
+            if key == 'ioOpen':             self.fn_ioOpen              = value
+            if key == 'executor':           self.str_executor           = value
+            if key == 'workers':            self.numWorkers             = int(value)
+            if key == 'cacheDir':           self.str_cacheDir           = value
+            if key == 'cacheMaxEntries':    self.cacheMaxEntries        = int(value)
+            if key == 'incremental':        self.b_incremental          = bool(value)
+            if key == 'seriesLevel':        self.b_seriesLevel          = bool(value)
+            if key == 'seriesSpotCheck':    self.f_seriesSpotCheck      = float(value)
+            if key == 'jsonStream':         self.b_jsonStream           = bool(value)
+            if key == 'profile':            self.b_profile              = bool(value)
+            if key == 'profileExport':      self.str_profileExport      = value
+            if key == 'tagExport':          self.str_tagExport          = value
+            if key == 'exportTags':         self.l_exportTags           = [t for t in
+                                                                           value.split(',') if t]
+            if key == 'stemMemoSize':       self.stemMemoSize           = int(value)
+            if key == 'nameTable':          self.b_nameTable            = bool(value)
+            if key == 'shard':              self.str_shard              = value
+            if key == 'shardBy':            self.str_shardBy            = value
+            if key == 'stream':             self.b_stream               = bool(value)
+
+        if len(self.str_shard):
+            self.shardIndex, self.shardCount    = shard.shard_parse(self.str_shard)
+            if self.b_stream and self.str_shardBy != 'hash':
+                raise ValueError("a streamed shard is by 'hash' -- the '%s' "
+                                 "partition needs the whole tree" % self.str_shardBy)
+            # The files that each shard writes on its own
+            if len(self.str_profileExport):
+                self.str_profileExport  = shard.file_suffix(self.str_profileExport,
+                                                            self.shardIndex, self.shardCount)
+            if len(self.str_tagExport):
+                self.str_tagExport      = shard.file_suffix(self.str_tagExport,
+                                                            self.shardIndex, self.shardCount)
+
+        if self.b_profile or len(self.str_profileExport):
+            self.profile                = stageProfile()
+
+        if len(self.str_tagExport):
+            if len(self.l_exportTags):
+                self.tagExport          = tagTable(self.str_tagExport,
+                                                   l_tags = self.l_exportTags)
+            else:
+                self.tagExport          = tagTable(self.str_tagExport)
+
+        if self.stemMemoSize:
+            self.stemMemo               = stemMemo(self.stemMemoSize)
+
+        if len(self.str_cacheDir):
+            self.tagIndex               = tagIndex(
+                                            self.str_cacheDir,
+                                            maxEntries = self.cacheMaxEntries
+                                          )
+
+        if self.b_seriesLevel:
+            self.seriesCache            = seriesCache(spotCheck = self.f_seriesSpotCheck)
+
+        if self.b_incremental:
+            str_manifest                = runManifest.str_fileName
+            if self.shardCount:
+                str_manifest            = shard.file_suffix(str_manifest,
+                                                            self.shardIndex, self.shardCount)
+            self.manifest               = runManifest(
+                                            self.str_outputDir,
+                                            {
+                                                'tool':     type(self).__name__,
+                                                **{k : v for k, v in kwargs.items()
+                                                    if k not in self.l_manifestSkipArg}
+                                            },
+                                            fileName = str_manifest
+                                          )
 
         # Set logging
         self.dp                        = pfmisc.debug(
@@ -163,6 +376,67 @@ class pfdicom(object):
 
             006Y-7f38-output.txt
 
+        The template is compiled once (and cached) on first use; the
+        compiled form gives exactly the result of the original string
+        interpreter, tagsInString_interpret(), which it falls back to
+        for any template/tag combination it cannot prove equivalent.
+        Only the tags the template refers to are passed to it, so that a
+        file whose tags are known (see series.py) is not parsed for its
+        full tag list.
+        """
+        o_template      = None
+        d_result        = None
+
+        o_template      = self.template_get(astr)
+        d_result        = o_template.evaluate(
+                            tagRaw_among(d_DICOM, self.templateTags_get(astr)),
+                            lambda tag: tagValue_get(d_DICOM, tag),
+                            lambda tag: tagValue_has(d_DICOM, tag),
+                            self.name_generate
+        )
+        if d_result is None:
+            d_result    = self.tagsInString_interpret(d_DICOM, astr)
+        return d_result
+
+    def template_get(self, astr):
+        """
+        The (cached) compiled tagTemplate of <astr>. Its results are
+        remembered in the run's <stemMemo>.
+        """
+        o_template      = self.d_template.get(astr)
+        if o_template is None:
+            o_template              = tagTemplate(astr, memo = self.stemMemo)
+            self.d_template[astr]   = o_template
+        return o_template
+
+    def templateTags_get(self, astr):
+        """
+        The (cached) tags that the template <astr> could need, so that a
+        file read for only some tags is also read for these (see
+        tagTemplate.tags_referenced()).
+        """
+        l_tag           = self.d_templateTags.get(astr)
+        if l_tag is None:
+            l_tag       = []
+            if '%' in astr:
+                l_tag   = self.template_get(astr).tags_referenced(d_keywordTable)
+            self.d_templateTags[astr]   = l_tag
+        return l_tag
+
+    def name_generate(self, str_seed = None):
+        """
+        Return a random 'LAST^FIRST^ANON' name. If a <str_seed> is
+        passed, the same seed always gives the same name, in any thread
+        or process: by default the faker name of earlier versions, or
+        with 'nameTable' one from the name table (see names.py).
+        """
+        return names.name_generate(str_seed, b_table = self.b_nameTable)
+
+    def tagsInString_interpret(self, d_DICOM, astr, *args, **kwargs):
+        """
+        The reference interpreter for the '%'-tagged string templates
+        described in tagsInString_process(). The template is parsed
+        anew on each call by successive string replacements.
         """
 
         def md5_process(func, str_replace):
@@ -222,12 +496,6 @@ class pfdicom(object):
             astr        = astr.replace('_%s_' % func, '')
             return astr, str_replace
 
-        def convertToNumber (s):
-            return int.from_bytes(s.encode(), 'little')
-
-        def convertFromNumber (n):
-            return n.to_bytes(math.ceil(n.bit_length() / 8), 'little').decode()
-
         def name_process(func, str_replace):
             """
             replace str_replace with a name
@@ -241,25 +509,20 @@ class pfdicom(object):
             of the tag must be lower case to protect parsing of any non-arg
             DICOM tags.
             """
-            # pudb.set_trace()
+            # import pudb; pudb.set_trace()
             nonlocal    astr, d_DICOM
             l_funcTag   = []        # a function/tag list
             l_args      = []        # the 'args' of the function
             l_funcTag   = func.split('_')[1:]
             func        = l_funcTag[0]
             l_args      = func.split('|')
+            str_seed    = None
             if len(l_args) > 1:
                 str_argTag  = l_args[1]
                 str_argTag  = re.sub('([a-zA-Z])', lambda x: x.groups()[0].upper(), str_argTag, 1)
-                if str_argTag in d_DICOM['d_dicomSimple']:
-                    str_seed    = d_DICOM['d_dicomSimple'][str_argTag]
-                    randSeed    = convertToNumber(str_seed)
-                    Faker.seed(randSeed)
-            str_firstLast   = pfdicom.fake.name()
-            l_firstLast     = str_firstLast.split()
-            str_first       = l_firstLast[0]
-            str_last        = l_firstLast[1]
-            str_replace     = '%s^%s^ANON' % (str_last.upper(), str_first.upper())
+                if tagValue_has(d_DICOM, str_argTag):
+                    str_seed    = tagValue_get(d_DICOM, str_argTag)
+            str_replace     = self.name_generate(str_seed)
             astr            = astr.replace('_%s_' % func, '')
             return astr, str_replace
 
@@ -281,7 +544,7 @@ class pfdicom(object):
             )
             for tag, func in zip(l_tagsToSubSort, l_tags):
                 b_tagsFound     = True
-                str_replace     = d_DICOM['d_dicomSimple'][tag]
+                str_replace     = tagValue_get(d_DICOM, tag)
                 if 'md5'    in func: astr, str_replace   = md5_process(func, str_replace)
                 if 'strmsk' in func: astr, str_replace   = strmsk_process(func, str_replace)
                 if 'nospc'  in func: astr, str_replace   = nospc_process(func, str_replace)
@@ -300,55 +563,54 @@ class pfdicom(object):
         Read a DICOM file and perform some initial
         parsing of tags.
 
+        The result is a fileRecord (see record.py): a compact record
+        that can be used as the dictionary
+
+            {
+                'status', 'inputPath', 'inputFilename', 'outputFileStem',
+                'd_DICOM', 'l_tagsToUse'
+            }
+
+        The returned 'd_DICOM' is a DICOMmap: a dictionary whose tag
+        dictionaries and 'strRaw' dump are computed on first access.
+
+        The file is read by the first of
+
+            DICOMfile_readIndexed()     its tags are in the tag index
+                                        ('cacheDir');
+            DICOMfile_readShared()      its tags are shared with the
+                                        representative of its series
+                                        ('seriesLevel');
+            DICOMfile_readFull()        it is parsed (see DICOMfile_parse()
+                                        for 'headerOnly', 'mmap' and
+                                        'ioConcurrency');
+
+        that applies, and its record is made by DICOMfile_record().
+
+        Files that do not start like a DICOM file (see sniff.py) are not
+        parsed at all. Such files, and files that fail to read, are
+        counted in self.readLog rather than reported one by one.
+
+        If str() of the dataset fails, 'strRaw' is built element by
+        element instead (see strraw.py). Should that fail for any element,
+        'd_DICOM.b_strRaw' and the record's 'status' are set False when
+        'strRaw' is built -- as it is built on first access, a record
+        whose 'strRaw' is never accessed keeps the status of its read.
+
         NB!
         For thread safety, class member variables
         should not be assigned since other threads
         might override/change these variables in mid-
         flight!
         """
-
-        def dcmToStr_doExplicit(d_dcm):
-            """
-            Perform an explicit element by element conversion on dictionary
-            of dcm FileDataset
-            """
-            b_status = True
-            self.dp.qprint('In directory: %s' % os.getcwd(),     comms = 'error')
-            self.dp.qprint('Failed to str convert %s' % str_file,comms = 'error')
-            self.dp.qprint('Possible source corruption or non standard tag',
-                            comms = 'error')
-            self.dp.qprint('Attempting explicit string conversion...',
-                            comms = 'error')
-            l_k         = list(d_dcm.keys())
-            str_raw     = ''
-            str_err     = ''
-            for k in l_k:
-                try:
-                    str_raw += str(d_dcm[k])
-                    str_raw += '\n'
-                except:
-                    str_err = 'Failed to string convert key "%s"' % k
-                    str_raw += str_err + "\n"
-                    self.dp.qprint(str_err, comms = 'error')
-                    b_status = False
-            return str_raw, b_status
-
         b_status        = False
         l_tags          = []
-        l_tagsToUse     = []
-        d_tagsInString  = {}
         str_file        = ""
-        str_outputFile  = ""
-
-        d_DICOM           = {
-            'dcm':              None,
-            'd_dcm':            {},
-            'strRaw':           '',
-            'l_tagRaw':         [],
-            'd_json':           {},
-            'd_dicom':          {},
-            'd_dicomSimple':    {}
-        }
+        d_readArgs      = {}
+        d_DICOM         = None
+        d_peek          = None
+        data            = None
+        tic_file        = time.perf_counter() if self.profile else 0
 
         for k, v in kwargs.items():
             if k == 'file':             str_file    = v
@@ -358,24 +620,212 @@ class pfdicom(object):
             l_file          = args[0]
             str_file        = l_file[0]
 
+        d_readArgs      = self.readArgs_get(l_tags)
+        if self.ioConcurrency and not self.b_mmap:
+            data        = self.prefetch_take(str_file)
+
+        if self.tagIndex:
+            d_DICOM             = self.DICOMfile_readIndexed(str_file, d_readArgs)
+        if d_DICOM is None and self.seriesCache:
+            d_DICOM, d_peek     = self.DICOMfile_readShared(str_file, d_readArgs, data)
+        if d_DICOM is None:
+            d_DICOM, b_status   = self.DICOMfile_readFull(str_file, d_readArgs, data,
+                                                          d_peek, l_tags)
+        else:
+            b_status            = True
+
+        d_record        = self.DICOMfile_record(str_file, d_DICOM, b_status, l_tags)
+        if self.profile:
+            self.profile.add('file', time.perf_counter() - tic_file)
+        return d_record
+
+    def readArgs_get(self, l_tags):
+        """
+        The pydicom read arguments of a file read for the tags <l_tags>.
+        With 'headerOnly', the parse stops before the PixelData element
+        and, if <l_tags> are passed (and the file is not going into the
+        tag index, which holds all its tags), only those tags and the
+        tags that the output file stem template needs are parsed at all.
+        """
+        d_readArgs      = {}
+        if self.b_headerOnly:
+            d_readArgs['stop_before_pixels']    = True
+            if len(l_tags) and not self.tagIndex:
+                d_readArgs['specific_tags']     = [
+                    t for t in set(l_tags + self.templateTags_get(self.str_outputFileStem))
+                        if t != 'PixelData' and t in d_keywordTable
+                ]
+        return d_readArgs
+
+    def prefetch_take(self, str_file):
+        """
+        The contents of <str_file> if the prefetch pipeline (see
+        prefetch_get()) has read them ahead, else None. The wait for them
+        is timed as the file 'open'.
+        """
+        tic     = time.perf_counter() if self.profile else 0
+        data    = self.prefetch_get().take(str_file)
+        if self.profile and data is not None:
+            self.profile.add('open', time.perf_counter() - tic)
+        return data
+
+    def DICOMmap_make(self, dcm = None, **kwargs):
+        """
+        A DICOMmap of <dcm> (see dicommap.py) with the explicit 'strRaw'
+        conversion and profile of this object, and the DICOMmap <kwargs>.
+        """
+        return DICOMmap(
+                    dcm,
+                    strRawFallback  = self.strRaw.dcmToStr_doExplicit,
+                    strRawSkip      = self.strRaw.failure_known,
+                    profile         = self.profile,
+                    **kwargs
+        )
+
+    def DICOMfile_parse(self, str_file, d_readArgs, data = None, d_DICOM = None):
+        """
+        Parse the dataset of <str_file> with the pydicom <d_readArgs>:
+        from its read-ahead contents <data>, if there are any, or, with
+        'mmap', from a memory map of the file. The map is closed once
+        the header is parsed, and the offset of the pixel data kept for
+        the pixelData_view() of <d_DICOM> to map the file again.
+
+        The start of the file is sniffed first: a file that is not
+        DICOM raises sniff.notDICOM without being parsed.
+        """
+        tic     = time.perf_counter() if self.profile else 0
+        if self.b_mmap:
+            try:
+                mm  = mmapread.file_map(str_file)
+            except ValueError:
+                # Only an empty file cannot be mapped
+                raise sniff.notDICOM('empty file')
+            dcm, fn_pixelData   = mmapread.dcm_read(
+                str_file, mm = mm, **d_readArgs, **sniff.fp_check(mm)
+            )
+            if d_DICOM is not None:
+                d_DICOM.fn_pixelData    = fn_pixelData
+            if self.profile:
+                self.profile.add('parse', time.perf_counter() - tic)
+            return dcm
+        if data is not None:
+            fp      = io.BytesIO(data)
+            dcm     = dicom.read_file(fp, **d_readArgs, **sniff.fp_check(fp))
+            if self.profile:
+                self.profile.add('parse', time.perf_counter() - tic, len(data))
+            return dcm
+        with open(str_file, 'rb') as fp:
+            d_sniffArgs = sniff.fp_check(fp)
+            if not self.profile:
+                return dicom.read_file(fp, **d_readArgs, **d_sniffArgs)
+            # Profiled, the file open (and sniff) is timed on its own,
+            # and the bytes that pydicom consumed are counted
+            self.profile.add('open', time.perf_counter() - tic)
+            tic     = time.perf_counter()
+            dcm     = dicom.read_file(fp, **d_readArgs, **d_sniffArgs)
+            self.profile.add('parse', time.perf_counter() - tic, fp.tell())
+        return dcm
+
+    def DICOMfile_readIndexed(self, str_file, d_readArgs):
+        """
+        The DICOMmap of <str_file> served from the tag index, or None if
+        the file is not (or no longer) in it. The file itself is only
+        parsed if a caller needs its dataset.
+        """
+        d_index     = self.tagIndex.get(str_file)
+        if not d_index:
+            return None
+
+        def dcm_read():
+            return self.DICOMfile_parse(str_file, d_readArgs, d_DICOM = d_DICOM)
+
+        d_DICOM     = self.DICOMmap_make(d_index = d_index, dcmReader = dcm_read)
+        return d_DICOM
+
+    def DICOMfile_readShared(self, str_file, d_readArgs, data):
+        """
+        With 'seriesLevel', once a representative of the series of
+        <str_file> has been read in its directory, only the start of the
+        file is parsed (a 'peek', see series.py) and the series tags are
+        taken from the representative. Returns
+
+            (<the DICOMmap of the file, or None if it is to be read in
+              full>, <its peek, if it was peeked>)
+
+        The file itself is only parsed if a caller needs its dataset, or
+        any tag that is neither peeked nor a series tag.
+        """
+        str_path    = os.path.dirname(str_file)
+        if not self.seriesCache.path_has(str_path):
+            return None, None
+        d_peek      = self.seriesCache.peek(str_file, data)
+        if not d_peek or self.seriesCache.spotCheck_due(str_file):
+            return None, d_peek
+        d_shared    = self.seriesCache.tags_share(str_path, d_peek)
+        if not d_shared:
+            return None, d_peek
+
+        def dcm_read():
+            return self.DICOMfile_parse(str_file, d_readArgs, data, d_DICOM)
+
+        d_DICOM     = self.DICOMmap_make(d_known = d_shared, dcmReader = dcm_read)
+        self.seriesCache.count('shared')
+        return d_DICOM, d_peek
+
+    def DICOMfile_readFull(self, str_file, d_readArgs, data, d_peek, l_tags):
+        """
+        Parse <str_file> and return (<its DICOMmap>, <status>); a file
+        that fails to read is logged, and has an empty DICOMmap.
+
+        With a tag index, the tags of the file are put into it. With
+        'seriesLevel', the file becomes the representative of its series
+        in its directory -- or, if it was only read to spot check its
+        peek <d_peek>, the tags shared with the representative are
+        checked against its own (see series.py).
+        """
+        d_DICOM     = self.DICOMmap_make()
+        str_path    = os.path.dirname(str_file)
+        try:
+            d_DICOM['dcm']  = self.DICOMfile_parse(str_file, d_readArgs, data, d_DICOM)
+        except Exception as e:
+            self.readFailure_log(str_file, e)
+            return d_DICOM, False
+        if not (self.tagIndex or self.seriesCache):
+            return d_DICOM, True
+
+        tic     = time.perf_counter() if self.profile else 0
+        d_tags  = dcm_tags(d_DICOM['dcm'])
+        if self.profile:
+            self.profile.add('tags', time.perf_counter() - tic)
+        if self.tagIndex:
+            self.tagIndex.put(str_file, d_tags['l_tagRaw'], d_tags['d_dicomSimple'])
+        if self.seriesCache and not d_peek:
+            # Not peeked, as the first of its directory: its start is
+            # taken from the full read
+            d_peek  = self.seriesCache.peek_make(d_tags)
+        if d_peek:
+            if self.seriesCache.spotCheck_due(str_file):
+                self.seriesCache.check(str_path, d_peek, d_tags, l_tags)
+            self.seriesCache.representative_set(str_path, d_peek['seriesUID'], d_tags)
+        return self.DICOMmap_make(
+                    d_DICOM['dcm'],
+                    d_index         = d_tags,
+                    pixelDataReader = d_DICOM.fn_pixelData
+        ), True
+
+    def DICOMfile_record(self, str_file, d_DICOM, b_status, l_tags):
+        """
+        The fileRecord of the file <str_file> read into <d_DICOM>: for a
+        file that was read, the tags to use (<l_tags>, or all the tags of
+        the file) are set and its output file stem is made -- and noted
+        in the run manifest and tag export, if there are any.
+        """
+        l_tagsToUse     = []
+        str_outputFile  = ''
         str_localFile   = os.path.basename(str_file)
         str_path        = os.path.dirname(str_file)
 
-        try:
-            d_DICOM['dcm']  = dicom.read_file(str_file)
-            b_status        = True
-        except:
-            self.dp.qprint('In directory: %s' % os.getcwd(),    comms = 'error')
-            self.dp.qprint('Failed to read %s' % str_file,      comms = 'error')
-            b_status        = False
         if b_status:
-            d_DICOM['l_tagRaw'] = d_DICOM['dcm'].dir()
-            d_DICOM['d_dcm']    = dict(d_DICOM['dcm'])
-            try:
-                d_DICOM['strRaw']   = str(d_DICOM['dcm'])
-            except:
-                d_DICOM['strRaw'], b_status = dcmToStr_doExplicit(d_DICOM['d_dcm'])
-
             if len(l_tags):
                 l_tagsToUse     = l_tags
             else:
@@ -384,35 +834,1155 @@ class pfdicom(object):
             if 'PixelData' in l_tagsToUse:
                 l_tagsToUse.remove('PixelData')
 
-            for key in l_tagsToUse:
-                d_DICOM['d_dicom'][key]       = d_DICOM['dcm'].data_element(key)
-                try:
-                    d_DICOM['d_dicomSimple'][key] = getattr(d_DICOM['dcm'], key)
-                except:
-                    d_DICOM['d_dicomSimple'][key] = "no attribute"
-                d_DICOM['d_json'][key]        = str(d_DICOM['d_dicomSimple'][key])
+            # The per-tag dictionaries as well as 'strRaw' are only
+            # built when (and if) a caller accesses them.
+            d_DICOM.l_tagsToUse = l_tagsToUse
 
-            # pudb.set_trace()
+            tic             = time.perf_counter() if self.profile else 0
             d_tagsInString  = self.tagsInString_process(d_DICOM, self.str_outputFileStem)
             str_outputFile  = d_tagsInString['str_result']
+            if self.profile:
+                self.profile.add('template', time.perf_counter() - tic)
+            if self.manifest:
+                self.manifest.d_fileStem[os.path.abspath(str_file)] = str_outputFile
+            if self.tagExport:
+                self.tagExport_rowAdd(str_path, str_localFile, str_outputFile,
+                                      {t : tagSimple_get(d_DICOM, t) for t in l_tagsToUse})
+
+        return fileRecord(
+            status          = b_status,
+            inputPath       = str_path,
+            inputFilename   = str_localFile,
+            outputFileStem  = str_outputFile,
+            d_DICOM         = d_DICOM,
+            l_tagsToUse     = l_tagsToUse
+        ).strRaw_watch()
+
+    def readFailure_log(self, str_file, e):
+        """
+        Count a file that was rejected as not DICOM, or that failed to
+        read with the exception <e>. Only a summary of these is reported
+        at the end of tree_process(); the files themselves are only
+        printed at higher verbosity.
+        """
+        str_kind    = 'rejected' if isinstance(e, sniff.notDICOM) else 'failed'
+        str_reason  = '%s: %s' % (type(e).__name__, e)
+        self.readLog.add(str_kind, str_file, str_reason)
+        self.dp.qprint('%s %s (%s)' % (str_kind.capitalize(), str_file, str_reason),
+                        comms = 'error', level = 2)
+
+    def DICOMdir_read(self, str_path, l_tagsToUse = None, **kwargs):
+        """
+        Read the headers of all the DICOM files in directory <str_path>
+        in one call, and return their tags as columns:
+
+            {
+                'status':           <True if any file could be read>,
+                'inputPath':        <str_path>,
+                'l_filename':       [<file name>, ...],
+                'l_status':         [<file read ok?>, ...],
+                'l_tagsToUse':      [<tag>, ...],
+                'd_column':         {<tag>: [<value per file>, ...], ...},
+                'l_outputFileStem': [<output file stem per file>, ...],
+                'filesRead':        <number of files read ok>
+            }
+
+        All the lists are aligned with 'l_filename'. A tag that a file
+        does not have is "no attribute" in its column (as in a
+        DICOMfile_read() 'd_dicomSimple'); a file that could not be read
+        has None in every column and an empty output file stem.
+
+        Unlike DICOMfile_read(), which does this for every file, the tag
+        keywords are resolved to tag numbers and the output file stem
+        template is compiled once per directory, and each file is parsed
+        only up to its pixel data and only for the <l_tagsToUse> and the
+        tags the template needs. If no <l_tagsToUse> are passed, the
+        columns are all the tags found in any of the files.
+
+        The tag index and read-ahead are used as in DICOMfile_read();
+        series-level sharing and memory maps are not.
+
+        kwargs:
+
+            l_file          = <the file names in <str_path> to read; default
+                               all its files that do not start with '.'>
+            d_transform     = <{<tag>: <function>, ...}: transform these
+                               columns (after the output file stems are
+                               made from the original values), each in a
+                               single call, with the template function
+                               given as in a template: 'md5|<chars>',
+                               'strmsk|<mask>', 'nospc|<char>' (see
+                               template.column_transform()). Values that
+                               are not strings are taken as str(<value>).>
+        """
+        b_status        = False
+        l_file          = None
+        d_transform     = {}
+        l_keywordTag    = []
+        l_tagResult     = []
+        l_tagRawFile    = []
+        l_simple        = []
+        d_keyword       = d_keywordTable
+        o_template      = self.template_get(self.str_outputFileStem)
+        prefetch        = None
+
+        for k, v in kwargs.items():
+            if k == 'l_file':       l_file      = list(v)
+            if k == 'd_transform':  d_transform = v
+        if l_tagsToUse is None:
+            l_tagsToUse = []
+
+        if l_file is None:
+            l_file  = sorted(f for f in os.listdir(str_path) if not f.startswith('.') and
+                                os.path.isfile(os.path.join(str_path, f)))
+        l_path          = ['%s/%s' % (str_path, f) for f in l_file]
+        files           = len(l_file)
+        l_status        = [False] * files
+        l_stem          = [''] * files
+
+        # The keyword -> tag number resolution, once for all the files
+        l_tags          = [t for t in l_tagsToUse if t != 'PixelData']
+        l_tagTemplate   = self.templateTags_get(self.str_outputFileStem)
+        if len(l_tags):
+            l_keywordTag    = sorted((t, d_keyword[t][0]) for t in set(l_tags + l_tagTemplate)
+                                        if t in d_keyword)
+        d_readArgs      = {'stop_before_pixels': True}
+        if len(l_keywordTag) and not self.tagIndex:
+            d_readArgs['specific_tags'] = [tag for t, tag in l_keywordTag]
+
+        if self.ioConcurrency:
+            prefetch    = self.prefetch_get()
+            prefetch.schedule(l_path)
+
+        for i, str_file in enumerate(l_path):
+            d_simple    = None
+            d_index     = self.tagIndex.get(str_file) if self.tagIndex else None
+            data        = prefetch.take(str_file) if prefetch else None
+            if d_index:
+                l_tagRaw    = d_index['l_tagRaw']
+                d_simple    = d_index['d_dicomSimple']
+            else:
+                tic     = time.perf_counter() if self.profile else 0
+                try:
+                    with io.BytesIO(data) if data is not None else open(str_file, 'rb') as fp:
+                        dcm = dicom.read_file(fp, **d_readArgs, **sniff.fp_check(fp))
+                except Exception as e:
+                    self.readFailure_log(str_file, e)
+                    dcm     = None
+                if dcm is not None:
+                    if self.profile:
+                        self.profile.add('parse', time.perf_counter() - tic)
+                    if 'specific_tags' in d_readArgs:
+                        # Looked up by tag number, in keyword order (as
+                        # dcm.dir() lists them)
+                        l_tagRaw    = []
+                        d_simple    = {}
+                        for t, tag in l_keywordTag:
+                            if tag not in dcm: continue
+                            l_tagRaw.append(t)
+                            try:
+                                d_simple[t] = dcm[tag].value
+                            except:
+                                d_simple[t] = "no attribute"
+                    else:
+                        d_tags      = dcm_tags(dcm)
+                        l_tagRaw    = d_tags['l_tagRaw']
+                        d_simple    = d_tags['d_dicomSimple']
+                    if self.tagIndex:
+                        self.tagIndex.put(str_file, l_tagRaw, d_simple)
+            if d_simple is None:
+                l_tagRawFile.append([])
+                l_simple.append(None)
+                continue
+            l_status[i]     = True
+            l_tagRawFile.append(l_tagRaw)
+            l_simple.append(d_simple)
+
+        if prefetch:
+            prefetch.discard(l_path)
+
+        l_tagResult     = l_tags or sorted(set().union(*l_tagRawFile) - {'PixelData'})
+        d_column        = {tag : [None] * files for tag in l_tagResult}
+        for i, d_simple in enumerate(l_simple):
+            if d_simple is None: continue
+            b_status    = True
+            for tag in l_tagResult:
+                d_column[tag][i]    = d_simple.get(tag, "no attribute")
+        for tag, str_func in d_transform.items():
+            if tag in d_column:
+                d_column[tag]   = column_transform(
+                                    [v if v is None or isinstance(v, str) else str(v)
+                                        for v in d_column[tag]],
+                                    str_func
+                                  )
+
+        for i, d_simple in enumerate(l_simple):
+            if d_simple is None: continue
+            tic         = time.perf_counter() if self.profile else 0
+            d_stem      = o_template.evaluate(
+                            l_tagRawFile[i],
+                            d_simple.__getitem__,
+                            d_simple.__contains__,
+                            self.name_generate
+            )
+            if d_stem is None:
+                d_stem  = self.tagsInString_interpret(
+                            {'l_tagRaw': l_tagRawFile[i], 'd_dicomSimple': d_simple},
+                            self.str_outputFileStem
+                )
+            l_stem[i]   = d_stem['str_result']
+            if self.profile:
+                self.profile.add('template', time.perf_counter() - tic)
+            if self.manifest:
+                self.manifest.d_fileStem[os.path.abspath(l_path[i])]  = l_stem[i]
+            if self.tagExport:
+                self.tagExport_rowAdd(str_path, l_file[i], l_stem[i],
+                                      {t : d_column[t][i] for t in l_tagResult})
 
         return {
             'status':           b_status,
             'inputPath':        str_path,
-            'inputFilename':    str_localFile,
-            'outputFileStem':   str_outputFile,
-            'd_DICOM':          d_DICOM,
-            'l_tagsToUse':      l_tagsToUse
+            'l_filename':       l_file,
+            'l_status':         l_status,
+            'l_tagsToUse':      l_tagResult,
+            'd_column':         d_column,
+            'l_outputFileStem': l_stem,
+            'filesRead':        sum(l_status)
+        }
+
+    def tagExport_rowAdd(self, str_path, str_filename, str_outputFileStem, d_tag):
+        """
+        Add a file that was read to the tag export rows of the directory
+        being read (see tagExport_wrap()). Files read outside of the input
+        read callback are not exported.
+        """
+        l_row   = getattr(self.tls_tagExport, 'l_row', None)
+        if l_row is not None:
+            l_row.append(row_make(str_path, str_filename, str_outputFileStem, d_tag))
+
+    def tagExport_wrap(self, kwargs):
+        """
+        Wrap the input read callback in <kwargs> so that the files it
+        reads are exported, one row group per directory.
+        """
+        fn_inputReadCallback    = kwargs.get('inputReadCallback')
+        if not fn_inputReadCallback:
+            return kwargs
+
+        def inputRead(at_data, **kwargs):
+            self.tls_tagExport.l_row    = []
+            try:
+                return fn_inputReadCallback(at_data, **kwargs)
+            finally:
+                l_row                       = self.tls_tagExport.l_row
+                self.tls_tagExport.l_row    = None
+                self.tagExport.batch_add(l_row)
+
+        kwargs  = kwargs.copy()
+        kwargs['inputReadCallback'] = inputRead
+        return kwargs
+
+    def datasetsDrop_wrap(self, kwargs):
+        """
+        Wrap the analysis callback in <kwargs> so that, once it is done
+        with a directory, the heavy parts of the file records read for it
+        (the pydicom datasets and their 'd_dcm' and 'strRaw') are dropped.
+        Only the tag dictionaries are kept until the run completes.
+        """
+        fn_analysisCallback     = kwargs.get('analysisCallback')
+        if not fn_analysisCallback:
+            return kwargs
+
+        def records_drop(obj):
+            if isinstance(obj, fileRecord):
+                obj.heavy_drop()
+            elif isinstance(obj, DICOMmap):
+                obj.heavy_drop()
+            elif isinstance(obj, dict):
+                for v in obj.values(): records_drop(v)
+            elif isinstance(obj, (list, tuple)):
+                for v in obj: records_drop(v)
+
+        def analysis(at_data, **kwargs):
+            try:
+                return fn_analysisCallback(at_data, **kwargs)
+            finally:
+                records_drop(at_data[1])
+
+        kwargs  = kwargs.copy()
+        kwargs['analysisCallback']  = analysis
+        return kwargs
+
+    def prefetch_get(self):
+        """
+        The prefetch pipeline of this process. A pipeline's reader
+        threads do not survive a fork, so a worker process that inherited
+        the parent's pipeline starts its own.
+        """
+        if not self.prefetch or self.prefetch.pid != os.getpid():
+            self.prefetch   = filePrefetch(self.ioConcurrency, fileOpen = self.fn_ioOpen)
+        return self.prefetch
+
+    def prefetch_wrap(self, kwargs, lookahead):
+        """
+        Wrap the input read callback in <kwargs> so that, before it reads
+        a directory, the files of that directory and of the next
+        <lookahead> directories of the input tree are scheduled for
+        read-ahead. Whatever the callback did not take is dropped once it
+        returns.
+        """
+        fn_inputReadCallback    = kwargs.get('inputReadCallback')
+        if not fn_inputReadCallback:
+            return kwargs
+        l_path      = [path for path, data in self.pf_tree.d_inputTree.items()
+                            if isinstance(data, list)]
+        d_index     = {path : i for i, path in enumerate(l_path)}
+
+        def dir_files(path, data = None):
+            if data is None:
+                data    = self.pf_tree.d_inputTree.get(path)
+            return ['%s/%s' % (path, f) for f in data or [] if isinstance(f, str)]
+
+        def inputRead(at_data, **kwargs):
+            path, data  = at_data
+            prefetch    = self.prefetch_get()
+            prefetch.schedule(dir_files(path, data))
+            if path in d_index:
+                for str_next in l_path[d_index[path] + 1 : d_index[path] + 1 + lookahead]:
+                    prefetch.schedule(dir_files(str_next))
+            try:
+                return fn_inputReadCallback(at_data, **kwargs)
+            finally:
+                prefetch.discard(dir_files(path, data))
+
+        kwargs  = kwargs.copy()
+        kwargs['inputReadCallback'] = inputRead
+        return kwargs
+
+    def tree_process(self, *args, **kwargs):
+        """
+        Process the input tree with the read/analysis/write callbacks
+        in kwargs -- see pftree.tree_process() for the full contract.
+        Derived classes should call this rather than the pftree
+        delegate directly so that the execution backend can be chosen:
+
+            executor = 'thread'     the pftree delegate processes the tree,
+                                    threading the analysis step over
+                                    <workers> threads (if given);
+
+            executor = 'process'    the tree is processed by a pool of
+                                    <workers> (default: all CPUs) worker
+                                    processes, each running the read,
+                                    analysis and write callbacks for
+                                    whole directories.
+
+        With a <tagExport> file, the tags of every file that the input
+        read callback reads are written to it (see columnar.py).
+
+        If run <incremental>ly, the directories whose files are unchanged
+        since the previous run (as recorded in its manifest) are skipped.
+
+        With an <ioConcurrency>, the files of each directory (and, in the
+        'thread' executor, of the next few directories) are read ahead
+        while earlier files are being parsed.
+
+        With <dropDatasets>, the pydicom datasets of a directory's files
+        are dropped as soon as its analysis callback is done.
+
+        With <stream>, the input tree was not walked by run(): it is
+        walked here, a directory at a time, and each directory processed
+        as it is found (see tree_stream()).
+        """
+        d_ret           = {}
+        b_pool          = False
+        d_fingerprint   = {}
+        d_inputTree     = self.pf_tree.d_inputTree
+        dirsSkipped     = 0
+
+        # The stages that this run's status is made of
+        self.l_stage    = shard.stages_get(kwargs)
+        if self.b_stream:
+            return self.treeResults_add(self.tree_streamProcess(*args, **kwargs))
+
+        if self.manifest:
+            for path, data in d_inputTree.items():
+                if isinstance(data, list):
+                    d_fingerprint[path] = self.manifest.fingerprint(self.path_resolve(path), data)
+            self.pf_tree.d_inputTree    = {
+                path : data for path, data in d_inputTree.items()
+                    if not (path in d_fingerprint and
+                            self.manifest.unchanged(path, d_fingerprint[path]))
+            }
+            dirsSkipped     = len(d_inputTree) - len(self.pf_tree.d_inputTree)
+
+        b_pool          = self.pool_check()
+        # A pool worker does not know which directory it gets next
+        kwargs          = self.callbacks_wrap(kwargs, 0 if b_pool else self.ioLookahead)
+        if not len(self.pf_tree.d_inputTree) and dirsSkipped:
+            # Nothing has changed since the previous run
+            self.pf_tree.d_outputTree   = {}
+            d_ret   = {
+                'status':               True,
+                'processType':          'Incremental (no changes)',
+                'fileSetsProcessed':    1,
+                'filesRead':            0,
+                'filesAnalyzed':        0,
+                'filesSaved':           0,
+                'd_inputCallback':      {'status': True},
+                'd_analyzeCallback':    {'status': True},
+                'd_outputCallback':     {'status': True}
+            }
+        elif b_pool:
+            d_ret   = self.tree_processPool(*args, **kwargs)
+        else:
+            if self.numWorkers:
+                self.pf_tree.numThreads = self.numWorkers
+            if self.b_jsonStream:
+                kwargs  = self.jsonStream_wrap(kwargs)
+            d_ret   = self.pf_tree.tree_process(*args, **kwargs)
+        if self.prefetch:
+            self.prefetch.close()
+            self.prefetch   = None
+        if self.manifest:
+            for path, d_fp in d_fingerprint.items():
+                if path not in self.manifest.d_dir:
+                    self.manifest_record(path, d_fp, self.pf_tree.d_inputTree.get(path),
+                                         kwargs.get('outputWriteCallback'))
+            self.manifest.save()
+            d_ret['d_incremental']  = {
+                'manifest':         self.manifest.str_file,
+                'dirsSkipped':      dirsSkipped,
+                'dirsProcessed':    len(d_inputTree) - dirsSkipped
+            }
+        return self.treeResults_add(d_ret)
+
+    def path_resolve(self, str_path):
+        """
+        The input tree directory <str_path> as a path that can be opened
+        (the tree's paths are relative to <inputDir> with <relativeDir>).
+        """
+        if os.path.isabs(str_path):
+            return str_path
+        return os.path.join(self.str_inputDir, str_path)
+
+    def outputPath_get(self, str_path):
+        """
+        The output directory that the write callback is passed for the
+        input tree directory <str_path>, as pftree makes it.
+        """
+        str_outputLeafDir   = self.pf_tree.str_outputLeafDir
+        if len(str_outputLeafDir):
+            (dirname, basename) = os.path.split(str_path)
+            str_path    = '%s/%s' % (dirname, str_outputLeafDir % basename)
+        return '%s/%s' % (self.pf_tree.str_outputDir, str_path)
+
+    def manifest_record(self, str_path, d_fingerprint, b_result, b_write):
+        """
+        Record the input tree directory <str_path> (whose files have the
+        <d_fingerprint>) in the run manifest if it survived processing
+        (<b_result>) and, in a run that writes outputs (<b_write>), its
+        output was written. Directories that failed are not, so that
+        they are retried on the next run.
+        """
+        b_written   = self.manifest.written(self.outputPath_get(str_path)) if b_write else True
+        if not (b_result and b_written):
+            return False
+        self.manifest.record(str_path, self.path_resolve(str_path), d_fingerprint)
+        return True
+
+    def manifestWrite_wrap(self, kwargs):
+        """
+        Wrap the write callback in <kwargs> so that the status of each
+        output it writes is kept in the run manifest (see
+        manifest_record()).
+        """
+        fn_outputWriteCallback  = kwargs.get('outputWriteCallback')
+        if not fn_outputWriteCallback:
+            return kwargs
+
+        def outputWrite(at_data, **kwargs):
+            d_output    = fn_outputWriteCallback(at_data, **kwargs)
+            self.manifest.d_written[at_data[0]] = bool(d_output.get('status', False))
+            return d_output
+
+        kwargs  = kwargs.copy()
+        kwargs['outputWriteCallback']   = outputWrite
+        return kwargs
+
+    def pool_check(self):
+        """
+        Can the 'process' executor be used? It needs to fork its workers;
+        where it cannot, the threads are used instead.
+        """
+        b_pool  = False
+        if self.str_executor == 'process':
+            b_pool  = pool.fork_check()
+            if not b_pool:
+                self.dp.qprint(
+                    "The process executor needs 'fork' -- using threads instead",
+                    comms = 'status'
+                )
+        return b_pool
+
+    def callbacks_wrap(self, kwargs, lookahead):
+        """
+        The tree_process() <kwargs> (copied if changed) with the callbacks
+        wrapped for the options of the run: profiling, read-ahead of the
+        files of a directory and of the next <lookahead> ones, tag export,
+        the dropping of datasets, the series representatives and the
+        write status for the manifest.
+        """
+        if self.profile:
+            kwargs  = kwargs.copy()
+            for str_callback in ['inputReadCallback', 'analysisCallback', 'outputWriteCallback']:
+                if kwargs.get(str_callback):
+                    kwargs[str_callback]    = self.profile.timed(str_callback, kwargs[str_callback])
+        if self.ioConcurrency and not self.b_mmap:
+            kwargs  = self.prefetch_wrap(kwargs, lookahead)
+        if self.tagExport:
+            kwargs  = self.tagExport_wrap(kwargs)
+        if self.b_dropDatasets:
+            kwargs  = self.datasetsDrop_wrap(kwargs)
+        if self.manifest:
+            kwargs  = self.manifestWrite_wrap(kwargs)
+        if self.seriesCache:
+            kwargs  = self.seriesClear_wrap(kwargs)
+        return kwargs
+
+    def seriesClear_wrap(self, kwargs):
+        """
+        Wrap the input read callback in <kwargs> so that the series
+        representatives (see series.py) of a directory are forgotten once
+        it has been read, rather than kept for the whole run.
+        """
+        fn_inputReadCallback    = kwargs.get('inputReadCallback')
+        if not fn_inputReadCallback:
+            return kwargs
+
+        def inputRead(at_data, **kwargs):
+            try:
+                return fn_inputReadCallback(at_data, **kwargs)
+            finally:
+                self.seriesCache.clear()
+
+        kwargs  = kwargs.copy()
+        kwargs['inputReadCallback'] = inputRead
+        return kwargs
+
+    def treeResults_add(self, d_ret):
+        """
+        Add the run-wide results (tag export, read log, counters, profile)
+        to the tree_process() results <d_ret>, and save the shard result
+        file of a sharded run.
+        """
+        if self.tagExport:
+            d_ret['d_tagExport']    = self.tagExport.close()
+        d_ret['d_readLog']  = self.readLog.stats()
+        d_ret['d_strRaw']   = self.strRaw.stats()
+        if self.stemMemo:
+            d_ret['d_stemMemo'] = self.stemMemo.stats()
+        for str_summary in [self.readLog.summary(), self.strRaw.summary()]:
+            if str_summary:
+                self.dp.qprint(str_summary, comms = 'error')
+        if self.tagIndex:
+            if self.cacheMaxEntries:
+                self.tagIndex.evict()
+            d_ret['d_tagIndex'] = self.tagIndex.stats()
+        if self.seriesCache:
+            self.seriesCache.clear()
+            d_ret['d_series']   = self.seriesCache.stats()
+        if self.profile:
+            d_ret['d_profile']  = self.profile_report()
+        if self.shardCount:
+            self.shardResult_save(d_ret)
+        return d_ret
+
+    def shard_select(self):
+        """
+        Keep only the directories of the walked input tree that belong to
+        this run's shard (see shard.py). Every shard walks the same tree,
+        so they all come to the same partition.
+        """
+        d_inputTree     = self.pf_tree.d_inputTree
+        d_size          = {
+            path : d_du.get('diskUsage_raw', 1)
+                for path, d_du in self.pf_tree.d_inputTreeCallback.items()
+                    if isinstance(d_du, dict)
+        }
+        d_partition     = shard.dirs_partition(
+                            list(d_inputTree.keys()),
+                            self.shardCount,
+                            method      = self.str_shardBy,
+                            inputDir    = self.str_inputDir,
+                            d_size      = d_size
+                          )
+        self.pf_tree.d_inputTree    = {
+            path : data for path, data in d_inputTree.items()
+                if d_partition[path] == self.shardIndex
+        }
+        self.pf_tree.d_outputTree   = {
+            path : data for path, data in self.pf_tree.d_outputTree.items()
+                if d_partition.get(path) == self.shardIndex
+        }
+        self.d_shard    = {
+            'index':        self.shardIndex,
+            'count':        self.shardCount,
+            'method':       self.str_shardBy,
+            'dirs':         len(self.pf_tree.d_inputTree),
+            'dirsTotal':    len(d_inputTree),
+            'files':        sum(len(v) for v in self.pf_tree.d_inputTree.values()
+                                    if isinstance(v, list))
+        }
+        self.dp.qprint('Shard %d/%d: %d of %d directories' %
+                        (self.shardIndex, self.shardCount,
+                         self.d_shard['dirs'], self.d_shard['dirsTotal']),
+                        level = 1)
+        return self.d_shard
+
+    def shardResult_save(self, d_ret):
+        """
+        Write the shard result file of this run into <outputDir>, for
+        'pfdicom merge'. The raw counters of the run are written along
+        with the results (and kept) so that the merge can add them up.
+        """
+        d_raw           = {
+            'd_readLog':    self.readLog.drain(),
+            'd_strRaw':     self.strRaw.drain()
         }
+        self.readLog.merge(d_raw['d_readLog'])
+        self.strRaw.merge(d_raw['d_strRaw'])
+        if self.stemMemo:
+            d_raw['d_stemMemo'] = self.stemMemo.drain()
+            self.stemMemo.merge(d_raw['d_stemMemo'])
+        if self.profile:
+            d_raw['d_profile']  = self.profile.drain()
+            self.profile.merge(d_raw['d_profile'])
+        str_file        = os.path.join(self.str_outputDir,
+                                       shard.file_name(self.shardIndex, self.shardCount))
+        self.d_shard['l_stage'] = self.l_stage
+        shard.result_save(str_file, self.d_shard, d_ret, d_raw)
+        d_ret['d_shard']    = {**self.d_shard, 'file': str_file}
+        return str_file
+
+    def tree_processPool(self, *args, **kwargs):
+        """
+        The process-pool version of pftree.tree_process().
+
+        Each input tree directory is sent to a worker process, which is
+        forked from this process and so inherits this object and the
+        callbacks. The worker runs the read, analysis and write callbacks
+        for that directory in turn and returns only its compacted
+        result (without any pydicom datasets) and counters, which are
+        collected into the pftree input/output trees just as the pftree
+        delegate would.
+        """
+        b_persistAnalysisResults    = False
+        str_applyResultsTo          = ''
+        d_tree                      = {}
+        filesRead                   = 0
+        filesAnalyzed               = 0
+        filesSaved                  = 0
+        index                       = 1
+        b_inputStatusHist           = False
+        b_analyzeStatusHist         = False
+        b_outputStatusHist          = False
+        workers                     = self.numWorkers or os.cpu_count()
+        l_pathData                  = list(self.pf_tree.d_inputTree.items())
+
+        for k, v in kwargs.items():
+            if k == 'applyResultsTo':           str_applyResultsTo          = v
+            if k == 'persistAnalysisResults':   b_persistAnalysisResults    = v
+
+        d_tree      = self.pf_tree.d_outputTree
+        if str_applyResultsTo == 'inputTree':
+            d_tree  = self.pf_tree.d_inputTree
+
+        with pool.executor_make(workers, self, kwargs) as executor:
+            for d_path in executor.map(
+                    pool.path_process,
+                    l_pathData,
+                    chunksize   = max(1, len(l_pathData) // (workers * 4))
+            ):
+                self.poolResult_merge(d_path, d_tree)
+                if self.b_jsonStream:
+                    self.jsonStream_emit(self.poolResult_record(d_path))
+                filesRead               += d_path['filesRead']
+                filesAnalyzed           += d_path['filesAnalyzed']
+                filesSaved              += d_path['filesSaved']
+                b_inputStatusHist       = b_inputStatusHist     or \
+                                          d_path['d_read'].get('status', False)
+                b_analyzeStatusHist     = b_analyzeStatusHist   or \
+                                          d_path['d_analyze'].get('status', False)
+                b_outputStatusHist      = b_outputStatusHist    or \
+                                          d_path['d_output'].get('status', False)
+                index                   += 1
+
+        # As pftree does, remove the branches that had no analysis result
+        self.pf_tree.d_inputTree    = {k : v for k, v in d_tree.items() if v}
+        self.pf_tree.d_outputTree   = self.pf_tree.d_inputTree.copy()
+
+        return {
+            'status':               (not kwargs.get('inputReadCallback')   or b_inputStatusHist)   and
+                                    (not kwargs.get('analysisCallback')    or b_analyzeStatusHist) and
+                                    (not kwargs.get('outputWriteCallback') or b_outputStatusHist),
+            'processType':          'Process pool (%d workers)' % workers,
+            'fileSetsProcessed':    index,
+            'filesRead':            filesRead,
+            'filesAnalyzed':        filesAnalyzed,
+            'filesSaved':           filesSaved,
+            'd_inputCallback':      {'status': b_inputStatusHist},
+            'd_analyzeCallback':    {'status': b_analyzeStatusHist},
+            'd_outputCallback':     {'status': b_outputStatusHist}
+        }
+
+    def poolResult_merge(self, d_path, d_tree):
+        """
+        Merge the result <d_path> of a directory processed by a pool worker
+        (see pool.path_process()): its compacted results are stored in
+        <d_tree>, and its counters, output file stems and tag export rows
+        are added to this process's.
+        """
+        if d_path['fatal']:
+            self.dp.qprint(
+                "The %s callback did not return a 'status' value!" %
+                    d_path['fatal'],
+                comms = 'error',
+                level = 0
+            )
+            error.fatal(self.pf_tree, d_path['fatal'], drawBox = True)
+        for path, value in d_path['l_tree']:
+            d_tree[path]        = value
+        if self.tagIndex:
+            self.tagIndex.stats_add(d_path['d_tagIndex'])
+        if self.seriesCache:
+            self.seriesCache.stats_add(d_path['d_series'])
+        if self.manifest:
+            self.manifest.d_fileStem.update(d_path['d_fileStem'])
+            self.manifest.d_written.update(d_path['d_written'])
+        if self.profile:
+            self.profile.merge(d_path['d_profile'])
+        if self.tagExport:
+            for l_row in d_path['l_tagExport']:
+                self.tagExport.batch_add(l_row)
+        self.readLog.merge(d_path['d_readLog'])
+        self.strRaw.merge(d_path['d_strRaw'])
+        if self.stemMemo:
+            self.stemMemo.merge(d_path['d_stemMemo'])
+
+    def poolResult_record(self, d_path):
+        """
+        The NDJSON record (see jsonStream_recordNew()) of the directory
+        whose pool worker result is <d_path>.
+        """
+        d_record    = self.jsonStream_recordNew(d_path['l_tree'][0][0])
+        for str_stage, str_result, str_files in [
+                ('read',    'd_read',       'filesRead'),
+                ('analyze', 'd_analyze',    'filesAnalyzed'),
+                ('output',  'd_output',     'filesSaved')]:
+            if d_path[str_result]:
+                self.jsonStream_stageAdd(d_record, str_stage,
+                                         d_path[str_result]['status'],
+                                         d_path[str_files])
+        return d_record
+
+    def dirs_stream(self, d_count, d_fingerprint):
+        """
+        Generate the (<path>, <files>) of the input tree directories to
+        process, as they are found (see stream.py), with the <fileFilter>
+        and <dirFilter> of the run applied and, as run() and
+        tree_process() would, only this run's shard of them and (if run
+        <incremental>ly) only those that changed.
+
+        The directories are counted in <d_count>, and the fingerprints of
+        their files kept in <d_fingerprint> for the manifest.
+        """
+        str_pathRoot    = self.str_inputDir
+        if self.pf_tree.b_relativeDir:
+            str_pathRoot    = '.'
+        b_filter        = len(self.pf_tree.args['fileFilter']) or \
+                          len(self.pf_tree.args['dirFilter'])
+        l_scan          = stream.dirs_scan(
+                            self.str_inputDir,
+                            maxDepth    = self.pf_tree.maxdepth,
+                            followLinks = self.pf_tree.b_followLinks,
+                            inputFile   = self.pf_tree.str_inputFile,
+                            pathRoot    = str_pathRoot
+                          )
+        while True:
+            tic     = time.perf_counter()
+            try:
+                path, l_file    = next(l_scan)
+            except StopIteration:
+                break
+            finally:
+                if self.profile:
+                    self.profile.add('walk', time.perf_counter() - tic)
+            if b_filter:
+                d_filter    = self.pf_tree.FS_filter((path, l_file))
+                if not d_filter['status']:
+                    continue
+                l_file      = d_filter['l_file']
+            d_count['dirsTotal']    += 1
+            if self.shardCount and shard.dirs_partition(
+                    [path], self.shardCount, inputDir = self.str_inputDir
+               )[path] != self.shardIndex:
+                continue
+            if self.manifest:
+                d_fp    = self.manifest.fingerprint(self.path_resolve(path), l_file)
+                if self.manifest.unchanged(path, d_fp):
+                    d_count['dirsSkipped']  += 1
+                    continue
+                d_fingerprint[path] = d_fp
+            d_count['dirs']         += 1
+            d_count['files']        += len(l_file)
+            yield path, l_file
+
+    def dir_process(self, path, data, kwargs):
+        """
+        Run the read/analysis/write callbacks of the tree_process()
+        <kwargs> on the directory <path> with the files <data>, just as
+        pftree.tree_process() does, and return its tree_stream() record.
+        """
+        fn_inputReadCallback    = kwargs.get('inputReadCallback')
+        fn_analysisCallback     = kwargs.get('analysisCallback')
+        fn_outputWriteCallback  = kwargs.get('outputWriteCallback')
+        str_applyKey            = kwargs.get('applyKey', '')
+        d_record                = self.jsonStream_recordNew(path)
+        d_result                = data
+
+        def contract_check(d_callback, str_callback):
+            if 'status' not in d_callback.keys():
+                self.dp.qprint(
+                    "The %s callback did not return a 'status' value!" % str_callback,
+                    comms = 'error',
+                    level = 0
+                )
+                error.fatal(self.pf_tree, str_callback, drawBox = True)
+
+        if fn_inputReadCallback:
+            d_read      = fn_inputReadCallback((path, data), **kwargs)
+            contract_check(d_read, 'inputReadCallback')
+            d_result    = d_read
+            self.jsonStream_stageAdd(d_record, 'read', d_read['status'],
+                                     d_read.get('filesRead', 0))
+
+        if fn_analysisCallback:
+            try:
+                d_analysis  = fn_analysisCallback((path, d_result), **kwargs)
+            except:
+                d_analysis  = {'status': False}
+                self.dp.qprint("Analysis failed", comms = 'error')
+            contract_check(d_analysis, 'analysisCallback')
+            files       = 0
+            d_result    = None
+            if d_analysis['status']:
+                d_result    = d_analysis[str_applyKey] if len(str_applyKey) else d_analysis
+                files       = d_analysis.get('filesAnalyzed',
+                                             len(d_analysis.get('l_file', [])))
+            self.jsonStream_stageAdd(d_record, 'analyze', d_analysis['status'], files)
+
+            if fn_outputWriteCallback and d_analysis['status']:
+                d_output    = fn_outputWriteCallback((self.outputPath_get(path), d_result),
+                                                     **kwargs)
+                contract_check(d_output, 'outputWriteCallback')
+                self.jsonStream_stageAdd(d_record, 'output', d_output['status'],
+                                         d_output['filesSaved'])
+                d_record['d_output']    = d_output
+
+        d_record['d_result']    = d_result
+        return d_record
+
+    def pool_stream(self, l_pathData, kwargs, workers):
+        """
+        Process the directories of the iterator <l_pathData> in a pool of
+        <workers> worker processes (see tree_processPool()), with only a
+        few directories per worker in flight at any time, and generate
+        their tree_stream() records in order.
+        """
+        q_future    = collections.deque()
+
+        def record_get():
+            d_path      = q_future.popleft().result()
+            self.poolResult_merge(d_path, {})
+            d_record    = self.poolResult_record(d_path)
+            d_record['d_result']        = d_path['l_tree'][0][1]
+            if len(d_path['l_tree']) > 1:
+                d_record['d_output']    = d_path['l_tree'][1][1]
+            return d_record
+
+        with pool.executor_make(workers, self, kwargs) as executor:
+            for t_pathData in l_pathData:
+                q_future.append(executor.submit(pool.path_process, t_pathData))
+                if len(q_future) >= workers * 4:
+                    yield record_get()
+            while q_future:
+                yield record_get()
+
+    def tree_stream(self, *args, **kwargs):
+        """
+        The streaming version of tree_process(), for trees too large to
+        hold in memory: rather than walking the whole input tree first,
+        the tree is walked a directory at a time (see stream.py), and
+        each directory is read, analyzed and written as it is found. This
+        generates, for each directory, the record
+
+            {
+                'record':           'directory',
+                'path':             <input tree directory>,
+                'status':           <bool>,
+                'read':             <bool>,
+                'filesRead':        <int>,
+                'analyze':          <bool>,
+                'filesAnalyzed':    <int>,
+                'output':           <bool>,
+                'filesSaved':       <int>,
+                'd_result':         <what pftree would keep in the tree for
+                                     the directory: the analysis (or read)
+                                     result, or None if the analysis
+                                     failed>,
+                'd_output':         <the write callback result, if called>
+            }
+
+        (the stages that were not run are left out) and, when done,
+        returns the results that tree_process() would have. Nothing of a
+        directory is kept once its record has been consumed, so memory
+        is in the order of the largest directory rather than the tree;
+        the pftree input and output trees are left empty.
+
+        The kwargs are those of tree_process(). The 'thread' executor runs
+        the callbacks of each directory in turn (the analysis is not
+        threaded); the 'process' executor runs directories in its pool.
+        With <jsonStream>, each record (without its results) is also
+        streamed.
+
+        Use tree_process() with <stream> for a complete run, which also
+        adds the run-wide results and passes each record to
+        <fn_dirStream> if one is set.
+        """
+        d_count     = {
+            'dirs':         0,
+            'dirsTotal':    0,
+            'dirsSkipped':  0,
+            'files':        0
+        }
+        d_fingerprint           = {}
+        filesRead               = 0
+        filesAnalyzed           = 0
+        filesSaved              = 0
+        b_inputStatusHist       = False
+        b_analyzeStatusHist     = False
+        b_outputStatusHist      = False
+        workers                 = self.numWorkers or os.cpu_count()
+        b_pool                  = self.pool_check()
+        kwargs                  = self.callbacks_wrap(kwargs, 0)
+
+        l_pathData  = self.dirs_stream(d_count, d_fingerprint)
+        if b_pool:
+            l_record    = self.pool_stream(l_pathData, kwargs, workers)
+        else:
+            l_record    = (self.dir_process(path, data, kwargs) for path, data in l_pathData)
+        try:
+            for d_record in l_record:
+                filesRead               += d_record.get('filesRead', 0)
+                filesAnalyzed           += d_record.get('filesAnalyzed', 0)
+                filesSaved              += d_record.get('filesSaved', 0)
+                b_inputStatusHist       = b_inputStatusHist     or d_record.get('read', False)
+                b_analyzeStatusHist     = b_analyzeStatusHist   or d_record.get('analyze', False)
+                b_outputStatusHist      = b_outputStatusHist    or d_record.get('output', False)
+                path                    = d_record['path']
+                if self.manifest and path in d_fingerprint:
+                    self.manifest_record(path, d_fingerprint.pop(path), d_record['d_result'],
+                                         kwargs.get('outputWriteCallback'))
+                if self.b_jsonStream:
+                    self.jsonStream_emit({k : v for k, v in d_record.items()
+                                            if k not in ['d_result', 'd_output']})
+                yield d_record
+        finally:
+            l_record.close()
+            if self.prefetch:
+                self.prefetch.close()
+                self.prefetch   = None
+
+        d_ret       = {
+            'status':               (not kwargs.get('inputReadCallback')   or b_inputStatusHist)   and
+                                    (not kwargs.get('analysisCallback')    or b_analyzeStatusHist) and
+                                    (not kwargs.get('outputWriteCallback') or b_outputStatusHist),
+            'processType':          'Streaming process pool (%d workers)' % workers if b_pool
+                                        else 'Streaming',
+            'fileSetsProcessed':    d_count['dirs'] + 1,
+            'filesRead':            filesRead,
+            'filesAnalyzed':        filesAnalyzed,
+            'filesSaved':           filesSaved,
+            'd_inputCallback':      {'status': b_inputStatusHist},
+            'd_analyzeCallback':    {'status': b_analyzeStatusHist},
+            'd_outputCallback':     {'status': b_outputStatusHist},
+            'd_stream':             dict(d_count)
+        }
+        if not d_count['dirs'] and d_count['dirsSkipped']:
+            # Nothing has changed since the previous run
+            d_ret.update({
+                'status':               True,
+                'processType':          'Incremental (no changes)',
+                'd_inputCallback':      {'status': True},
+                'd_analyzeCallback':    {'status': True},
+                'd_outputCallback':     {'status': True}
+            })
+        if self.manifest:
+            self.manifest.save()
+            d_ret['d_incremental']  = {
+                'manifest':         self.manifest.str_file,
+                'dirsSkipped':      d_count['dirsSkipped'],
+                'dirsProcessed':    d_count['dirs']
+            }
+        if self.shardCount:
+            self.d_shard    = {
+                'index':        self.shardIndex,
+                'count':        self.shardCount,
+                'method':       self.str_shardBy,
+                'dirs':         d_count['dirs'] + d_count['dirsSkipped'],
+                'dirsTotal':    d_count['dirsTotal'],
+                'files':        d_count['files']
+            }
+        return d_ret
+
+    def tree_streamProcess(self, *args, **kwargs):
+        """
+        tree_process() with <stream>: run tree_stream() to its end, passing
+        each directory's record to <fn_dirStream> (if set) and then letting
+        it go, and return the results of the run.
+        """
+        l_record    = self.tree_stream(*args, **kwargs)
+        while True:
+            try:
+                d_record    = next(l_record)
+            except StopIteration as e:
+                return e.value
+            if self.fn_dirStream:
+                self.fn_dirStream(d_record)
+
+    def jsonStream_emit(self, d_record):
+        """
+        Write <d_record> to stdout as one compact NDJSON line, flushed
+        at once so that a consumer sees it while the run goes on. Values
+        that are not JSON serializable are written as strings.
+
+        If <fn_jsonStream> is set (for example by the job server of
+        daemon.py), the record is passed to it instead.
+        """
+        if self.fn_jsonStream:
+            with self.lock_jsonStream:
+                self.fn_jsonStream(d_record)
+            return
+        str_line    = json.dumps(d_record, default = str)
+        with self.lock_jsonStream:
+            sys.stdout.write(str_line + '\n')
+            sys.stdout.flush()
+
+    def jsonStream_recordNew(self, str_path):
+        """
+        A new (empty) NDJSON record for the input directory <str_path>.
+        """
+        return {
+            'record':   'directory',
+            'path':     str_path,
+            'status':   True
+        }
+
+    def jsonStream_stageAdd(self, d_record, str_stage, b_status, files = 0):
+        """
+        Add the result of the 'read', 'analyze' or 'output' <str_stage> on
+        a directory to its NDJSON <d_record>.
+        """
+        str_files   = {
+            'read':     'filesRead',
+            'analyze':  'filesAnalyzed',
+            'output':   'filesSaved'
+        }[str_stage]
+        d_record[str_stage]     = bool(b_status)
+        d_record[str_files]     = files
+        d_record['status']      = d_record['status'] and bool(b_status)
+        return d_record
+
+    def jsonStream_wrap(self, kwargs):
+        """
+        Return a copy of the tree_process() <kwargs> whose callbacks are
+        wrapped to stream an NDJSON record for each directory as soon as
+        its last callback has run.
+        """
+        d_kwargs                = kwargs.copy()
+        d_record                = {}
+        d_outputPath            = {}
+        fn_inputReadCallback    = kwargs.get('inputReadCallback')
+        fn_analysisCallback     = kwargs.get('analysisCallback')
+        fn_outputWriteCallback  = kwargs.get('outputWriteCallback')
+        str_outputLeafDir       = self.pf_tree.str_outputLeafDir
+
+        # The output callback is given the output path -- map it back
+        for path in self.pf_tree.d_inputTree:
+            str_path    = path
+            if len(str_outputLeafDir):
+                (dirname, basename) = os.path.split(path)
+                str_path    = '%s/%s' % (dirname, str_outputLeafDir % basename)
+            d_outputPath['%s/%s' % (self.pf_tree.str_outputDir, str_path)]  = path
+
+        def stage_add(path, str_stage, d_result, files, b_last):
+            d_path  = d_record.setdefault(path, self.jsonStream_recordNew(path))
+            self.jsonStream_stageAdd(d_path, str_stage, d_result.get('status'), files)
+            if b_last:
+                self.jsonStream_emit(d_record.pop(path))
+
+        def inputRead(at_data, **kwargs):
+            d_read      = fn_inputReadCallback(at_data, **kwargs)
+            stage_add(at_data[0], 'read', d_read, d_read.get('filesRead', 0),
+                      not fn_analysisCallback)
+            return d_read
+
+        def analysis(at_data, **kwargs):
+            try:
+                d_analysis  = fn_analysisCallback(at_data, **kwargs)
+            except:
+                stage_add(at_data[0], 'analyze', {'status': False}, 0, True)
+                raise
+            files       = 0
+            if d_analysis.get('status'):
+                files   = d_analysis.get('filesAnalyzed',
+                                         len(d_analysis.get('l_file', [])))
+            # Nothing is written for a failed analysis
+            stage_add(at_data[0], 'analyze', d_analysis, files,
+                      not fn_outputWriteCallback or not d_analysis.get('status'))
+            return d_analysis
+
+        def outputWrite(at_data, **kwargs):
+            d_output    = fn_outputWriteCallback(at_data, **kwargs)
+            stage_add(d_outputPath.get(at_data[0], at_data[0]), 'output',
+                      d_output, d_output.get('filesSaved', 0), True)
+            return d_output
+
+        if fn_inputReadCallback:    d_kwargs['inputReadCallback']   = inputRead
+        if fn_analysisCallback:     d_kwargs['analysisCallback']    = analysis
+        if fn_outputWriteCallback:  d_kwargs['outputWriteCallback'] = outputWrite
+        return d_kwargs
+
+    def profile_report(self):
+        """
+        The per-stage profile of the run so far, which is also exported
+        to the <profileExport> file if one was given.
+        """
+        if len(self.str_profileExport):
+            self.profile.export(self.str_profileExport)
+        return self.profile.report()
 
     def ret_jdump(self, d_ret, **kwargs):
         """
-        JSON print results to console (or caller)
+        JSON print results to console (or caller). When streaming, this
+        is the final, 'summary' NDJSON record.
         """
         b_print     = True
         for k, v in kwargs.items():
             if k == 'JSONprint':    b_print     = bool(v)
-        if b_print:
+        if b_print and self.b_jsonStream:
+            self.jsonStream_emit({'record': 'summary', **d_ret})
+        elif b_print:
             print(
                 json.dumps(
                     d_ret,
@@ -446,8 +2016,16 @@ class pfdicom(object):
             other.tic()
 
         d_env               = self.env_check()
-        if d_env['status']:
+        if d_env['status'] and self.b_stream:
+            # The input tree is walked as it is processed, by tree_process()
+            d_pftreeRun = {**self.pf_tree.env_check(), 'b_stream': True}
+        elif d_env['status']:
+            tic         = time.perf_counter() if self.profile else 0
             d_pftreeRun = self.pf_tree.run(timerStart = False)
+            if self.profile:
+                self.profile.add('walk', time.perf_counter() - tic)
+            if self.shardCount:
+                self.shard_select()
         else:
             b_status    = False
 
@@ -458,7 +2036,14 @@ class pfdicom(object):
             'runTime':          other.toc()
         }
 
-        if self.args['json'] and b_JSONprint:
+        if self.tagIndex:
+            d_ret['d_tagIndex'] = self.tagIndex.stats()
+        if self.seriesCache:
+            d_ret['d_series']   = self.seriesCache.stats()
+        if self.profile:
+            d_ret['d_profile']  = self.profile_report()
+
+        if (self.args['json'] or self.b_jsonStream) and b_JSONprint:
             self.ret_jdump(d_ret, **kwargs)
         else:
             self.dp.qprint('\tReturning from pfdicom run...', level = 1)
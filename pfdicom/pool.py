@@ -0,0 +1,211 @@
+"""
+Worker side of the process-pool execution backend (see
+pfdicom.tree_processPool).
+
+Workers are forked from the parent, so the pfdicom object and the
+tree_process() callbacks are inherited rather than pickled. Only a
+directory path is sent to a worker, and only the compacted per-directory
+result is sent back.
+"""
+
+import      os
+
+import      pydicom             as      dicom
+
+try:
+    from    .dicommap           import DICOMmap
+    from    .record             import fileRecord
+except:
+    from    dicommap            import DICOMmap
+    from    record              import fileRecord
+
+# The per-process worker state, set by worker_init()
+d_worker    = {}
+
+def fork_check():
+    """
+    Can worker processes be forked here?
+    """
+    import  multiprocessing
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+def executor_make(workers, o_pfdicom, d_kwargs):
+    """
+    A ProcessPoolExecutor of <workers> processes forked from this one,
+    each set up by worker_init() with the pfdicom object <o_pfdicom> and
+    the tree_process() kwargs <d_kwargs>.
+    """
+    import  multiprocessing
+    from    concurrent.futures  import  ProcessPoolExecutor
+    return ProcessPoolExecutor(
+                max_workers = workers,
+                mp_context  = multiprocessing.get_context('fork'),
+                initializer = worker_init,
+                initargs    = (o_pfdicom, d_kwargs)
+    )
+
+# DICOMmap keys that are never shipped back to the parent
+l_heavyKey  = ['dcm', 'd_dcm', 'd_dicom', 'strRaw']
+
+def result_compact(obj):
+    """
+    Return a copy of <obj> that is cheap to pickle back to the parent:
+    pydicom datasets are dropped, and a DICOMmap is reduced to the
+    (already computed) light-weight tag dictionaries.
+    """
+    if isinstance(obj, dicom.dataset.Dataset):
+        return None
+    if isinstance(obj, DICOMmap):
+        return {k : result_compact(dict.__getitem__(obj, k))
+                    for k in dict.keys(obj) if k not in l_heavyKey}
+    if isinstance(obj, fileRecord):
+        return fileRecord(**{k : result_compact(v) for k, v in obj.items()})
+    if isinstance(obj, dict):
+        return {k : result_compact(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(result_compact(v) for v in obj)
+    return obj
+
+def worker_init(o_pfdicom, d_kwargs):
+    """
+    Pool initializer: remember the (inherited) pfdicom object and the
+    tree_process() kwargs with their callbacks.
+    """
+    d_worker['pfdicom'] = o_pfdicom
+    d_worker['kwargs']  = d_kwargs
+    # The profile counters inherited from the parent are the parent's
+    if o_pfdicom.profile:
+        o_pfdicom.profile.drain()
+    o_pfdicom.readLog.drain()
+    o_pfdicom.strRaw.drain()
+    if o_pfdicom.stemMemo:
+        o_pfdicom.stemMemo.drain()
+
+def path_process(t_pathData):
+    """
+    Run the read/analysis/write callbacks on one directory, just as
+    pftree.tree_process() does, and return
+
+        {
+            'l_tree':       [(<key>, <compacted value>), ...] to store
+                            in the tree, in order,
+            'd_read':       <read callback return status>,
+            'd_analyze':    <analysis callback return status>,
+            'd_output':     <write callback return status>,
+            'filesRead':    <int>,
+            'filesAnalyzed':<int>,
+            'filesSaved':   <int>,
+            'fatal':        <name of a callback that broke contract, or ''>,
+            'd_tagIndex':   <tag index counters for this directory>,
+            'd_fileStem':   <output file stems for the run manifest>,
+            'd_written':    <write status of the outputs, for the manifest>,
+            'd_profile':    <raw profile counters for this directory>,
+            'd_series':     <series-level read counters for this directory>,
+            'l_tagExport':  [<tag export rows of this directory>],
+            'd_readLog':    <files of this directory that could not be read>,
+            'd_strRaw':     <explicit string conversion counters>,
+            'd_stemMemo':   <output file stem memo counters>
+        }
+    """
+    path, data              = t_pathData
+    o_pfdicom               = d_worker['pfdicom']
+    kwargs                  = d_worker['kwargs']
+    fn_inputReadCallback    = kwargs.get('inputReadCallback')
+    fn_analysisCallback     = kwargs.get('analysisCallback')
+    fn_outputWriteCallback  = kwargs.get('outputWriteCallback')
+    str_applyKey            = kwargs.get('applyKey', '')
+    b_persist               = kwargs.get('persistAnalysisResults', False)
+    str_outputLeafDir       = o_pfdicom.pf_tree.str_outputLeafDir
+    str_outputDir           = o_pfdicom.pf_tree.str_outputDir
+
+    d_ret   = {
+        'l_tree':           [],
+        'd_tree':           data,
+        'd_read':           {},
+        'd_analyze':        {},
+        'd_output':         {},
+        'filesRead':        0,
+        'filesAnalyzed':    0,
+        'filesSaved':       0,
+        'fatal':            '',
+        'd_tagIndex':       {},
+        'd_fileStem':       {},
+        'd_written':        {},
+        'd_profile':        {},
+        'd_series':         {},
+        'l_tagExport':      [],
+        'd_readLog':        {},
+        'd_strRaw':         {},
+        'd_stemMemo':       {}
+    }
+    d_indexStart            = o_pfdicom.tagIndex.stats() if o_pfdicom.tagIndex else {}
+    d_seriesStart           = o_pfdicom.seriesCache.stats() if o_pfdicom.seriesCache else {}
+
+    if fn_inputReadCallback:
+        d_read  = fn_inputReadCallback((path, data), **kwargs)
+        if 'status' not in d_read.keys():
+            return {'fatal': 'inputReadCallback'}
+        d_ret['d_tree']     = d_read
+        d_ret['d_read']     = {'status': d_read['status']}
+        if 'filesRead' in d_read.keys():
+            d_ret['filesRead']  = d_read['filesRead']
+
+    if fn_analysisCallback:
+        try:
+            d_analysis  = fn_analysisCallback((path, d_ret['d_tree']), **kwargs)
+        except:
+            d_analysis  = {'status': False}
+            o_pfdicom.dp.qprint("Analysis failed", comms = 'error')
+        if 'status' not in d_analysis.keys():
+            return {'fatal': 'analysisCallback'}
+        d_ret['d_analyze']  = {'status': d_analysis['status']}
+        if d_analysis['status']:
+            if len(str_applyKey):
+                d_ret['d_tree'] = d_analysis[str_applyKey]
+            else:
+                d_ret['d_tree'] = d_analysis
+            if 'filesAnalyzed' in d_analysis.keys():
+                d_ret['filesAnalyzed']  = d_analysis['filesAnalyzed']
+            elif 'l_file' in d_analysis.keys():
+                d_ret['filesAnalyzed']  = len(d_analysis['l_file'])
+        else:
+            d_ret['d_tree'] = None
+
+    if fn_outputWriteCallback and d_ret['d_analyze'].get('status'):
+        str_path    = path
+        if len(str_outputLeafDir):
+            (dirname, basename) = os.path.split(path)
+            str_path    = '%s/%s' % (dirname, str_outputLeafDir % basename)
+        d_output    = fn_outputWriteCallback(
+            ('%s/%s' % (str_outputDir, str_path), d_ret['d_tree']), **kwargs
+        )
+        if 'status' not in d_output.keys():
+            return {'fatal': 'outputWriteCallback'}
+        d_ret['d_output']   = {'status': d_output['status']}
+        d_ret['filesSaved'] = d_output['filesSaved']
+        if not b_persist:
+            d_ret['l_tree'].append((str_path, result_compact(d_output)))
+
+    d_ret['l_tree'].insert(0, (path, result_compact(d_ret['d_tree'])))
+    del d_ret['d_tree']
+    if o_pfdicom.tagIndex:
+        d_ret['d_tagIndex'] = {k : v - d_indexStart[k]
+                                for k, v in o_pfdicom.tagIndex.stats().items()
+                                    if isinstance(v, int)}
+    if o_pfdicom.seriesCache:
+        d_ret['d_series']   = {k : v - d_seriesStart[k]
+                                for k, v in o_pfdicom.seriesCache.stats().items()}
+    if o_pfdicom.manifest:
+        d_ret['d_fileStem'] = o_pfdicom.manifest.d_fileStem
+        d_ret['d_written']  = o_pfdicom.manifest.d_written
+        o_pfdicom.manifest.d_fileStem   = {}
+        o_pfdicom.manifest.d_written    = {}
+    if o_pfdicom.profile:
+        d_ret['d_profile']  = o_pfdicom.profile.drain()
+    if o_pfdicom.tagExport:
+        d_ret['l_tagExport']    = o_pfdicom.tagExport.pending_drain()
+    d_ret['d_readLog']      = o_pfdicom.readLog.drain()
+    d_ret['d_strRaw']       = o_pfdicom.strRaw.drain()
+    if o_pfdicom.stemMemo:
+        d_ret['d_stemMemo'] = o_pfdicom.stemMemo.drain()
+    return d_ret
@@ -0,0 +1,173 @@
+"""
+A thread pool prefetch pipeline for file contents.
+
+On network filesystems the latency of opening and reading each file,
+not parsing, dominates a run. The 'filePrefetch' pipeline keeps up to
+<concurrency> file reads in flight ahead of the parser: files are
+scheduled (in the order they will be parsed), read by a pool of
+<concurrency> threads, and handed to the parser with take().
+
+Memory is bounded by backpressure: a read is only issued once it can
+take one of <buffered> buffer slots (a semaphore), and a slot is only
+given back when the parser takes (or drops) the file. Reads are issued
+by whichever thread frees a slot or schedules files, so there is no
+thread of the pipeline's own besides the pool.
+
+Files are keyed on their normalized path, so that 'dir/file' and
+'dir//file' name the same scheduled read.
+"""
+
+import      os
+import      time
+import      threading
+import      collections
+
+# concurrent.futures is only imported once a pipeline is started (see
+# futures_load())
+concurrent                  = None
+
+def futures_load():
+    """
+    Import concurrent.futures, which most runs (without
+    '--io-concurrency') never need, on first use.
+    """
+    global concurrent
+    if concurrent is None:
+        import  concurrent.futures
+    return concurrent.futures
+
+class delayedOpen(object):
+    """
+    A filesystem shim that adds <latency> seconds to every file open,
+    to try out the pipeline against a local disk as if it were remote.
+    """
+
+    def __init__(self, latency):
+        self.latency    = latency
+
+    def __call__(self, str_file, str_mode = 'rb'):
+        time.sleep(self.latency)
+        return open(str_file, str_mode)
+
+class filePrefetch(object):
+    """
+    The prefetch pipeline of one process.
+    """
+
+    def __init__(self, concurrency, **kwargs):
+        """
+        kwargs:
+
+            buffered    = <maximum number of files read ahead of the
+                           parser; default 2 x <concurrency>>
+            fileOpen    = <callable(str_file, 'rb') used to open files>
+        """
+        self.concurrency    = max(1, int(concurrency))
+        self.buffered       = 2 * self.concurrency
+        self.fn_open        = open
+        for k, v in kwargs.items():
+            if k == 'buffered':     self.buffered   = max(1, int(v))
+            if k == 'fileOpen':     self.fn_open    = v
+
+        futures_load()
+        self.pid            = os.getpid()
+        self.lock           = threading.Lock()
+        self.d_future       = {}
+        self.queue          = collections.deque()
+        self.sem_buffer     = threading.BoundedSemaphore(self.buffered)
+        self.executor       = concurrent.futures.ThreadPoolExecutor(
+                                max_workers         = self.concurrency,
+                                thread_name_prefix  = 'pfdicom-prefetch'
+                              )
+
+    def file_read(self, str_file, future):
+        """
+        Read one file into its <future>.
+        """
+        try:
+            with self.fn_open(str_file, 'rb') as fp:
+                future.set_result(fp.read())
+        except Exception as e:
+            future.set_exception(e)
+
+    def reads_issue(self):
+        """
+        Issue the reads of the scheduled files in order, as long as there
+        are free buffer slots.
+        """
+        while True:
+            with self.lock:
+                if not self.queue or not self.sem_buffer.acquire(blocking = False):
+                    return
+                str_file, future    = self.queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                # Discarded before its read started
+                self.sem_buffer.release()
+                continue
+            self.executor.submit(self.file_read, str_file, future)
+
+    def buffer_release(self, future = None):
+        """
+        Give back a buffer slot, and issue the read it makes room for.
+        """
+        self.sem_buffer.release()
+        self.reads_issue()
+
+    def schedule(self, l_file):
+        """
+        Queue the files <l_file> (that are not queued already) for reading.
+        """
+        futures     = futures_load()
+        with self.lock:
+            for str_file in l_file:
+                str_file                    = os.path.normpath(str_file)
+                if str_file in self.d_future: continue
+                future                      = futures.Future()
+                self.d_future[str_file]     = future
+                self.queue.append((str_file, future))
+        self.reads_issue()
+
+    def release(self, future):
+        """
+        Give back the buffer slot of a taken (or discarded) read, once it
+        is done. A read that has not started only needs to be cancelled.
+        """
+        if future.cancel():
+            return
+        future.add_done_callback(self.buffer_release)
+
+    def take(self, str_file):
+        """
+        The contents of <str_file>, waiting for its read if it is in
+        flight. None if it was not scheduled, its read has not started
+        yet (it is then dropped, so that a caller that takes files out of
+        order can never wait on a full buffer), or it could not be read.
+        The caller then reads the file the usual way.
+        """
+        with self.lock:
+            future  = self.d_future.pop(os.path.normpath(str_file), None)
+        if future is None or future.cancel():
+            return None
+        try:
+            data    = future.result()
+        except Exception:
+            data    = None
+        self.buffer_release()
+        return data
+
+    def discard(self, l_file):
+        """
+        Drop the scheduled reads of <l_file> that were never taken.
+        """
+        with self.lock:
+            l_future    = [self.d_future.pop(f, None) for f in map(os.path.normpath, l_file)]
+        for future in l_future:
+            if future is not None:
+                self.release(future)
+
+    def close(self):
+        """
+        Drop all outstanding reads and stop the pipeline.
+        """
+        self.discard(list(self.d_future))
+        self.executor.shutdown(wait = True)
@@ -0,0 +1,121 @@
+"""
+The compact per-file result record that DICOMfile_read() returns.
+
+pftree keeps the read result of every file until the run completes, so
+on large trees the per-file overhead of a plain dictionary adds up. A
+fileRecord keeps its fields in __slots__ instead, but still behaves as
+a (mutable) mapping with the keys
+
+    'status', 'inputPath', 'inputFilename', 'outputFileStem',
+    'd_DICOM', 'l_tagsToUse'
+
+so that derived classes can keep using d_read['d_DICOM'], .get(),
+.items(), 'key in d_read', dict(d_read) and so on. Keys other than
+these can be set too; they are kept in a (then created) dictionary of
+their own.
+
+A fileRecord is not a dict, though: isinstance(d_read, dict) is False,
+and json.dumps() and other code that needs a real dictionary take
+toDict() instead.
+
+The 'status' is a plain field. It is set to False, once, if the
+'strRaw' of its 'd_DICOM' is built and could not be converted (see
+DICOMmap.strRaw_get()).
+"""
+
+import      weakref
+import      collections.abc
+
+class fileRecord(collections.abc.MutableMapping):
+    """
+    The read result of one file.
+    """
+
+    l_field     = ['status', 'inputPath', 'inputFilename', 'outputFileStem',
+                   'd_DICOM', 'l_tagsToUse']
+
+    __slots__   = l_field + ['d_extra', '__weakref__']
+
+    def __init__(self, **kwargs):
+        self.status         = False
+        self.inputPath      = ''
+        self.inputFilename  = ''
+        self.outputFileStem = ''
+        self.d_DICOM        = None
+        self.l_tagsToUse    = []
+        self.d_extra        = None
+        for k, v in kwargs.items():
+            self[k] = v
+
+    def strRaw_watch(self):
+        """
+        Have the 'd_DICOM' of this record set its 'status' False if its
+        'strRaw' fails to convert when it is built (or already did).
+        """
+        if getattr(self.d_DICOM, 'b_strRaw', True) is False:
+            self.status = False
+        elif hasattr(self.d_DICOM, 'ref_record'):
+            self.d_DICOM.ref_record = weakref.ref(self)
+        return self
+
+    def strRaw_failed(self):
+        """
+        The 'strRaw' of this record's 'd_DICOM' could not be converted.
+        """
+        self.status = False
+
+    def __getitem__(self, key):
+        if key in fileRecord.l_field:
+            return getattr(self, key)
+        if self.d_extra is None:
+            raise KeyError(key)
+        return self.d_extra[key]
+
+    def __setitem__(self, key, value):
+        if key in fileRecord.l_field:
+            setattr(self, key, value)
+            return
+        if self.d_extra is None:
+            self.d_extra    = {}
+        self.d_extra[key]   = value
+
+    def __delitem__(self, key):
+        if key in fileRecord.l_field:
+            raise KeyError('%s is a fixed field of a fileRecord' % key)
+        if self.d_extra is None:
+            raise KeyError(key)
+        del self.d_extra[key]
+
+    def __iter__(self):
+        yield from fileRecord.l_field
+        if self.d_extra:
+            yield from self.d_extra
+
+    def __len__(self):
+        return len(fileRecord.l_field) + (len(self.d_extra) if self.d_extra else 0)
+
+    def __contains__(self, key):
+        return key in fileRecord.l_field or bool(self.d_extra and key in self.d_extra)
+
+    def __repr__(self):
+        return 'fileRecord(%s)' % ', '.join('%s=%r' % (k, v) for k, v in self.items())
+
+    def copy(self):
+        return fileRecord(**self)
+
+    def toDict(self):
+        """
+        The record as a plain dictionary.
+        """
+        return dict(self.items())
+
+    def heavy_drop(self):
+        """
+        Drop the heavy parts of 'd_DICOM' -- the pydicom dataset and its
+        'd_dcm' and 'strRaw' -- keeping the tag dictionaries (see
+        DICOMmap.heavy_drop()).
+        """
+        fn_drop = getattr(self.d_DICOM, 'heavy_drop', None)
+        if fn_drop:
+            fn_drop()
+        return self
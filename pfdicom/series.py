@@ -0,0 +1,244 @@
+"""
+Series-level reading: one representative header per series.
+
+Within a directory, some tags of the files of one series are the same
+in every file: the image pixel description (Rows, Columns, BitsStored,
+...) and a few others, listed in seriesCache.l_tagSeries. In
+series-level mode, only the start of each file -- up to the end of
+DICOM group 0020, which holds the patient, study, series and instance
+identifiers -- is parsed, and the listed tags are taken from a fully
+read representative file of the same series in the same directory.
+
+Any other tag after group 0020 may differ from slice to slice (window
+center and width, rescale slope and intercept, ...), and is read from
+the file itself: asking for one parses the file. So the saving is only
+the parse of the rest of each header (each file is still opened and
+parsed up to group 0020), and only for tools that need no tags beyond
+the identifiers and the listed ones (and whose output file stem only
+refers to such tags: a template that could match any other tag, even
+one as part of a longer name, needs to know whether the file has it).
+
+The assumption that the listed tags do not vary within a series can be
+spot-checked: a sample of the files is read in full and compared with
+what the representative gives (whether they have each tag, and its
+value). A series that fails a check is from then on read file by file.
+
+Representatives are only kept while their directory is being read (see
+clear()). The first file of a directory is read in full straight away,
+without a peek, as there is no representative to share yet.
+"""
+
+import      io
+import      zlib
+import      threading
+
+from        pydicom.filereader  import  read_partial
+
+try:
+    from    .dicommap           import element_get, d_keywordTable
+except:
+    from    dicommap            import element_get, d_keywordTable
+
+def tag_late(str_tag):
+    """
+    Is <str_tag> one that comes after group 0020, and so is shared?
+    """
+    return d_keywordTable.get(str_tag, (0,))[0] > 0x0020ffff
+
+# The keywords of all the tags up to the end of group 0020
+s_tagEarly  = frozenset(k for k, t_entry in d_keywordTable.items() if t_entry[0] <= 0x0020ffff)
+
+def dcm_tags(dcm):
+    """
+    The {'l_tagRaw': [...], 'd_dicomSimple': {...}} of the tags of the
+    <dcm> dataset (without its PixelData).
+    """
+    d_tags  = {
+        'l_tagRaw':         dcm.dir(),
+        'd_dicomSimple':    {}
+    }
+    for key in d_tags['l_tagRaw']:
+        if key == 'PixelData': continue
+        elem    = element_get(dcm, key)
+        d_tags['d_dicomSimple'][key]    = elem.value if elem is not None else "no attribute"
+    return d_tags
+
+class seriesCache(object):
+    """
+    The series representatives of a run, keyed on (directory,
+    SeriesInstanceUID).
+    """
+
+    # The tags after group 0020 that are taken from the representative.
+    # Derived classes can extend the list with tags they know do not
+    # vary within their series.
+    l_tagSeries = [
+        'SamplesPerPixel', 'PhotometricInterpretation', 'PlanarConfiguration',
+        'Rows', 'Columns', 'BitsAllocated', 'BitsStored', 'HighBit',
+        'PixelRepresentation', 'RequestedProcedureDescription',
+        'PerformedProcedureStepID', 'PerformedProcedureStepStartDate',
+        'PerformedProcedureStepStartTime', 'PerformedProcedureStepDescription'
+    ]
+
+    def __init__(self, **kwargs):
+        """
+        kwargs:
+
+            spotCheck   = <fraction (0..1) of the files that share a
+                           representative to also read in full and check>
+        """
+        self.f_spotCheck        = 0.0
+        self.d_representative   = {}
+        self.lock               = threading.Lock()
+        self.d_count            = {
+            'peeked':               0,
+            'representatives':      0,
+            'shared':               0,
+            'spotChecks':           0,
+            'spotCheckFailures':    0
+        }
+        for k, v in kwargs.items():
+            if k == 'spotCheck':    self.f_spotCheck    = float(v)
+        self.s_tagKnown         = s_tagEarly | frozenset(self.l_tagSeries)
+
+    def count(self, str_counter):
+        with self.lock:
+            self.d_count[str_counter]   += 1
+
+    def peek(self, str_file, data = None):
+        """
+        Parse <str_file> (or its already read contents <data>) only up
+        to the end of group 0020 and return its SeriesInstanceUID and
+        tags, or None if that fails.
+        """
+        def stop_when(tag, VR, length):
+            return tag > 0x0020ffff
+
+        try:
+            if data is not None:
+                dcm     = read_partial(io.BytesIO(data), stop_when = stop_when)
+            else:
+                with open(str_file, 'rb') as fp:
+                    dcm = read_partial(fp, stop_when = stop_when)
+        except:
+            return None
+        self.count('peeked')
+        return self.peek_make(dcm_tags(dcm))
+
+    @staticmethod
+    def peek_make(d_tags):
+        """
+        What peek() gives for a file whose tags <d_tags> (see dcm_tags())
+        have been read: its SeriesInstanceUID and its tags up to the end
+        of group 0020. None if it has no SeriesInstanceUID.
+        """
+        str_seriesUID   = str(d_tags['d_dicomSimple'].get('SeriesInstanceUID', ''))
+        if not str_seriesUID or str_seriesUID == 'no attribute':
+            return None
+        return {
+            'seriesUID':    str_seriesUID,
+            'd_tags':       {
+                'l_tagRaw':         [k for k in d_tags['l_tagRaw'] if not tag_late(k)],
+                'd_dicomSimple':    {k : v for k, v in d_tags['d_dicomSimple'].items()
+                                        if not tag_late(k)}
+            }
+        }
+
+    def path_has(self, str_path):
+        """
+        Is there a representative of any series in <str_path>?
+        """
+        with self.lock:
+            return any(t_key[0] == str_path for t_key in self.d_representative)
+
+    def clear(self):
+        """
+        Forget the representatives, once the directories they are in
+        have been read.
+        """
+        with self.lock:
+            self.d_representative   = {}
+
+    def spotCheck_due(self, str_file):
+        """
+        Is <str_file> in the spot-check sample? The choice depends only on
+        the file name, so it is the same on every run.
+        """
+        if not self.f_spotCheck:
+            return False
+        return zlib.crc32(str_file.encode('utf-8', 'replace')) < self.f_spotCheck * 2 ** 32
+
+    def tags_share(self, str_path, d_peek):
+        """
+        The tags of a file in <str_path> that was peeked as <d_peek> that
+        are known without parsing the rest of it:
+
+            {'s_tag':           <the keywords known: those up to the end
+                                 of group 0020, and the series tags>,
+             'd_dicomSimple':   <the values of those of them the file
+                                 has: its own up to group 0020, and the
+                                 representative's series tags>}
+
+        None if there is no usable representative for its series.
+        """
+        d_rep   = self.d_representative.get((str_path, d_peek['seriesUID']))
+        if not d_rep:
+            return None
+        d_simple    = dict(d_rep['d_series'])
+        d_simple.update(d_peek['d_tags']['d_dicomSimple'])
+        return {
+            's_tag':            self.s_tagKnown,
+            'd_dicomSimple':    d_simple
+        }
+
+    def representative_set(self, str_path, str_seriesUID, d_tags):
+        """
+        Make the fully read <d_tags> the representative of its series, if
+        it has none yet.
+        """
+        d_rep   = {
+            'd_series':     {k : d_tags['d_dicomSimple'][k] for k in self.l_tagSeries
+                                if k in d_tags['d_dicomSimple']}
+        }
+        with self.lock:
+            if (str_path, str_seriesUID) not in self.d_representative:
+                self.d_representative[(str_path, str_seriesUID)]  = d_rep
+                self.d_count['representatives']     += 1
+
+    def check(self, str_path, d_peek, d_tags, l_tags):
+        """
+        Spot-check the tags that sharing would have given a file against
+        its fully read <d_tags>, comparing the known tags among the
+        <l_tags> (all of them if empty): whether the file has each, and
+        its value. On a mismatch the series is read file by file from
+        then on.
+        """
+        self.count('spotChecks')
+        d_shared    = self.tags_share(str_path, d_peek)
+        if d_shared is None:
+            return True
+        d_known     = d_shared['d_dicomSimple']
+        l_key       = [k for k in l_tags or sorted(set(d_known) | set(d_tags['l_tagRaw']))
+                        if k in d_shared['s_tag'] and k != 'PixelData']
+        s_tags      = set(d_tags['l_tagRaw'])
+        b_match     = all((k in d_known) == (k in s_tags) for k in l_key) and all(
+            str(d_known[k]) == str(d_tags['d_dicomSimple'].get(k))
+                for k in l_key if k in d_known
+        )
+        if not b_match:
+            with self.lock:
+                self.d_representative[(str_path, d_peek['seriesUID'])]  = None
+                self.d_count['spotCheckFailures']   += 1
+        return b_match
+
+    def stats(self):
+        with self.lock:
+            return dict(self.d_count)
+
+    def stats_add(self, d_stats):
+        """
+        Add counters (for example from a worker process).
+        """
+        with self.lock:
+            for k, v in d_stats.items():
+                self.d_count[k] += v
@@ -0,0 +1,291 @@
+"""
+Sharded runs: one input tree split across several machines (or
+processes).
+
+Every shard walks the whole tree, and then keeps only its own part of
+the directory list, so that all shards agree on the partition without
+talking to each other. The partition is either by a stable hash of each
+directory's path (relative to the input directory, so that the tree
+may be mounted elsewhere on each machine), which keeps a directory in
+the same shard as the tree grows, or balanced by the size of the
+directories.
+
+Each shard writes its results to a shard file, and merge() combines the
+shard files of a run into the results of a single-node run.
+"""
+
+import      os
+import      json
+import      glob
+import      hashlib
+
+try:
+    from    .profiling          import stageProfile
+    from    .sniff              import readLog
+    from    .strraw             import strRawExplicit
+    from    .template           import stemMemo
+except:
+    from    profiling           import stageProfile
+    from    sniff               import readLog
+    from    strraw              import strRawExplicit
+    from    template            import stemMemo
+
+l_method        = ['hash', 'size']
+
+# The callback results of a run, whose statuses are (as pftree makes
+# them) True if the callback succeeded for any one directory
+l_anyKey        = ['d_inputCallback', 'd_analyzeCallback', 'd_outputCallback']
+
+# The callback result of each tree_process() callback
+d_stage         = {
+    'inputReadCallback':    'd_inputCallback',
+    'analysisCallback':     'd_analyzeCallback',
+    'outputWriteCallback':  'd_outputCallback'
+}
+
+def stages_get(d_callback):
+    """
+    The callback results (see l_anyKey) of the stages that a run with the
+    tree_process() callbacks <d_callback> ran.
+    """
+    return [str_key for str_callback, str_key in d_stage.items()
+                if d_callback.get(str_callback)]
+
+def status_get(d_ret, l_stage):
+    """
+    The status of the (merged) results <d_ret> of a run of the stages
+    <l_stage>, as pftree makes it: True if every stage that ran
+    succeeded for some directory.
+    """
+    return all(d_ret.get(str_key, {}).get('status', False) for str_key in l_stage)
+
+def shard_parse(str_shard):
+    """
+    The (index, count) of the shard <str_shard> given as 'i/N', with
+    1 <= i <= N.
+    """
+    try:
+        str_index, str_count    = str_shard.split('/')
+        index, count            = int(str_index), int(str_count)
+    except ValueError:
+        raise ValueError("a shard is given as 'i/N', not '%s'" % str_shard)
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError("shard '%s' is not one of 1/N .. N/N" % str_shard)
+    return index, count
+
+def path_key(str_path, str_inputDir):
+    """
+    The key of the input tree directory <str_path> that is hashed: the
+    path relative to <str_inputDir>.
+    """
+    if os.path.isabs(str_path):
+        str_path    = os.path.relpath(str_path, str_inputDir)
+    return os.path.normpath(str_path)
+
+def dirs_partition(l_path, count, **kwargs):
+    """
+    Partition the directories <l_path> into <count> shards, and return
+    {<path>: <shard index (1..count)>}.
+
+    kwargs:
+
+        method      = <'hash' (the default) or 'size'>
+        inputDir    = <the input directory the paths are relative to>
+        d_size      = <{<path>: <size>} of the directories, for 'size'; the
+                       size defaults to 1>
+
+    The 'size' method assigns the directories, largest first, to the
+    shard that has the least so far.
+    """
+    str_method  = 'hash'
+    str_inputDir= ''
+    d_size      = {}
+    for k, v in kwargs.items():
+        if k == 'method':       str_method      = v
+        if k == 'inputDir':     str_inputDir    = v
+        if k == 'd_size':       d_size          = v
+
+    if str_method not in l_method:
+        raise ValueError("unknown shard method '%s'" % str_method)
+    d_shard     = {}
+    if str_method == 'hash':
+        for str_path in l_path:
+            digest  = hashlib.md5(path_key(str_path, str_inputDir).encode()).digest()
+            d_shard[str_path]   = int.from_bytes(digest[:8], 'big') % count + 1
+        return d_shard
+    l_load      = [0] * count
+    for str_path in sorted(l_path, key = lambda p: (-d_size.get(p, 1),
+                                                    path_key(p, str_inputDir))):
+        i                   = l_load.index(min(l_load))
+        l_load[i]           += d_size.get(str_path, 1)
+        d_shard[str_path]   = i + 1
+    return d_shard
+
+def file_name(index, count):
+    """
+    The name of the result file of shard <index> of <count>.
+    """
+    return 'pfdicom-shard-%d-of-%d.json' % (index, count)
+
+def file_suffix(str_file, index, count):
+    """
+    <str_file> with the shard in its name (before the extension), for the
+    files that each shard writes on its own.
+    """
+    str_stem, str_ext   = os.path.splitext(str_file)
+    return '%s.shard-%d-of-%d%s' % (str_stem, index, count, str_ext)
+
+def result_save(str_file, d_shard, d_ret, d_raw):
+    """
+    Write the result file of a shard: its <d_shard> description, its
+    tree_process() results <d_ret> and the <d_raw> counters (profile,
+    read log, explicit string conversions and output file stem memo)
+    that merge() adds up.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(str_file)), exist_ok = True)
+    str_tmp = str_file + '.tmp'
+    with open(str_tmp, 'w') as fp:
+        json.dump({
+            'd_shard':  d_shard,
+            'd_ret':    d_ret,
+            'd_raw':    d_raw
+        }, fp, indent = 4, sort_keys = True, default = str)
+    os.replace(str_tmp, str_file)
+
+def files_find(l_arg):
+    """
+    The shard result files of <l_arg>: files, or directories holding
+    shard files.
+    """
+    l_file  = []
+    for str_arg in l_arg:
+        if os.path.isdir(str_arg):
+            l_file.extend(sorted(glob.glob(os.path.join(str_arg, 'pfdicom-shard-*-of-*.json'))))
+        else:
+            l_file.append(str_arg)
+    return l_file
+
+def value_merge(a, b, b_any = False):
+    """
+    Merge the result values <a> and <b> of two shards: counts add up,
+    statuses must all be True (or, with <b_any>, and in the callback
+    results of l_anyKey, any one), dictionaries merge key by key, lists
+    are joined, and differing strings become the list of their values.
+    """
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if isinstance(a, bool) and isinstance(b, bool):
+        return (a or b) if b_any else (a and b)
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)) and \
+       not isinstance(a, bool) and not isinstance(b, bool):
+        return a + b
+    if isinstance(a, dict) and isinstance(b, dict):
+        d_merge = dict(a)
+        for k, v in b.items():
+            d_merge[k]  = value_merge(a.get(k), v, b_any or k in l_anyKey)
+        return d_merge
+    if isinstance(a, list) and isinstance(b, list):
+        return a + b
+    if a == b:
+        return a
+    if isinstance(a, list):
+        return a + [b] if b not in a else a
+    return [a, b]
+
+def merge(l_file):
+    """
+    Combine the shard result files <l_file> of one run into the results
+    that a single-node run would have returned, with a 'd_shards'
+    description of the merge.
+
+    As in a single-node run, the status is True if every stage that ran
+    (read, analysis, write) succeeded for some directory, of any shard:
+    it is worked out from the merged stage statuses, and not from the
+    shard statuses, since one shard may only have read its directories
+    and another only have written them. It is False, though, if a shard
+    is missing, is of a run with a different shard count, or is given
+    more than once (only the first is merged).
+    """
+    l_shard     = []
+    for str_file in l_file:
+        with open(str_file) as fp:
+            l_shard.append(json.load(fp))
+    if not l_shard:
+        return {
+            'status':   False,
+            'error':    'no shard result files'
+        }
+    l_shard.sort(key = lambda d: d['d_shard']['index'])
+    count       = l_shard[0]['d_shard']['count']
+    l_index     = []
+    l_duplicate = []
+    l_unique    = []
+    for d_shard in l_shard:
+        index   = d_shard['d_shard']['index']
+        if index in l_index:
+            if index not in l_duplicate:
+                l_duplicate.append(index)
+            continue
+        l_index.append(index)
+        l_unique.append(d_shard)
+    l_shard     = l_unique
+    l_missing   = [i for i in range(1, count + 1) if i not in l_index]
+    l_mixed     = [d['d_shard']['count'] for d in l_shard if d['d_shard']['count'] != count]
+
+    d_ret       = {}
+    profile     = stageProfile()
+    log         = readLog()
+    strRaw      = strRawExplicit()
+    memo        = None
+    l_merged    = []
+    for d_shard in l_shard:
+        # A shard without directories has no results (nor a status) to add
+        if d_shard['d_shard']['dirs']:
+            d_ret   = value_merge(d_ret, d_shard['d_ret'])
+            l_merged.append(d_shard)
+        d_raw   = d_shard.get('d_raw', {})
+        if d_raw.get('d_profile'):
+            profile.merge(d_raw['d_profile'])
+        log.merge(d_raw.get('d_readLog', {}))
+        strRaw.merge(d_raw.get('d_strRaw', {}))
+        if 'd_stemMemo' in d_raw:
+            memo    = memo or stemMemo(d_shard['d_ret']['d_stemMemo']['maxEntries'])
+            memo.merge(d_raw['d_stemMemo'])
+
+    # Every shard counts one more file set than it processed
+    if 'fileSetsProcessed' in d_ret:
+        d_ret['fileSetsProcessed']  -= len(l_merged) - 1
+    if 'd_profile' in d_ret:
+        d_ret['d_profile']  = profile.report()
+    if 'd_tagExport' in d_ret:
+        # Each shard writes a file of its own: the columns are those of
+        # the widest, and a tag dropped by several shards is one tag
+        l_export                = [d['d_ret']['d_tagExport'] for d in l_merged
+                                    if 'd_tagExport' in d['d_ret']]
+        l_tagsDropped           = sorted(set().union(*[d.get('l_tagsDropped', [])
+                                                       for d in l_export]))
+        d_ret['d_tagExport'].update({
+            'columns':          max(d.get('columns', 0) for d in l_export),
+            'tagsDropped':      len(l_tagsDropped),
+            'l_tagsDropped':    l_tagsDropped
+        })
+    d_ret['d_readLog']      = log.stats()
+    d_ret['d_strRaw']       = strRaw.stats()
+    if memo:
+        d_ret['d_stemMemo'] = memo.stats()
+    # Shard files of earlier versions do not list their stages
+    l_stage         = l_shard[0]['d_shard'].get('l_stage', l_anyKey)
+    d_ret['status']         = bool(l_merged) and status_get(d_ret, l_stage) and \
+                              not l_missing and not l_mixed and not l_duplicate
+    d_ret['d_shards']       = {
+        'count':        count,
+        'l_index':      l_index,
+        'l_missing':    l_missing,
+        'l_duplicate':  l_duplicate,
+        'l_file':       list(l_file),
+        'dirs':         sum(d['d_shard']['dirs'] for d in l_shard),
+        'dirsTotal':    l_shard[0]['d_shard']['dirsTotal']
+    }
+    return d_ret
@@ -0,0 +1,138 @@
+"""
+Cheap DICOM file type sniffing, and the log of files that could not be
+read.
+
+A DICOM file has a 128 byte preamble followed by the 'DICM' magic. Some
+older files have no preamble and start straight with the dataset, whose
+first element is then in group 0002 (file meta) or 0008 (identifying).
+Anything else is rejected from its first 132 bytes, without a parse.
+"""
+
+import      struct
+import      threading
+import      collections
+
+# The groups a dataset without a preamble can start with
+l_rawGroup  = [0x0002, 0x0008]
+
+class notDICOM(Exception):
+    """
+    The file is not a DICOM file.
+    """
+    pass
+
+def dcm_sniff(head):
+    """
+    The kind of file whose first (up to) 132 bytes are <head>:
+
+        'DICM'  a DICOM file with preamble and magic,
+        'raw'   a dataset without a preamble (pydicom needs 'force'),
+        ''      not DICOM.
+    """
+    if len(head) >= 132 and head[128:132] == b'DICM':
+        return 'DICM'
+    if len(head) < 8:
+        return ''
+    group, element  = struct.unpack('<HH', head[0:4])
+    if group not in l_rawGroup:
+        return ''
+    if head[4:6].isalpha() and head[4:6].isupper():
+        # Explicit VR
+        return 'raw'
+    # Implicit VR: the value length must be plausible
+    (length,)       = struct.unpack('<L', head[4:8])
+    if length != 0xffffffff and length > (1 << 30):
+        return ''
+    return 'raw'
+
+def fp_check(fp):
+    """
+    Sniff the open file <fp> (from its current position, which is kept)
+    and return the extra pydicom read arguments it needs. Raises
+    notDICOM if it is not a DICOM file.
+    """
+    pos     = fp.tell()
+    head    = fp.read(132)
+    fp.seek(pos)
+    str_kind    = dcm_sniff(head)
+    if not str_kind:
+        raise notDICOM('no DICM magic or group 0002/0008 start')
+    if str_kind == 'raw':
+        return {'force': True}
+    return {}
+
+class readLog(object):
+    """
+    The counts of the files of a run that were rejected as not DICOM or
+    failed to read, and the last <maxEntries> of them with the reason.
+    """
+
+    maxEntries  = 100
+
+    def __init__(self, **kwargs):
+        """
+        kwargs:
+
+            maxEntries  = <number of files to keep in the log>
+        """
+        for k, v in kwargs.items():
+            if k == 'maxEntries':   self.maxEntries = int(v)
+        self.lock       = threading.Lock()
+        self.d_count    = {
+            'rejected':     0,
+            'failed':       0
+        }
+        self.l_entry    = collections.deque(maxlen = self.maxEntries)
+
+    def add(self, str_kind, str_file, str_reason):
+        """
+        Count <str_file> as 'rejected' or 'failed' (<str_kind>) for
+        <str_reason>.
+        """
+        with self.lock:
+            self.d_count[str_kind]  += 1
+            self.l_entry.append({
+                'file':     str_file,
+                'kind':     str_kind,
+                'reason':   str_reason
+            })
+
+    def stats(self):
+        with self.lock:
+            return {
+                **self.d_count,
+                'l_entry':  list(self.l_entry)
+            }
+
+    def drain(self):
+        """
+        The counts and entries so far (and forget them).
+        """
+        with self.lock:
+            d_stats         = {
+                **self.d_count,
+                'l_entry':  list(self.l_entry)
+            }
+            for k in self.d_count:
+                self.d_count[k] = 0
+            self.l_entry.clear()
+        return d_stats
+
+    def merge(self, d_stats):
+        """
+        Add the drained <d_stats> (for example from a worker process).
+        """
+        with self.lock:
+            for k in self.d_count:
+                self.d_count[k] += d_stats.get(k, 0)
+            self.l_entry.extend(d_stats.get('l_entry', []))
+
+    def summary(self):
+        """
+        A one line summary, or '' if every file was read.
+        """
+        with self.lock:
+            if not self.d_count['rejected'] and not self.d_count['failed']:
+                return ''
+            return '%d file(s) skipped as not DICOM, %d failed to read' % \
+                    (self.d_count['rejected'], self.d_count['failed'])
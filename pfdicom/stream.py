@@ -0,0 +1,73 @@
+"""
+Streaming traversal of the input tree (see pfdicom.tree_stream()).
+
+pftree walks the whole input tree into a dictionary of every directory
+and its files before anything is processed, which on trees of tens of
+millions of files can exhaust memory before the first DICOM file is
+read. dirs_scan() instead finds the directories with os.scandir() and
+yields them one at a time, so that each can be processed, and released,
+before the next is listed. Only the file names of the directory at hand
+and the paths of the directories still to visit are held.
+
+The directories come in the order (and with the path strings) that
+pftree's walk gives them, with one difference: pftree lists the
+subdirectories of the input directory itself as its "files", whereas
+here the input directory, like every other, lists the files it holds.
+"""
+
+import      os
+
+def dirs_scan(str_rootDir, **kwargs):
+    """
+    Generate (<path>, [<file name>, ...]) for each directory under (and
+    including) <str_rootDir> that holds files, depth first.
+
+    kwargs:
+
+        maxDepth    = <the number of levels below <str_rootDir> to walk;
+                       default -1, all>
+        followLinks = <descend into symbolic links to directories; default
+                       False>
+        inputFile   = <only the files whose path contains this string>
+        pathRoot    = <the string that stands for <str_rootDir> in the
+                       paths generated; default <str_rootDir>>
+
+    Directories that cannot be listed are skipped, as os.walk() does.
+    """
+    maxDepth        = -1
+    b_followLinks   = False
+    str_inputFile   = ''
+    str_pathRoot    = str_rootDir
+    for k, v in kwargs.items():
+        if k == 'maxDepth':     maxDepth        = int(v)
+        if k == 'followLinks':  b_followLinks   = bool(v)
+        if k == 'inputFile':    str_inputFile   = v
+        if k == 'pathRoot':     str_pathRoot    = v
+
+    l_stack         = [(str_rootDir, str_pathRoot, 0)]
+    while l_stack:
+        str_dir, str_path, depth    = l_stack.pop()
+        l_file      = []
+        l_dir       = []
+        try:
+            with os.scandir(str_dir) as it:
+                for entry in it:
+                    try:
+                        b_dir   = entry.is_dir()
+                    except OSError:
+                        b_dir   = False
+                    if not b_dir:
+                        l_file.append(entry.name)
+                    elif b_followLinks or not entry.is_symlink():
+                        l_dir.append(entry.name)
+        except OSError:
+            continue
+        if len(str_inputFile):
+            l_file  = [f for f in l_file if str_inputFile in os.path.join(str_path, f)]
+        if maxDepth < 0 or depth < maxDepth:
+            # Reversed, so that the first subdirectory is visited first
+            for str_name in reversed(l_dir):
+                l_stack.append((os.path.join(str_dir, str_name),
+                                os.path.join(str_path, str_name), depth + 1))
+        if l_file:
+            yield str_path, l_file
@@ -0,0 +1,177 @@
+"""
+The element by element string conversion of datasets that str(dcm)
+fails on.
+
+When str() of a dataset fails, it is nearly always because of one
+element -- typically a vendor private tag -- and the same element
+then fails in every file from the same source. The elements that
+failed are remembered per (vendor, private creator), so that later
+files that have them skip str(dcm) and the element's own str(), and go
+straight to the safe, element by element conversion. The failures are
+counted rather than logged file by file.
+"""
+
+import      threading
+
+from        pydicom.tag         import  Tag
+from        pydicom.dataelem    import  RawDataElement
+
+def value_str(elem):
+    """
+    The value of the (possibly still raw) element <elem> as a stripped
+    string, or '' if there is none.
+    """
+    if elem is None:
+        return ''
+    value   = getattr(elem, 'value', None)
+    if isinstance(value, bytes):
+        value   = value.decode('ascii', 'replace')
+    return str(value if value is not None else '').strip(' \x00')
+
+def element_str(elem):
+    """
+    str() of the data element <elem>. A raw element is one that failed
+    to convert (see dicommap.dcm_dict()), and raises ValueError.
+    """
+    if isinstance(elem, RawDataElement):
+        raise ValueError('element %s does not convert' % Tag(elem.tag))
+    return str(elem)
+
+class strRawExplicit(object):
+    """
+    The explicit conversion, and its memory of failing elements, for
+    one process.
+    """
+
+    def __init__(self):
+        self.lock       = threading.Lock()
+        # group -> {element key, ...} of the elements known to fail
+        self.d_failing  = {}
+        # element key -> number of failures
+        self.d_failure  = {}
+        self.d_count    = {
+            'files':        0,
+            'filesSkipped': 0
+        }
+
+    def element_key(self, fn_elem, tag, str_vendor):
+        """
+        The memory key of the element <tag>: the vendor, the private
+        creator (if it is a private tag) and the tag -- for a private tag
+        with its creator's block number masked out, since that can differ
+        from file to file. The other elements of the dataset are looked
+        up with <fn_elem>(tag), which gives None if there is none.
+        """
+        tag     = Tag(tag)
+        if not tag.is_private or tag.element < 0x0100:
+            return (str_vendor, '', int(tag))
+        str_creator = value_str(fn_elem(Tag(tag.group, tag.element >> 8)))
+        return (str_vendor, str_creator, int(Tag(tag.group, tag.element & 0xff)))
+
+    def failure_known(self, dcm):
+        """
+        Does <dcm> have an element that is known to fail conversion? Then
+        str(dcm) need not even be tried.
+        """
+        if not self.d_failing:
+            return False
+
+        def fn_elem(tag):
+            # The element as it is, without converting a raw one
+            return dcm.get_item(tag) if tag in dcm else None
+
+        str_vendor  = value_str(fn_elem(Tag(0x0008, 0x0070)))
+        for tag in dcm.keys():
+            s_key   = self.d_failing.get(tag >> 16)
+            if s_key and self.element_key(fn_elem, tag, str_vendor) in s_key:
+                with self.lock:
+                    self.d_count['filesSkipped']    += 1
+                return True
+        return False
+
+    def dcmToStr_doExplicit(self, d_dcm):
+        """
+        Perform an explicit element by element conversion on dictionary
+        of dcm FileDataset, and return (str_raw, b_status). Elements that
+        are known to fail are not converted at all.
+        """
+        b_status    = True
+        l_raw       = []
+        str_vendor  = value_str(d_dcm.get(Tag(0x0008, 0x0070)))
+        l_failed    = []
+        for k in list(d_dcm.keys()):
+            key     = None
+            s_key   = self.d_failing.get(k >> 16)
+            if s_key:
+                key = self.element_key(d_dcm.get, k, str_vendor)
+            if key is None or key not in s_key:
+                try:
+                    l_raw.append(element_str(d_dcm[k]))
+                    continue
+                except:
+                    key = key or self.element_key(d_dcm.get, k, str_vendor)
+            l_raw.append('Failed to string convert key "%s"' % k)
+            l_failed.append(key)
+            b_status    = False
+        with self.lock:
+            self.d_count['files']   += 1
+            for key in l_failed:
+                self.d_failing.setdefault(key[2] >> 16, set()).add(key)
+                self.d_failure[key]  = self.d_failure.get(key, 0) + 1
+        return ''.join(s + '\n' for s in l_raw), b_status
+
+    def stats(self):
+        """
+        The counts of files converted explicitly (and of those that skipped
+        str(dcm)), and the failing elements by number of failures.
+        """
+        with self.lock:
+            return {
+                **self.d_count,
+                'l_failure':    [
+                    {
+                        'vendor':   str_vendor,
+                        'creator':  str_creator,
+                        'tag':      str(Tag(tag)),
+                        'count':    count
+                    } for (str_vendor, str_creator, tag), count in
+                        sorted(self.d_failure.items(), key = lambda kv: -kv[1])
+                ]
+            }
+
+    def drain(self):
+        """
+        The counts so far (and forget them), in a form that merge() takes.
+        The memory of failing elements is kept.
+        """
+        with self.lock:
+            d_stats         = {
+                **self.d_count,
+                'l_failure':    list(self.d_failure.items())
+            }
+            for k in self.d_count:
+                self.d_count[k] = 0
+            self.d_failure  = {}
+        return d_stats
+
+    def merge(self, d_stats):
+        """
+        Add the drained <d_stats> (for example from a worker process).
+        """
+        with self.lock:
+            for k in self.d_count:
+                self.d_count[k] += d_stats.get(k, 0)
+            for key, count in d_stats.get('l_failure', []):
+                key                 = tuple(key)
+                self.d_failure[key] = self.d_failure.get(key, 0) + count
+                self.d_failing.setdefault(key[2] >> 16, set()).add(key)
+
+    def summary(self):
+        """
+        A one line summary, or '' if no file needed the explicit conversion.
+        """
+        with self.lock:
+            if not self.d_count['files']:
+                return ''
+            return '%d file(s) needed an explicit string conversion, %d element(s) failed' % \
+                    (self.d_count['files'], sum(self.d_failure.values()))
@@ -0,0 +1,469 @@
+"""
+A compiled form of the '%'-tagged output file stem templates.
+
+The template language (see pfdicom.tagsInString_process) is defined by
+the original string-replace interpreter, which re-parses the template
+for every file. A 'tagTemplate' does that parsing once, and then only
+has to look up and transform the tag values for each file.
+"""
+
+import      re
+import      hashlib
+import      threading
+import      collections
+
+try:
+    import  numpy
+except ImportError:
+    numpy   = None
+
+def md5_transform(str_value, chars = None):
+    """
+    md5 hash of <str_value>, optionally truncated to <chars> characters.
+    """
+    str_hash    = hashlib.md5(str_value.encode('utf-8')).hexdigest()
+    if chars is not None:
+        str_hash    = str_hash[0:chars]
+    return str_hash
+
+def strmsk_transform(str_value, str_msk):
+    """
+    Mask <str_value> with <str_msk>: a '*' in the mask keeps the value
+    character, anything else replaces it. The result is as long as the
+    shorter of the two.
+    """
+    return ''.join([i if j == '*' else j for i, j in zip(str_value, str_msk)])
+
+def nospc_transform(str_value, str_char = ''):
+    """
+    Replace every run of non-alphanumeric characters in <str_value>
+    with <str_char>, dropping any at the start or end.
+    """
+    return str_char.join(re.sub(r'\W+', ' ', str_value).split())
+
+def column_map(fn_batch, l_value):
+    """
+    The column of tag values <l_value> mapped by <fn_batch>, which takes a
+    list of values and returns the list of their results. A None (a file
+    that was not read) stays None.
+
+    The values of a tag column typically repeat (at least within a
+    series). If a sample of them shows that fewer than half are
+    distinct, each distinct value is only computed once.
+    """
+    l_sample    = l_value[::max(1, len(l_value) // 4096)]
+    repeats     = len(l_sample) - len(set(l_sample))
+    # For a sample much smaller than the column, the number of distinct
+    # values is estimated from its repeats, as in the birthday problem
+    if repeats * 2 >= len(l_sample) or repeats * len(l_value) >= len(l_sample) ** 2:
+        l_unique        = [v for v in set(l_value) if v is not None]
+        d_result        = dict(zip(l_unique, fn_batch(l_unique)))
+        d_result[None]  = None
+        return list(map(d_result.__getitem__, l_value))
+    if None not in l_value:
+        return fn_batch(l_value)
+    l_index     = [i for i, v in enumerate(l_value) if v is not None]
+    l_result    = [None] * len(l_value)
+    for i, result in zip(l_index, fn_batch([l_value[i] for i in l_index])):
+        l_result[i] = result
+    return l_result
+
+def md5_column(l_value, chars = None):
+    """
+    md5_transform() of every value of the column <l_value>.
+    """
+    fn_md5  = hashlib.md5
+    return column_map(
+        lambda l_str: [fn_md5(v.encode('utf-8')).hexdigest()[0:chars] for v in l_str],
+        l_value
+    )
+
+def strmsk_batch(l_str, str_msk):
+    """
+    strmsk_transform() of each of the strings <l_str>. With numpy, they
+    are masked at once, as a matrix of their character codes (a row per
+    string) and the codes of the mask.
+    """
+    width       = len(str_msk)
+    if numpy is None or not width or '\x00' in str_msk or set(map(type, l_str)) != {str}:
+        return [strmsk_transform(v, str_msk) for v in l_str]
+    # Strings longer than the mask are cut to its length, as zip() does
+    a_value     = numpy.array(l_str, dtype = 'U%d' % width)
+    a_code      = a_value.view(numpy.uint32).reshape(len(l_str), width)
+    a_length    = numpy.minimum(numpy.fromiter(map(len, l_str), dtype = numpy.int64,
+                                               count = len(l_str)), width)
+    a_past      = numpy.arange(width) >= a_length[:, None]
+    a_msk       = numpy.array([ord(c) for c in str_msk], dtype = numpy.uint32)
+    a_keep      = a_msk == ord('*')
+    # numpy strings cannot end in NUL: strings with a NUL within the mask
+    # are done one by one
+    if (numpy.char.str_len(a_value) != a_length).any() or \
+       ((a_code == 0) & a_keep & ~a_past).any():
+        return [strmsk_transform(v, str_msk) for v in l_str]
+    a_result    = numpy.where(a_keep, a_code, a_msk)
+    # ... and the result is no longer than the string
+    a_result[a_past]    = 0
+    return a_result.view('U%d' % width).ravel().tolist()
+
+def strmsk_column(l_value, str_msk):
+    """
+    strmsk_transform() of every value of the column <l_value>.
+    """
+    return column_map(lambda l_str: strmsk_batch(l_str, str_msk), l_value)
+
+def nospc_column(l_value, str_char = ''):
+    """
+    nospc_transform() of every value of the column <l_value>.
+    """
+    fn_sub  = re.compile(r'\W+').sub
+    return column_map(
+        lambda l_str: [str_char.join(fn_sub(' ', v).split()) for v in l_str],
+        l_value
+    )
+
+def column_transform(l_value, str_func):
+    """
+    The column of tag values <l_value> transformed by the function
+    <str_func>, given as in a template: 'md5', 'md5|<chars>',
+    'strmsk|<mask>', 'nospc' or 'nospc|<char>'. The result is the same as
+    that of the function on each value in turn, but takes one call for
+    the whole column.
+    """
+    l_args  = str_func.split('|')
+    if l_args[0] == 'md5':
+        return md5_column(l_value, int(l_args[1]) if len(l_args) > 1 else None)
+    if l_args[0] == 'strmsk' and len(l_args) > 1:
+        return strmsk_column(l_value, l_args[1])
+    if l_args[0] == 'nospc':
+        return nospc_column(l_value, l_args[1] if len(l_args) > 1 else '')
+    raise ValueError("'%s' is not a column transform" % str_func)
+
+def argTag_resolve(str_argTag):
+    """
+    Function arguments that name a DICOM tag start with a lower case
+    character -- return the actual tag name.
+    """
+    return re.sub('([a-zA-Z])', lambda x: x.groups()[0].upper(), str_argTag, 1)
+
+class stemMemo(object):
+    """
+    A bounded (least recently used) memory of evaluated templates, keyed
+    on the template, the tags it matched and the tag values (and name
+    seeds) it used. All the files of a series typically evaluate to the
+    same output stem, which is then only computed once.
+    """
+
+    def __init__(self, maxEntries = 4096):
+        self.maxEntries = maxEntries
+        self.lock       = threading.Lock()
+        self.od_entry   = collections.OrderedDict()
+        self.d_count    = {
+            'hits':     0,
+            'misses':   0,
+            'evicted':  0
+        }
+
+    def get(self, key):
+        """
+        The remembered result for <key>, or None.
+        """
+        with self.lock:
+            value   = self.od_entry.get(key)
+            if value is None:
+                self.d_count['misses']  += 1
+                return None
+            self.od_entry.move_to_end(key)
+            self.d_count['hits']    += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Remember <value> for <key>, forgetting the least recently used
+        entry if the memory is full.
+        """
+        with self.lock:
+            self.od_entry[key]  = value
+            if len(self.od_entry) > self.maxEntries:
+                self.od_entry.popitem(last = False)
+                self.d_count['evicted'] += 1
+
+    def stats(self):
+        """
+        The counters and the hit rate.
+        """
+        with self.lock:
+            lookups = self.d_count['hits'] + self.d_count['misses']
+            return {
+                **self.d_count,
+                'maxEntries':   self.maxEntries,
+                'hitRate':      self.d_count['hits'] / lookups if lookups else 0.0
+            }
+
+    def drain(self):
+        """
+        The counters so far (and forget them). The entries are kept.
+        """
+        with self.lock:
+            d_stats         = dict(self.d_count)
+            for k in self.d_count:
+                self.d_count[k] = 0
+        return d_stats
+
+    def merge(self, d_stats):
+        """
+        Add the drained <d_stats> (for example from a worker process).
+        """
+        with self.lock:
+            for k in self.d_count:
+                self.d_count[k] += d_stats.get(k, 0)
+
+class tagTemplate(object):
+    """
+    A '%'-tagged string template, compiled once and then evaluated
+    against the tags of many DICOM files.
+
+    The set of tags that the original interpreter matches against the
+    template depends on which tags a given file actually contains. For
+    each distinct such set the interpreter's sequence of string
+    operations is replayed once on a symbolic version of the template
+    in which the tag values are opaque slots. This gives a list of
+    literal strings and slots that is joined in a single pass per file.
+
+    A program is only used when it provably gives the same result as the
+    interpreter: if replaying finds that a later string operation could
+    match across a slot boundary, or a file's tag values could themselves
+    be matched by a later operation (they contain a '%' or '_'), or are
+    not strings, the caller's interpreter is used instead.
+    """
+
+    l_func  = ['md5', 'strmsk', 'nospc', 'name']
+
+    def __init__(self, astr, **kwargs):
+        """
+        kwargs:
+
+            memo    = <stemMemo that remembers the results of evaluate()>
+        """
+        self.str_template   = astr
+        self.l_frag         = astr.split('%')[1:]
+        self.d_candidate    = {}
+        self.d_program      = {}
+        self.memo           = None
+        for k, v in kwargs.items():
+            if k == 'memo':     self.memo   = v
+
+    def candidate_check(self, tag):
+        """
+        Could <tag> be matched by the template? This is the case if it
+        appears anywhere in one of the '%' fragments.
+        """
+        b_candidate = self.d_candidate.get(tag)
+        if b_candidate is None:
+            b_candidate             = any(tag in frag for frag in self.l_frag)
+            self.d_candidate[tag]   = b_candidate
+        return b_candidate
+
+    def tags_referenced(self, l_keyword):
+        """
+        The tags among <l_keyword> (typically all the DICOM keywords) that
+        the template could need: those it could match, and the tags that
+        seed a 'name' function. A file read with only these tags gives the
+        same result as one read in full.
+        """
+        l_tag       = [tag for tag in l_keyword if tag and self.candidate_check(tag)]
+        for frag in self.l_frag:
+            for func in frag.split('_')[1:]:
+                l_args  = func.split('|')
+                if l_args[0] == 'name' and len(l_args) > 1:
+                    l_tag.append(argTag_resolve(l_args[1]))
+        return l_tag
+
+    def program_compile(self, l_tagsToSub):
+        """
+        Replay the interpreter over the matched tags in <l_tagsToSub>
+        (in file order) and return the program:
+
+            {
+                'l_segment':    [<literal str> | <slot index>, ...],
+                'l_slot':       [(tag, l_op, b_guard), ...],
+                'b_tagsFound':  <bool>
+            }
+
+        or None if the template cannot be compiled for these tags.
+        """
+        l_segment   = [self.str_template]
+        l_slot      = []
+        l_frag      = self.l_frag
+
+        def replace(str_pattern, l_with):
+            """
+            Replace <str_pattern> in the literal segments, making sure
+            that no occurrence could straddle a slot.
+            """
+            nonlocal l_segment
+            l_new   = []
+            for i, seg in enumerate(l_segment):
+                if isinstance(seg, int):
+                    if i and isinstance(l_segment[i - 1], str):
+                        str_prev    = l_segment[i - 1]
+                        for n in range(1, len(str_pattern)):
+                            if str_prev.endswith(str_pattern[0:n]):
+                                return False
+                    l_new.append(seg)
+                    continue
+                l_part  = seg.split(str_pattern)
+                for j, str_part in enumerate(l_part):
+                    if j: l_new.extend(l_with)
+                    l_new.append(str_part)
+            # Merge adjacent literals and drop empty ones
+            l_segment   = []
+            for seg in l_new:
+                if isinstance(seg, str):
+                    if not seg: continue
+                    if l_segment and isinstance(l_segment[-1], str):
+                        l_segment[-1]   += seg
+                        continue
+                l_segment.append(seg)
+            return True
+
+        l_tagsToSubSort = sorted(
+            l_tagsToSub,
+            key = lambda x: [i for i, s in enumerate(l_frag) if x in s][0]
+        )
+        for tag, frag in zip(l_tagsToSubSort, l_frag):
+            l_op    = []
+            for str_func in self.l_func:
+                if str_func not in frag: continue
+                l_funcTag   = frag.split('_')[1:]
+                if not len(l_funcTag): return None
+                func        = l_funcTag[0]
+                l_args      = func.split('|')
+                try:
+                    if str_func == 'md5':
+                        l_op.append(('md5',
+                                     int(l_args[1]) if len(l_args) > 1 else None))
+                    if str_func == 'strmsk':
+                        l_op.append(('strmsk', l_args[1]))
+                    if str_func == 'nospc':
+                        l_op.append(('nospc',
+                                     l_args[1] if len(l_args) > 1 else ''))
+                    if str_func == 'name':
+                        l_op.append(('name',
+                                     argTag_resolve(l_args[1]) if len(l_args) > 1 else None))
+                except (IndexError, ValueError):
+                    return None
+                if not replace('_%s_' % func, []): return None
+            if not replace('%' + tag, [len(l_slot)]): return None
+            l_slot.append([tag, l_op, False])
+
+        # A slot value needs guarding if any operation follows its
+        # insertion, i.e. for all but the last slot.
+        for slot in l_slot[:-1]:
+            slot[2] = True
+
+        return {
+            'l_segment':    l_segment,
+            'l_slot':       [tuple(slot) for slot in l_slot],
+            'b_tagsFound':  bool(len(l_slot))
+        }
+
+    def program_get(self, l_tagRaw):
+        """
+        Return the (cached) program for a file with tags <l_tagRaw>.
+        """
+        t_tagsToSub = tuple(t for t in l_tagRaw if self.candidate_check(t))
+        if t_tagsToSub not in self.d_program:
+            self.d_program[t_tagsToSub] = self.program_compile(t_tagsToSub)
+        return self.d_program[t_tagsToSub]
+
+    def evaluate(self, l_tagRaw, fn_tagGet, fn_tagHas, fn_name):
+        """
+        Evaluate the template for a file with tags <l_tagRaw>, with tag
+        values looked up by <fn_tagGet>. The 'name' function is delegated
+        to <fn_name>(<seed value or None>).
+
+        Returns the interpreter's result dictionary, or None if the
+        interpreter needs to be run instead.
+
+        With a <memo>, the result is remembered for the tag values (and
+        'name' seeds) used, unless an unseeded 'name' makes it random.
+        """
+        if '%' not in self.str_template:
+            return {
+                'status':       True,
+                'b_tagsFound':  False,
+                'str_result':   self.str_template
+            }
+
+        t_tagsToSub = tuple(t for t in l_tagRaw if self.candidate_check(t))
+        d_program   = self.program_get(l_tagRaw)
+        if d_program is None:
+            return None
+
+        # All checks that could send us back to the interpreter are
+        # done before any 'name' is generated, since an unseeded name
+        # advances the shared name generator state.
+        l_raw       = []
+        l_seed      = []
+        l_key       = []
+        b_memo      = self.memo is not None
+        for tag, l_op, b_guard in d_program['l_slot']:
+            value   = fn_tagGet(tag)
+            seed    = None
+            # Every transform gives a string, and 'name' an empty one
+            b_str   = isinstance(value, str)
+            for str_op, arg in l_op:
+                if str_op != 'name' and not b_str:
+                    return None
+                if str_op == 'name':
+                    b_str   = True
+                    # Only a seeded name is the same every time
+                    b_memo  = b_memo and arg is not None and fn_tagHas(arg)
+                    if arg is not None and fn_tagHas(arg):
+                        seed    = fn_tagGet(arg)
+                        if not isinstance(seed, str):
+                            return None
+            # A name does not depend on the value it replaces
+            b_name  = any(str_op == 'name' for str_op, arg in l_op)
+            b_memo  = b_memo and (b_name or isinstance(value, str))
+            l_raw.append(value)
+            l_key.append(None if b_name else value)
+            l_seed.append(seed)
+
+        key         = None
+        if b_memo:
+            key     = (self.str_template, t_tagsToSub, tuple(l_key), tuple(l_seed))
+            str_result  = self.memo.get(key)
+            if str_result is not None:
+                return {
+                    'status':       True,
+                    'b_tagsFound':  d_program['b_tagsFound'],
+                    'str_result':   str_result
+                }
+
+        l_value     = []
+        for (tag, l_op, b_guard), value in zip(d_program['l_slot'], l_raw):
+            for str_op, arg in l_op:
+                if str_op == 'md5':     value = md5_transform(value, arg)
+                if str_op == 'strmsk':  value = strmsk_transform(value, arg)
+                if str_op == 'nospc':   value = nospc_transform(value, arg)
+                if str_op == 'name':    value = ''
+            if not isinstance(value, str):
+                return None
+            if b_guard and ('%' in value or '_' in value):
+                return None
+            l_value.append(value)
+
+        for i, (tag, l_op, b_guard) in enumerate(d_program['l_slot']):
+            if any(str_op == 'name' for str_op, arg in l_op):
+                l_value[i]  = fn_name(l_seed[i])
+
+        str_result  = ''.join([l_value[seg] if isinstance(seg, int) else seg
+                                for seg in d_program['l_segment']])
+        if key is not None:
+            self.memo.put(key, str_result)
+        return {
+            'status':       True,
+            'b_tagsFound':  d_program['b_tagsFound'],
+            'str_result':   str_result
+        }
@@ -20,9 +20,13 @@ setup(
       url              =   'https://github.com/FNNDSC/pfdicom',
       packages         =   ['pfdicom'],
       install_requires =   ['pfmisc', 'pftree', 'pydicom', 'pydicom-ext', 'faker'],
+      extras_require   =   {
+          'columnar':  ['pyarrow']
+      },
       entry_points={
           'console_scripts': [
-              'pfdicom = pfdicom.__main__:main'
+              'pfdicom = pfdicom.__main__:main',
+              'pfdicom-bench = pfdicom.bench:main'
           ]
       },
       license          =   'MIT',
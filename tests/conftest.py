@@ -0,0 +1,46 @@
+#
+# Shared fixtures: a small synthetic DICOM tree (see pfdicom/bench.py),
+# and helpers to run a tag-extract tool over it.
+#
+
+import      os
+import      json
+
+import      pytest
+
+from        pfdicom             import  bench
+
+@pytest.fixture(scope = 'session')
+def d_tree(tmp_path_factory):
+    """
+    Four series of four files each, two directory levels deep.
+    """
+    return bench.tree_generate(str(tmp_path_factory.mktemp('tree')), depth = 1,
+                               series = 4, files = 4, tags = 2, rows = 8)
+
+def tool_run(d_tree, str_outputDir, l_args = [], cls = None):
+    """
+    A run() of <cls> (a benchDICOM by default) over the tree.
+    """
+    pf_dicom    = bench.pfdicom_make(d_tree['rootDir'], str(str_outputDir),
+                                     ['--fileFilter', 'dcm'] + l_args,
+                                     cls or bench.benchDICOM)
+    return pf_dicom.run()
+
+def stems_read(str_outputDir):
+    """
+    The 'stems.json' files a benchDICOM wrote, by their directory
+    relative to <str_outputDir>.
+    """
+    d_stems = {}
+    for str_dir, l_dirs, l_files in os.walk(str(str_outputDir)):
+        if 'stems.json' in l_files:
+            with open(os.path.join(str_dir, 'stems.json')) as fp:
+                d_stems[os.path.relpath(str_dir, str(str_outputDir))] = json.load(fp)
+    return d_stems
+
+def pfdicom_make(l_args = [], cls = None):
+    """
+    A pfdicom (or <cls>) object that is not run, for its methods.
+    """
+    return bench.pfdicom_make('.', '.', l_args, cls)
@@ -0,0 +1,101 @@
+#
+# The tag index must serve exactly the values (types included) that a
+# parse of the file gives.
+#
+
+import      os
+
+import      pytest
+
+import      pydicom             as      dicom
+from        pydicom.dataset     import  Dataset
+from        pydicom.sequence    import  Sequence
+
+from        pfdicom             import  bench
+from        pfdicom.cache       import  tagIndex
+from        pfdicom.series      import  dcm_tags
+
+def values_check(d_simple, d_index):
+    assert set(d_index) == set(d_simple)
+    for k, v in d_simple.items():
+        assert type(d_index[k]) is type(v), k
+        assert d_index[k] == v, k
+        assert str(d_index[k]) == str(v), k
+
+def dataset_make():
+    """
+    A dataset with a value of each kind that pydicom returns.
+    """
+    ds                          = bench.dataset_make(3, 7, '1.2.3.4', 2, 4)
+    ds.PatientName              = 'Doe^John^^Dr'
+    ds.PixelSpacing             = ['0.50', '1']
+    ds.SliceThickness           = '2.500'
+    ds.ImagesInAcquisition      = '007'
+    ds.ImageType                = ['ORIGINAL', 'PRIMARY']
+    ds.FrameIncrementPointer    = 0x00181063
+    ds.AcquisitionMatrix        = [0, 256, 256, 0]
+    ds.OtherPatientIDs          = ''
+    ds.WindowCenter             = ''
+    ds.ReferencedImageSequence  = Sequence([Dataset(), Dataset()])
+    ds.ReferencedImageSequence[0].ReferencedSOPInstanceUID  = '1.2.3.4.5'
+    ds.ReferencedImageSequence[1].add_new((0x0019, 0x1010), 'DS', '0.10')
+    return ds
+
+def test_roundtrip(tmp_path):
+    str_file    = str(tmp_path / 'file.dcm')
+    dataset_make().save_as(str_file, write_like_original = False)
+    d_tags      = dcm_tags(dicom.dcmread(str_file))
+    index       = tagIndex(str(tmp_path / 'cache'))
+    assert index.put(str_file, d_tags['l_tagRaw'], d_tags['d_dicomSimple'])
+
+    # A new index object reads it from the database
+    d_index     = tagIndex(str(tmp_path / 'cache')).get(str_file)
+    assert d_index['l_tagRaw'] == d_tags['l_tagRaw']
+    values_check(d_tags['d_dicomSimple'], d_index['d_dicomSimple'])
+    assert d_index['d_dicomSimple']['PatientName'].family_name == 'Doe'
+    assert d_index['d_dicomSimple']['PixelSpacing'][0] == 0.5
+    assert int(d_index['d_dicomSimple']['ImagesInAcquisition']) == 7
+
+def test_unchanged(tmp_path):
+    """
+    An entry is only served while the file is unchanged.
+    """
+    str_file    = str(tmp_path / 'file.dcm')
+    dataset_make().save_as(str_file, write_like_original = False)
+    index       = tagIndex(str(tmp_path / 'cache'))
+    index.put(str_file, ['PatientID'], {'PatientID': '1'})
+    assert index.get(str_file)
+    with open(str_file, 'ab') as fp:
+        fp.write(b'\0\0')
+    assert index.get(str_file) is None
+    assert index.stats()['hits'] == 1 and index.stats()['misses'] == 1
+
+def test_notIndexed(tmp_path):
+    """
+    A value that cannot be stored as it is is not stored at all.
+    """
+    str_file    = str(tmp_path / 'file.dcm')
+    open(str_file, 'w').close()
+    index       = tagIndex(str(tmp_path / 'cache'))
+    assert not index.put(str_file, ['PatientID'], {'PatientID': object()})
+    assert index.get(str_file) is None
+
+def test_run(tmp_path):
+    """
+    The values a tool sees are the same with and without the index,
+    and on a hit.
+    """
+    d_tree      = bench.tree_generate(str(tmp_path / 'tree'), depth = 0, series = 1,
+                                      files = 2, tags = 2, rows = 4)
+    l_file      = bench.files_list(d_tree['rootDir'])
+    l_args      = ['--cacheDir', str(tmp_path / 'cache')]
+    pf_plain    = bench.pfdicom_make(d_tree['rootDir'], str(tmp_path))
+    for str_run in ['miss', 'hit']:
+        pf_cache    = bench.pfdicom_make(d_tree['rootDir'], str(tmp_path), l_args)
+        for str_file in l_file:
+            d_plain = pf_plain.DICOMfile_read(file = str_file)
+            d_cache = pf_cache.DICOMfile_read(file = str_file)
+            values_check(d_plain['d_DICOM']['d_dicomSimple'], d_cache['d_DICOM']['d_dicomSimple'])
+            assert d_cache['d_DICOM']['d_json'] == d_plain['d_DICOM']['d_json']
+            assert d_cache['outputFileStem'] == d_plain['outputFileStem']
+        assert pf_cache.tagIndex.stats()['hits' if str_run == 'hit' else 'misses'] == len(l_file)
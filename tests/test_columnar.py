@@ -0,0 +1,91 @@
+#
+# The columnar tag export (needs pyarrow).
+#
+
+import      os
+import      datetime
+
+import      pytest
+
+pytest.importorskip('pyarrow')
+
+from        pfdicom             import  columnar
+from        conftest            import  tool_run
+
+def rows_make(n, d_tag):
+    return [columnar.row_make('dir', 'file-%d' % i, 'stem-%d' % i, d_tag) for i in range(n)]
+
+def test_addAfterClose(tmp_path):
+    table   = columnar.tagTable(str(tmp_path / 'tags.parquet'))
+    table.batch_add(rows_make(2, {'PatientID': '1'}))
+    d_stats = table.close()
+    assert d_stats['rows'] == 2
+    with pytest.raises(ValueError):
+        table.batch_add(rows_make(1, {'PatientID': '2'}))
+    assert table.close() == d_stats
+
+def test_tagsDropped(tmp_path):
+    """
+    A tag that is not a column is counted once, however many rows have it.
+    """
+    table   = columnar.tagTable(str(tmp_path / 'tags.parquet'), l_tags = ['PatientID'])
+    table.batch_add(rows_make(3, {'PatientID': '1', 'Modality': 'MR'}))
+    table.batch_add(rows_make(3, {'PatientID': '1', 'Modality': 'MR'}))
+    d_stats = table.close()
+    assert d_stats['tagsDropped'] == 1
+    assert d_stats['l_tagsDropped'] == ['Modality']
+
+def table_read(str_file):
+    pyarrow = columnar.pyarrow_load()
+    if str_file.endswith('.arrow'):
+        with pyarrow.memory_map(str_file) as source:
+            return pyarrow.ipc.open_file(source).read_all()
+    return pyarrow.parquet.read_table(str_file)
+
+@pytest.mark.parametrize('str_name', ['tags.parquet', 'tags.arrow'])
+def test_tagsUnion(tmp_path, str_name):
+    """
+    Tags that only later directories have are columns too, null for the
+    files without them.
+    """
+    str_file    = str(tmp_path / str_name)
+    table       = columnar.tagTable(str_file)
+    table.batch_add(rows_make(2, {'PatientID': '1'}))
+    table.batch_add(rows_make(3, {'PatientID': '2', 'Modality': 'MR'}))
+    table.batch_add(rows_make(1, {'PatientID': '3'}))
+    table.batch_add(rows_make(2, {'StudyDate': '20200101', 'Rows': 8}))
+    d_stats     = table.close()
+    assert d_stats['tagsDropped'] == 0
+    assert d_stats['parts'] == 3
+    assert d_stats['rowGroups'] == 4
+    assert os.listdir(str(tmp_path)) == [str_name]
+    d_column    = table_read(str_file).to_pydict()
+    assert list(d_column) == columnar.l_metaColumn + ['Modality', 'PatientID', 'Rows',
+                                                      'StudyDate']
+    assert d_column['PatientID'] == ['1', '1', '2', '2', '2', '3', None, None]
+    assert d_column['Modality'] == [None, None, 'MR', 'MR', 'MR', None, None, None]
+    assert d_column['Rows'] == [None] * 6 + [8, 8]
+    assert d_column['StudyDate'] == [None] * 6 + [datetime.date(2020, 1, 1)] * 2
+
+def test_onePart(tmp_path):
+    table   = columnar.tagTable(str(tmp_path / 'tags.parquet'))
+    table.batch_add(rows_make(2, {'PatientID': '1', 'Modality': 'MR'}))
+    table.batch_add(rows_make(2, {'PatientID': '2'}))
+    assert table.close()['parts'] == 1
+    assert os.listdir(str(tmp_path)) == ['tags.parquet']
+    assert table_read(str(tmp_path / 'tags.parquet')).num_rows == 4
+
+@pytest.mark.parametrize('l_args', [[], ['--executor', 'process', '--workers', '2'],
+                                    ['--exportTags', 'PatientID,Rows']],
+                         ids = ['thread', 'process', 'exportTags'])
+def test_run(d_tree, tmp_path, l_args):
+    str_file    = str(tmp_path / 'tags.parquet')
+    d_ret       = tool_run(d_tree, tmp_path / 'out', ['--tagExport', str_file] + l_args)
+    d_column    = table_read(str_file).to_pydict()
+    assert len(d_column['inputFilename']) == d_tree['files']
+    if '--exportTags' in l_args:
+        assert list(d_column) == columnar.l_metaColumn + ['PatientID', 'Rows']
+        assert 'Modality' in d_ret['d_tagExport']['l_tagsDropped']
+    else:
+        assert {'Modality', 'PatientID', 'Rows', 'SeriesInstanceUID'} <= set(d_column)
+        assert d_ret['d_tagExport']['tagsDropped'] == 0
@@ -0,0 +1,87 @@
+#
+# 'pfdicom serve': jobs sent to a warm server give the results of a
+# command line run, and a job cannot choose the class that runs it.
+#
+
+import      os
+import      sys
+import      json
+import      time
+import      tempfile
+import      threading
+import      subprocess
+
+from        pfdicom             import  bench
+from        pfdicom             import  daemon
+from        pfdicom.__main__    import  parserSA
+from        conftest            import  tool_run, stems_read
+
+def job_make(d_tree, str_outputDir, **kwargs):
+    return {
+        'inputDir':         d_tree['rootDir'],
+        'outputDir':        str(str_outputDir),
+        'fileFilter':       'dcm',
+        'outputFileStem':   bench.l_template[1],
+        **kwargs
+    }
+
+def test_serveStdin(d_tree, tmp_path):
+    """
+    Jobs over stdin, with the class given at start-up: a job that names
+    a class of its own fails, and the jobs around it run as usual.
+    """
+    l_job       = [
+        job_make(d_tree, tmp_path / 'j1', id = 'j1'),
+        job_make(d_tree, tmp_path / 'j2', id = 'j2', cls = 'os:system'),
+        job_make(d_tree, tmp_path / 'j3', id = 'j3', **{'class': 'os:system'}),
+        job_make(d_tree, tmp_path / 'j4', id = 'j4'),
+        {'command': 'shutdown'}
+    ]
+    p_serve     = subprocess.run([sys.executable, '-m', 'pfdicom', 'serve',
+                                  '--class', 'pfdicom.bench:benchDICOM'],
+                                 input = ''.join(json.dumps(d) + '\n' for d in l_job),
+                                 capture_output = True, text = True, timeout = 120)
+    l_record    = [json.loads(l) for l in p_serve.stdout.splitlines()]
+    assert l_record[0]['record'] == 'ready'
+    assert l_record[0]['class'] == 'benchDICOM'
+    d_job       = {d['id']: d for d in l_record if d['record'] == 'job'}
+    assert d_job['j1']['status'] and d_job['j4']['status']
+    for str_id in ['j2', 'j3']:
+        assert not d_job[str_id]['status']
+        assert 'not options of the tool' in d_job[str_id]['error']
+        assert not os.path.exists(tmp_path / str_id)
+    assert l_record[-1] == {**l_record[-1], 'record': 'shutdown', 'jobs': 4, 'failed': 2}
+
+    d_single    = tool_run(d_tree, tmp_path / 'single')
+    assert d_job['j1']['d_ret']['filesRead'] == d_single['filesRead']
+    assert stems_read(tmp_path / 'j1') == stems_read(tmp_path / 'single')
+
+def test_serveSocket(d_tree, tmp_path):
+    """
+    A round trip over the Unix socket: the results come back to the
+    client, and the server stops on a shutdown job.
+    """
+    # A socket path must be short, which a pytest tmp_path may not be
+    str_socket  = os.path.join(tempfile.mkdtemp(prefix = 'pfd-'), 'serve.sock')
+    server      = daemon.jobServer(bench.benchDICOM, parserSA)
+    thread      = threading.Thread(target = server.socket_serve, args = (str_socket,))
+    thread.start()
+    try:
+        for i in range(100):
+            if os.path.exists(str_socket): break
+            time.sleep(0.05)
+        assert os.stat(str_socket).st_mode & 0o777 == 0o600
+        l_result    = daemon.job_send(str_socket, [
+                        job_make(d_tree, tmp_path / 'j1', id = 'j1', jsonStream = True),
+                        {'command': 'shutdown'}
+                      ])
+    finally:
+        thread.join(timeout = 60)
+    assert not thread.is_alive()
+    assert not os.path.exists(str_socket)
+    d_job       = [d for d in l_result if d['record'] == 'job'][0]
+    assert d_job['status'] and d_job['d_ret']['filesRead'] == d_tree['files']
+    assert {d['id'] for d in l_result if d['record'] not in ['job', 'shutdown']} == {'j1'}
+    assert l_result[-1]['record'] == 'shutdown'
+    tool_run(d_tree, tmp_path / 'single')
+    assert stems_read(tmp_path / 'j1') == stems_read(tmp_path / 'single')
@@ -0,0 +1,69 @@
+#
+# DICOMdir_read() must give, column by column, what DICOMfile_read()
+# gives file by file -- aligned with its file names, for files that
+# lack a tag or cannot be read too.
+#
+
+import      os
+
+import      pytest
+
+from        pydicom.uid         import  generate_uid
+
+from        pfdicom             import  bench
+from        conftest            import  pfdicom_make
+
+l_tags  = ['PatientID', 'InstanceNumber', 'Rows', 'WindowCenter', 'SeriesDescription']
+
+@pytest.fixture(scope = 'module')
+def str_dir(tmp_path_factory):
+    """
+    A directory of slices, only some of which have a WindowCenter, and a
+    file that is not DICOM.
+    """
+    str_dir         = str(tmp_path_factory.mktemp('dir'))
+    str_seriesUID   = generate_uid()
+    for i in range(5):
+        ds                  = bench.dataset_make(0, i, str_seriesUID, 1, 4)
+        if i % 2:
+            ds.WindowCenter = str(40 + i)
+        ds.save_as(os.path.join(str_dir, 'slice-%d.dcm' % (4 - i)), write_like_original = False)
+    with open(os.path.join(str_dir, 'slice-2a.dcm'), 'wb') as fp:
+        fp.write(b'not a DICOM file')
+    return str_dir
+
+def column_check(pf_dicom, str_dir, d_dir, l_tagsToUse):
+    assert d_dir['l_filename'] == sorted(os.listdir(str_dir))
+    assert d_dir['filesRead'] == 5
+    for i, str_file in enumerate(d_dir['l_filename']):
+        d_file  = pf_dicom.DICOMfile_read(file = os.path.join(str_dir, str_file),
+                                          l_tagsToUse = list(l_tagsToUse))
+        assert d_dir['l_status'][i] == d_file['status'], str_file
+        assert d_dir['l_outputFileStem'][i] == d_file['outputFileStem'], str_file
+        for tag in d_dir['l_tagsToUse']:
+            if not d_file['status']:
+                assert d_dir['d_column'][tag][i] is None
+                continue
+            assert str(d_dir['d_column'][tag][i]) == \
+                   str(d_file['d_DICOM']['d_dicomSimple'].get(tag, 'no attribute')), (str_file, tag)
+
+@pytest.mark.parametrize('l_args', [[], ['--cacheDir', '{cache}'], ['--io-concurrency', '2']],
+                         ids = ['plain', 'cache', 'prefetch'])
+def test_columns(str_dir, tmp_path, l_args):
+    l_args      = [a.format(cache = str(tmp_path / 'cache')) for a in l_args]
+    pf_dicom    = pfdicom_make(l_args)
+    for i in range(2):
+        d_dir   = pf_dicom.DICOMdir_read(str_dir, l_tags)
+        assert d_dir['l_tagsToUse'] == l_tags
+        column_check(pf_dicom, str_dir, d_dir, l_tags)
+    assert [str(v) for v in d_dir['d_column']['WindowCenter']] == \
+           ['no attribute', '43', 'no attribute', 'None', '41', 'no attribute']
+
+def test_allTags(str_dir):
+    pf_dicom    = pfdicom_make()
+    d_dir       = pf_dicom.DICOMdir_read(str_dir)
+    assert 'WindowCenter' in d_dir['l_tagsToUse']
+    assert 'PixelData' not in d_dir['l_tagsToUse']
+    column_check(pf_dicom, str_dir, d_dir, [])
+    assert pf_dicom.DICOMdir_read(str_dir, l_file = ['slice-0.dcm'])['l_tagsToUse'] != \
+           d_dir['l_tagsToUse']
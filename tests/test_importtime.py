@@ -0,0 +1,60 @@
+#
+# The cold-start import time of the pfdicom command line, with
+# 'python -X importtime', for 'pfdicom --version' and for a trivial run
+# (a walk of an empty tree): it must be within a (generous) budget, and
+# modules that are only needed for some runs (faker, pyarrow, the
+# process pool, the tag index's sqlite3 and the job server's
+# socketserver), or by none (asyncio), must not be loaded by either.
+#
+# The import time is that of all the modules imported, less those of a
+# bare 'python -c pass'. The budget is well above the ~250 ms that these
+# take on a development machine, so that only a regression (a heavy
+# module imported at start-up) fails it on a slow or busy one.
+#
+
+import      sys
+import      subprocess
+
+import      pytest
+
+# Modules that must only be imported on first use
+l_lazyModule    = ['faker', 'pyarrow', 'asyncio', 'multiprocessing',
+                   'concurrent.futures', 'sqlite3', 'socketserver']
+
+# Import time budget (ms)
+f_budget        = 1000.0
+
+def importtime_get(l_args):
+    """
+    The (total import time in ms, [imported module, ...]) of running
+    python with <l_args>.
+    """
+    p_run       = subprocess.run([sys.executable, '-X', 'importtime'] + l_args,
+                                 capture_output = True, text = True, timeout = 120)
+    f_total     = 0.0
+    l_module    = []
+    for str_line in p_run.stderr.splitlines():
+        if not str_line.startswith('import time:') or 'cumulative' in str_line:
+            continue
+        str_self, str_cumulative, str_name  = str_line[len('import time:'):].split('|')
+        l_module.append(str_name.strip())
+        # Only the top level imports, whose cumulative times add up
+        if not str_name[1:].startswith(' '):
+            f_total += int(str_cumulative) / 1000
+    return f_total, l_module
+
+@pytest.mark.parametrize('str_case', ['version', 'run'])
+def test_importtime(tmp_path, str_case):
+    l_args      = {
+        'version':  ['-m', 'pfdicom', '--version'],
+        'run':      ['-m', 'pfdicom',
+                     '--inputDir',  str(tmp_path / 'in'),
+                     '--outputDir', str(tmp_path / 'out'),
+                     '--verbosity', '0']
+    }[str_case]
+    (tmp_path / 'in').mkdir()
+    f_base, l_base      = importtime_get(['-c', 'pass'])
+    f_total, l_module   = importtime_get(l_args)
+    assert 'pfdicom' in l_module
+    assert [m for m in l_lazyModule if m in l_module] == []
+    assert f_total - f_base <= f_budget
@@ -0,0 +1,54 @@
+#
+# '--incremental': a directory whose output failed to write is not
+# recorded, and is processed again on the next run.
+#
+
+import      pytest
+
+from        pfdicom             import  bench
+from        conftest            import  tool_run
+
+def written(str_outputDir):
+    """
+    Has the output of 'series-0001' been written?
+    """
+    return bool(list(str_outputDir.glob('**/series-0001/stems.json')))
+
+class failDICOM(bench.benchDICOM):
+    """
+    Fails to write the output of 'series-0001' while <b_fail>.
+    """
+
+    b_fail  = False
+
+    def outputSaveCallback(self, at_data, **kwargs):
+        if failDICOM.b_fail and 'series-0001' in at_data[0]:
+            return {
+                'status':       False,
+                'filesSaved':   0
+            }
+        return super().outputSaveCallback(at_data, **kwargs)
+
+@pytest.mark.parametrize('l_args', [
+    [],
+    ['--executor', 'process', '--workers', '2'],
+    ['--stream'],
+    ['--stream', '--executor', 'process', '--workers', '2'],
+], ids = lambda l: ' '.join(l) or 'thread')
+def test_failedWrite(d_tree, tmp_path, l_args):
+    l_args  = ['--incremental'] + l_args
+    try:
+        failDICOM.b_fail    = True
+        d_ret   = tool_run(d_tree, tmp_path, l_args, failDICOM)
+    finally:
+        failDICOM.b_fail    = False
+    assert d_ret['d_incremental']['dirsProcessed'] == d_tree['series']
+    assert not written(tmp_path)
+
+    d_ret   = tool_run(d_tree, tmp_path, l_args, failDICOM)
+    assert d_ret['d_incremental']['dirsProcessed'] == 1
+    assert d_ret['d_incremental']['dirsSkipped'] == d_tree['series'] - 1
+    assert written(tmp_path)
+
+    d_ret   = tool_run(d_tree, tmp_path, l_args, failDICOM)
+    assert d_ret['d_incremental']['dirsProcessed'] == 0
@@ -0,0 +1,52 @@
+#
+# '--json-stream': one NDJSON record per directory as it is done, and
+# a final summary record.
+#
+
+import      json
+
+import      pytest
+
+from        conftest            import  tool_run, pfdicom_make
+
+l_stage = [
+    ('read',    'filesRead'),
+    ('analyze', 'filesAnalyzed'),
+    ('output',  'filesSaved')
+]
+
+def records_read(str_out):
+    return [json.loads(str_line) for str_line in str_out.splitlines()
+                if str_line.startswith('{')]
+
+@pytest.mark.parametrize('l_args', [
+    [],
+    ['--executor', 'process', '--workers', '2'],
+    ['--stream'],
+    ['--stream', '--executor', 'process', '--workers', '2'],
+], ids = lambda l: ' '.join(l) or 'thread')
+def test_records(d_tree, tmp_path, capsys, l_args):
+    d_ret       = tool_run(d_tree, tmp_path, ['--json-stream'] + l_args)
+    l_record    = records_read(capsys.readouterr().out)
+    assert len(l_record) == d_tree['series']
+    assert len(set(d['path'] for d in l_record)) == d_tree['series']
+    for d_record in l_record:
+        assert set(d_record) == {'record', 'path', 'status'} | \
+                                {k for t in l_stage for k in t}
+        assert d_record['record'] == 'directory'
+        assert d_record['status'] is True
+        for str_stage, str_files in l_stage:
+            assert d_record[str_stage] is True
+        assert d_record['filesRead'] == d_record['filesAnalyzed'] == d_tree['filesPerSeries']
+        assert d_record['filesSaved'] == 1
+    assert sum(d['filesRead'] for d in l_record) == d_ret['filesRead']
+
+def test_summary(capsys):
+    """
+    The results of run() are streamed as the 'summary' record.
+    """
+    d_ret       = pfdicom_make(['--json-stream']).run(timerStart = False)
+    l_record    = records_read(capsys.readouterr().out)
+    assert len(l_record) == 1
+    assert l_record[0]['record'] == 'summary'
+    assert l_record[0]['status'] == d_ret['status']
@@ -0,0 +1,44 @@
+#
+# A '--mmap' run must not hold a file descriptor per file read: a tree
+# of more files than the RLIMIT_NOFILE soft limit is run in a child
+# process with the limit lowered.
+#
+
+import      os
+
+import      pytest
+
+resource    = pytest.importorskip('resource')
+
+from        pfdicom             import  bench
+
+def fds_count():
+    return len(os.listdir('/proc/self/fd'))
+
+def limited_run(d_tree, str_outputDir, limit, l_args):
+    soft, hard  = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(limit, hard), hard))
+    fds         = fds_count()
+    pf_dicom    = bench.pfdicom_make(d_tree['rootDir'], str_outputDir,
+                                     ['--fileFilter', 'dcm', '--mmap'] + l_args,
+                                     bench.benchDICOM)
+    d_ret       = pf_dicom.run()
+    return {
+        'filesRead':    d_ret['filesRead'],
+        'failed':       pf_dicom.readLog.stats()['failed'],
+        'fdsLeaked':    fds_count() - fds
+    }, 0.0
+
+@pytest.fixture(scope = 'module')
+def d_large(tmp_path_factory):
+    return bench.tree_generate(str(tmp_path_factory.mktemp('large')), depth = 0,
+                               series = 2, files = 150, tags = 2, rows = 8)
+
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'), reason = 'needs /proc/self/fd')
+@pytest.mark.parametrize('l_args', [[], ['--stream']], ids = ['tree', 'stream'])
+def test_fds(d_large, tmp_path, l_args):
+    d_check, f_time, peakRSS    = bench.case_run(limited_run, d_large, str(tmp_path),
+                                                 100, l_args)
+    assert d_check['failed'] == 0
+    assert d_check['filesRead'] == d_large['files']
+    assert d_check['fdsLeaked'] <= 0
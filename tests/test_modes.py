@@ -0,0 +1,86 @@
+#
+# Every execution mode must write what the plain (threaded, walk first)
+# run writes.
+#
+
+import      os
+
+import      pytest
+
+from        pfdicom             import  bench
+from        conftest            import  tool_run, stems_read
+
+l_mode  = [
+    ['--threads', '2'],
+    ['--executor', 'process', '--workers', '2'],
+    ['--stream'],
+    ['--stream', '--executor', 'process', '--workers', '2'],
+    ['--seriesLevel'],
+    ['--headerOnly'],
+    ['--mmap'],
+    ['--io-concurrency', '4'],
+    ['--dropDatasets'],
+    ['--cacheDir', '{cache}'],
+]
+
+def args_make(l_args, tmp_path):
+    return [a.format(cache = str(tmp_path / 'cache')) for a in l_args]
+
+class tagDICOM(bench.benchDICOM):
+    """
+    Reads each file for its PatientID only -- the output file stem
+    template needs other tags as well.
+    """
+
+    def inputReadCallback(self, *args, **kwargs):
+        str_path, l_file    = args[0]
+        l_DCMRead           = [self.DICOMfile_read(file = os.path.join(str_path, f),
+                                                   l_tagsToUse = ['PatientID'])
+                                for f in l_file]
+        return {
+            'status':       True,
+            'l_DCMRead':    l_DCMRead,
+            'filesRead':    len(l_DCMRead)
+        }
+
+@pytest.fixture(scope = 'module')
+def d_base(d_tree, tmp_path_factory):
+    str_outputDir   = tmp_path_factory.mktemp('base')
+    d_ret           = tool_run(d_tree, str_outputDir)
+    assert d_ret['status']
+    return {'d_ret': d_ret, 'd_stems': stems_read(str_outputDir)}
+
+def test_base(d_tree, d_base):
+    assert d_base['d_ret']['filesRead'] == d_tree['files']
+    assert len(d_base['d_stems']) == d_tree['series']
+    for l_stem in d_base['d_stems'].values():
+        assert all('%' not in str_stem for str_stem in l_stem)
+
+@pytest.mark.parametrize('l_args', l_mode, ids = lambda l: ' '.join(l))
+def test_mode(d_tree, d_base, tmp_path, l_args):
+    d_ret   = tool_run(d_tree, tmp_path / 'out', args_make(l_args, tmp_path))
+    assert d_ret['status']
+    assert d_ret['filesRead'] == d_base['d_ret']['filesRead']
+    assert stems_read(tmp_path / 'out') == d_base['d_stems']
+
+def test_cache(d_tree, d_base, tmp_path):
+    """
+    A run that fills the tag index and one that is served from it.
+    """
+    l_args  = ['--cacheDir', str(tmp_path / 'cache')]
+    for str_run in ['miss', 'hit']:
+        d_ret   = tool_run(d_tree, tmp_path / str_run, l_args)
+        assert d_ret['status']
+        assert stems_read(tmp_path / str_run) == d_base['d_stems']
+
+@pytest.mark.parametrize('l_args', [[]] + l_mode, ids = lambda l: ' '.join(l) or 'default')
+def test_stemTagsToUse(d_tree, d_base, tmp_path, l_args):
+    """
+    A read of only some tags still gives the whole output file stem,
+    with and without '--headerOnly'.
+    """
+    for str_run, l_read in [('full', []), ('header', ['--headerOnly'])]:
+        d_ret   = tool_run(d_tree, tmp_path / str_run, args_make(l_args, tmp_path) + l_read,
+                           tagDICOM)
+        assert d_ret['status']
+        assert stems_read(tmp_path / str_run) == d_base['d_stems']
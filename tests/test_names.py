@@ -0,0 +1,58 @@
+#
+# A seeded '%_name' pseudonym must be the one earlier versions gave (by
+# seeding the global faker), and the same in every thread and process.
+#
+
+from        concurrent.futures  import  ThreadPoolExecutor, ProcessPoolExecutor
+
+import      pytest
+
+from        faker               import  Faker
+
+from        pfdicom             import  names
+from        conftest            import  pfdicom_make
+
+l_seed  = ['4412364', '4412365', 'PAT-0001', '', 'Ünïcode']
+
+def name_faker(str_seed):
+    """
+    The name as earlier versions made it: seed the global faker with the
+    bytes of the seed as a little endian number.
+    """
+    Faker.seed(int.from_bytes(str_seed.encode(), 'little'))
+    l_firstLast = Faker().name().split()
+    return '%s^%s^ANON' % (l_firstLast[1].upper(), l_firstLast[0].upper())
+
+def names_make(b_table):
+    return [names.name_generate(str_seed, b_table = b_table) for str_seed in l_seed * 20]
+
+@pytest.mark.parametrize('str_seed', l_seed)
+def test_faker(str_seed):
+    str_name    = name_faker(str_seed)
+    names.name_fakerSeeded.cache_clear()
+    assert names.name_generate(str_seed) == str_name
+    assert names.name_generate(str_seed) == str_name
+    assert pfdicom_make().name_generate(str_seed) == str_name
+
+@pytest.mark.parametrize('b_table', [False, True])
+def test_deterministic(b_table):
+    l_name      = names_make(b_table)
+    assert all(str_name.endswith('^ANON') for str_name in l_name)
+    assert len(set(l_name)) > 1
+    names.name_fakerSeeded.cache_clear()
+    names.name_fromSeed.cache_clear()
+    with ThreadPoolExecutor(8) as pool:
+        for l_thread in pool.map(names_make, [b_table] * 8):
+            assert l_thread == l_name
+    with ProcessPoolExecutor(2) as pool:
+        for l_process in pool.map(names_make, [b_table] * 2):
+            assert l_process == l_name
+
+def test_unseeded():
+    assert len({names.name_generate(b_table = b_table)
+                for b_table in [False, True] for i in range(20)}) > 2
+
+def test_nameTable():
+    pf_dicom    = pfdicom_make(['--nameTable'])
+    assert pf_dicom.name_generate('4412364') == names.name_fromSeed('4412364')
+    assert pf_dicom.name_generate('4412364') != name_faker('4412364')
@@ -0,0 +1,108 @@
+#
+# The read-ahead pipeline must hand over what it read, keep within its
+# buffer, never block a caller that takes files out of order, and not
+# need asyncio.
+#
+
+import      os
+import      sys
+import      time
+import      threading
+import      subprocess
+
+import      pytest
+
+from        pfdicom             import  prefetch
+
+class countedOpen(object):
+    """
+    An open() that counts the files opened, and how many are open at
+    once, each open taking <latency> seconds.
+    """
+
+    def __init__(self, latency = 0.01):
+        self.latency    = latency
+        self.lock       = threading.Lock()
+        self.opened     = 0
+        self.inFlight   = 0
+        self.maxFlight  = 0
+
+    def __call__(self, str_file, str_mode = 'rb'):
+        with self.lock:
+            self.opened     += 1
+            self.inFlight   += 1
+            self.maxFlight  = max(self.maxFlight, self.inFlight)
+        try:
+            time.sleep(self.latency)
+            return open(str_file, str_mode)
+        finally:
+            with self.lock:
+                self.inFlight   -= 1
+
+@pytest.fixture
+def l_file(tmp_path):
+    l_file  = []
+    for i in range(24):
+        str_file    = str(tmp_path / ('file-%02d' % i))
+        with open(str_file, 'wb') as fp:
+            fp.write(b'%d' % i * 100)
+        l_file.append(str_file)
+    return l_file
+
+def test_take(l_file):
+    fn_open     = countedOpen()
+    pipeline    = prefetch.filePrefetch(4, fileOpen = fn_open)
+    pipeline.schedule(l_file)
+    pipeline.schedule([os.path.dirname(l_file[0]) + '//' + os.path.basename(l_file[0])])
+    for i, str_file in enumerate(l_file):
+        assert pipeline.take(str_file) == b'%d' % i * 100
+    pipeline.close()
+    assert fn_open.opened == len(l_file)
+    assert 1 < fn_open.maxFlight <= 4
+
+def test_buffered(l_file):
+    fn_open     = countedOpen(0)
+    pipeline    = prefetch.filePrefetch(2, fileOpen = fn_open, buffered = 3)
+    pipeline.schedule(l_file)
+    time.sleep(0.2)
+    assert fn_open.opened == 3
+    assert pipeline.take(l_file[0]) is not None
+    time.sleep(0.2)
+    assert fn_open.opened == 4
+    pipeline.close()
+
+def test_outOfOrder(l_file):
+    fn_open     = countedOpen(0)
+    pipeline    = prefetch.filePrefetch(2, fileOpen = fn_open, buffered = 2)
+    pipeline.schedule(l_file)
+    time.sleep(0.2)
+    assert pipeline.take(l_file[-1]) is None
+    assert pipeline.take('not scheduled') is None
+    pipeline.discard(l_file[:2])
+    time.sleep(0.2)
+    assert pipeline.take(l_file[2]) == b'2' * 100
+    pipeline.close()
+
+def test_unreadable(tmp_path):
+    pipeline    = prefetch.filePrefetch(2)
+    pipeline.schedule([str(tmp_path / 'missing')])
+    assert pipeline.take(str(tmp_path / 'missing')) is None
+    pipeline.close()
+
+str_run = """
+import sys
+from pfdicom import bench
+d_ret = bench.pfdicom_make(sys.argv[1], sys.argv[2],
+                           ['--fileFilter', 'dcm', '--io-concurrency', '4'],
+                           bench.benchDICOM).run()
+assert d_ret['status'] and d_ret['filesRead']
+print(' '.join(m for m in ['asyncio', 'concurrent.futures'] if m in sys.modules))
+"""
+
+def test_noAsyncio(d_tree, tmp_path):
+    p_run       = subprocess.run([sys.executable, '-c', str_run, d_tree['rootDir'],
+                                  str(tmp_path)],
+                                 capture_output = True, text = True)
+    assert p_run.returncode == 0, p_run.stderr
+    assert p_run.stdout.split() == ['concurrent.futures']
+    assert 'Task was destroyed' not in p_run.stderr
@@ -0,0 +1,93 @@
+#
+# The latency buckets must bound the percentiles they report, and the
+# Prometheus output must be a valid cumulative histogram of them.
+#
+
+import      re
+import      json
+
+import      pytest
+
+from        pfdicom.profiling   import  stageProfile
+from        conftest            import  tool_run
+
+l_seconds   = [1e-5 * 1.37 ** i for i in range(40)]
+
+def profile_make(l_seconds, str_stage = 'parse'):
+    profile = stageProfile()
+    for f_seconds in l_seconds:
+        profile.add(str_stage, f_seconds, 100)
+    return profile
+
+def test_buckets():
+    d_parse = profile_make(l_seconds).report()['parse']
+    assert d_parse['count'] == len(l_seconds)
+    assert d_parse['seconds'] == pytest.approx(sum(l_seconds))
+    assert d_parse['max'] == max(l_seconds)
+    assert d_parse['bytes'] == 100 * len(l_seconds)
+    l_sorted    = sorted(l_seconds)
+    for str_q, q in stageProfile.l_quantile:
+        f_exact = l_sorted[max(0, int(q * len(l_sorted) + 0.5) - 1)]
+        assert f_exact <= d_parse[str_q] <= f_exact * 2 ** 0.25 * 1.0001, str_q
+
+def test_outOfRange():
+    d_parse = profile_make([0.0, 1e4]).report()['parse']
+    assert d_parse['p50'] == stageProfile.l_bound[0]
+    assert d_parse['p99'] == float('inf')
+
+def test_merge():
+    profile = profile_make(l_seconds[:25])
+    profile.merge(profile_make(l_seconds[25:]).drain())
+    d_parse = profile.report()['parse']
+    assert d_parse == pytest.approx(profile_make(l_seconds).report()['parse'])
+
+def prometheus_parse(str_text):
+    """
+    {(<metric>, <stage>, <le>): <value>} of the sample lines.
+    """
+    d_sample    = {}
+    for str_line in str_text.splitlines():
+        if str_line.startswith('#'):
+            continue
+        m   = re.fullmatch(r'(\w+)\{stage="(\w+)"(?:,le="([^"]+)")?\} (\S+)', str_line)
+        assert m, str_line
+        d_sample[m.group(1, 2, 3)]  = float(m.group(4))
+    return d_sample
+
+def test_prometheus():
+    profile = profile_make(l_seconds)
+    profile.add('open', 2e-4)
+    str_text    = profile.prometheus()
+    assert str_text.endswith('\n')
+    assert '# TYPE pfdicom_stage_seconds histogram' in str_text
+    d_sample    = prometheus_parse(str_text)
+    for str_stage, d_stage in profile.report().items():
+        l_bucket    = sorted((float(le), v) for (metric, stage, le), v in d_sample.items()
+                             if metric == 'pfdicom_stage_seconds_bucket' and stage == str_stage)
+        l_count     = [v for le, v in l_bucket]
+        assert l_count == sorted(l_count)
+        assert l_bucket[-1] == (float('inf'), d_stage['count'])
+        assert d_sample[('pfdicom_stage_seconds_count', str_stage, None)] == d_stage['count']
+        assert d_sample[('pfdicom_stage_seconds_sum', str_stage, None)] == \
+                pytest.approx(d_stage['seconds'])
+        for str_q, q in stageProfile.l_quantile:
+            assert min(le for le, v in l_bucket if v >= q * d_stage['count']) == \
+                    pytest.approx(d_stage[str_q])
+    assert d_sample[('pfdicom_stage_bytes_total', 'parse', None)] == 100 * len(l_seconds)
+    assert ('pfdicom_stage_bytes_total', 'open', None) not in d_sample
+
+@pytest.mark.parametrize('l_args', [[], ['--executor', 'process', '--workers', '2']],
+                         ids = ['thread', 'process'])
+def test_run(d_tree, tmp_path, l_args):
+    str_prom    = str(tmp_path / 'profile.prom')
+    str_json    = str(tmp_path / 'profile.json')
+    d_ret       = tool_run(d_tree, tmp_path / 'out',
+                           ['--profile', '--profileExport', str_prom] + l_args)
+    assert d_ret['d_profile']['file']['count'] == d_tree['files']
+    assert d_ret['d_profile']['parse']['count'] == d_tree['files']
+    assert d_ret['d_profile']['parse']['bytes'] > 0
+    d_sample    = prometheus_parse(open(str_prom).read())
+    assert d_sample[('pfdicom_stage_seconds_count', 'file', None)] == d_tree['files']
+    tool_run(d_tree, tmp_path / 'json', ['--profileExport', str_json] + l_args)
+    with open(str_json) as fp:
+        assert json.load(fp)['file']['count'] == d_tree['files']
@@ -0,0 +1,84 @@
+#
+# A fileRecord behaves as the mapping DICOMfile_read() always returned
+# (though it is not a dict), and its status is a plain field.
+#
+
+import      json
+import      pickle
+
+import      pytest
+
+from        pfdicom.record      import  fileRecord
+from        test_strraw         import  file_write
+from        conftest            import  pfdicom_make
+
+l_key   = ['status', 'inputPath', 'inputFilename', 'outputFileStem', 'd_DICOM', 'l_tagsToUse']
+
+def record_make():
+    return fileRecord(status = True, inputPath = '/in', inputFilename = 'a.dcm',
+                      outputFileStem = 'stem', d_DICOM = {'d_dicomSimple': {}},
+                      l_tagsToUse = ['PatientID'])
+
+def test_mapping():
+    d_read  = record_make()
+    d_dict  = dict(d_read)
+    assert list(d_read) == l_key
+    assert len(d_read) == len(l_key)
+    assert d_dict == {'status': True, 'inputPath': '/in', 'inputFilename': 'a.dcm',
+                      'outputFileStem': 'stem', 'd_DICOM': {'d_dicomSimple': {}},
+                      'l_tagsToUse': ['PatientID']}
+    assert d_read == d_dict and d_read.toDict() == d_dict
+    assert dict(d_read.items()) == d_dict
+    assert list(d_read.keys()) == l_key and list(d_read.values()) == list(d_dict.values())
+    assert 'outputFileStem' in d_read and 'other' not in d_read
+    assert d_read.get('other', 'default') == 'default'
+    with pytest.raises(KeyError):
+        d_read['other']
+
+    d_read['other']     = 1
+    d_read.update(outputFileStem = 'new')
+    assert d_read.setdefault('more', 2) == 2
+    assert list(d_read) == l_key + ['other', 'more']
+    assert d_read['outputFileStem'] == d_read.outputFileStem == 'new'
+    del d_read['other']
+    assert d_read.pop('more') == 2
+    with pytest.raises(KeyError):
+        del d_read['status']
+
+    d_copy  = d_read.copy()
+    d_copy['status']    = False
+    assert d_read['status'] and not d_copy['status']
+    assert pickle.loads(pickle.dumps(d_read)) == d_read
+    assert json.loads(json.dumps(d_read.toDict())) == d_read.toDict()
+
+def test_notDict():
+    d_read  = record_make()
+    assert not isinstance(d_read, dict)
+    with pytest.raises(TypeError):
+        json.dumps(d_read)
+
+def test_status():
+    d_read                  = record_make()
+    d_read['status']        = False
+    assert d_read.status is False and d_read.toDict()['status'] is False
+
+def test_strRawStatus(tmp_path):
+    """
+    A record's status is set False when its 'strRaw' fails to convert,
+    as a plain field that can be set again.
+    """
+    pf_dicom    = pfdicom_make()
+    d_read      = pf_dicom.DICOMfile_read(file = file_write(str(tmp_path / 'a.dcm'), 'ACME'))
+    assert d_read['status'] is True
+    d_read['d_DICOM']['strRaw']
+    assert d_read['status'] is False and d_read['d_DICOM'].b_strRaw is False
+    d_again     = fileRecord(**d_read.toDict())
+    d_again['status']   = True
+    assert d_again.strRaw_watch()['status'] is False
+    d_read['status']    = True
+    assert d_read['status'] is True
+
+    d_good      = pf_dicom.DICOMfile_read(file = file_write(str(tmp_path / 'b.dcm'), 'OTHER',
+                                                            b_bad = False))
+    d_good['d_DICOM']['strRaw']
+    assert d_good['status'] is True
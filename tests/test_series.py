@@ -0,0 +1,84 @@
+#
+# Series-level reading must only share the series tags: a tag that
+# varies from slice to slice is read from each file.
+#
+
+import      os
+
+import      pytest
+
+from        pydicom.uid         import  generate_uid
+
+from        pfdicom             import  bench
+from        pfdicom.series      import  seriesCache
+from        conftest            import  pfdicom_make
+
+l_tags  = ['PatientID', 'InstanceNumber', 'Rows', 'BitsStored', 'WindowCenter',
+           'WindowWidth', 'RescaleIntercept', 'PlanarConfiguration']
+
+@pytest.fixture(scope = 'module')
+def l_file(tmp_path_factory):
+    """
+    One series of slices with per-slice window and rescale values, and
+    a late tag that only some slices have.
+    """
+    str_dir         = str(tmp_path_factory.mktemp('series'))
+    str_seriesUID   = generate_uid()
+    l_file          = []
+    for i in range(6):
+        ds                  = bench.dataset_make(0, i, str_seriesUID, 1, 4)
+        ds.WindowCenter     = str(40 + i)
+        ds.WindowWidth      = str(400 + 10 * i)
+        if i % 2:
+            ds.RescaleIntercept = '-1024'
+        str_file            = os.path.join(str_dir, 'slice-%02d.dcm' % i)
+        ds.save_as(str_file, write_like_original = False)
+        l_file.append(str_file)
+    return l_file
+
+def records_read(l_file, l_args, l_tagsToUse):
+    pf_dicom    = pfdicom_make(l_args)
+    l_record    = [pf_dicom.DICOMfile_read(file = str_file, l_tagsToUse = l_tagsToUse)
+                    for str_file in l_file]
+    return pf_dicom, [d_record['d_DICOM'] for d_record in l_record], l_record
+
+def values_get(d_DICOM, l_tags):
+    return {k : (d_DICOM.tagValue_has(k), str(d_DICOM.tagValue_get(k))) for k in l_tags}
+
+@pytest.mark.parametrize('l_tagsToUse', [l_tags, []], ids = ['some', 'all'])
+def test_perSlice(l_file, l_tagsToUse):
+    pf_plain, l_plain, l_recordPlain    = records_read(l_file, [], l_tagsToUse)
+    pf_series, l_series, l_record       = records_read(l_file, ['--seriesLevel'], l_tagsToUse)
+    assert pf_series.seriesCache.stats()['shared'] == len(l_file) - 1
+    for d_plain, d_series in zip(l_plain, l_series):
+        assert values_get(d_series, l_tags) == values_get(d_plain, l_tags)
+        assert {k : str(v) for k, v in d_series['d_dicomSimple'].items()} == \
+               {k : str(v) for k, v in d_plain['d_dicomSimple'].items()}
+    assert len({str(d['d_dicomSimple']['WindowCenter']) for d in l_series}) == len(l_file)
+    assert [d['outputFileStem'] for d in l_record] == [d['outputFileStem'] for d in l_recordPlain]
+
+def test_seriesTagsOnly(l_file):
+    l_seriesTags        = ['PatientID', 'InstanceNumber', 'Rows', 'Columns', 'BitsStored']
+    pf_series, l_series, l_record   = records_read(l_file, ['--seriesLevel', '--outputFileStem',
+                                                            '%PatientID-%Modality'],
+                                                    l_seriesTags)
+    for d_series in l_series[1:]:
+        assert d_series['d_dicomSimple']['Rows'] == 4
+        assert not d_series.tagValue_has('PlanarConfiguration')
+        assert not dict.__contains__(d_series, 'dcm')
+    assert l_series[-1]['d_dicomSimple']['InstanceNumber'] == len(l_file)
+    assert [d_record['outputFileStem'] for d_record in l_record] == ['4412364-MR'] * len(l_file)
+    assert str(l_series[-1].tagValue_get('WindowCenter')) == str(40 + len(l_file) - 1)
+    assert dict.__contains__(l_series[-1], 'dcm')
+
+def test_spotCheck(l_file):
+    class windowShared(seriesCache):
+        l_tagSeries = seriesCache.l_tagSeries + ['WindowCenter']
+
+    pf_series   = pfdicom_make(['--seriesLevel', '--seriesSpotCheck', '1'])
+    pf_series.seriesCache   = windowShared(spotCheck = 1)
+    for str_file in l_file:
+        pf_series.DICOMfile_read(file = str_file, l_tagsToUse = l_tags)
+    d_stats     = pf_series.seriesCache.stats()
+    assert d_stats['shared'] == 0
+    assert d_stats['spotCheckFailures'] == 1
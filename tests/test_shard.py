@@ -0,0 +1,120 @@
+#
+# 'pfdicom merge' of shard results: the merged result must be what a
+# single-node run returns, and a shard's results must not count twice.
+#
+
+import      shutil
+
+import      pytest
+
+from        pfdicom             import  bench
+from        pfdicom             import  shard
+from        conftest            import  tool_run
+
+class failDICOM(bench.benchDICOM):
+    """
+    Fails to write the output of all but 'series-0000' -- so that the
+    shards without it fail as a whole.
+    """
+
+    def outputSaveCallback(self, at_data, **kwargs):
+        if 'series-0000' not in at_data[0]:
+            return {
+                'status':       False,
+                'filesSaved':   0
+            }
+        return super().outputSaveCallback(at_data, **kwargs)
+
+class stageFailDICOM(bench.benchDICOM):
+    """
+    Fails the stages in <d_fail> of the series they list.
+    """
+
+    d_fail  = {}
+
+    def stage_fails(self, str_stage, str_path):
+        return any('series-%s' % str_series in str_path
+                    for str_series in self.d_fail.get(str_stage, []))
+
+    def inputReadCallback(self, *args, **kwargs):
+        d_read  = super().inputReadCallback(*args, **kwargs)
+        if self.stage_fails('read', args[0][0]):
+            d_read['status']    = False
+        return d_read
+
+    def inputAnalyzeFile(self, *args, **kwargs):
+        d_analysis  = super().inputAnalyzeFile(*args, **kwargs)
+        if self.stage_fails('analyze', args[0][0]):
+            d_analysis['status']    = False
+        return d_analysis
+
+    def outputSaveCallback(self, at_data, **kwargs):
+        if self.stage_fails('output', at_data[0]):
+            return {
+                'status':       False,
+                'filesSaved':   0
+            }
+        return super().outputSaveCallback(at_data, **kwargs)
+
+def shards_run(d_tree, str_outputDir, cls = None, count = 3):
+    for i in range(1, count + 1):
+        tool_run(d_tree, str_outputDir, ['--shard', '%d/%d' % (i, count), '--relativeDir'], cls)
+    return shard.files_find([str(str_outputDir)])
+
+def test_merge(d_tree, tmp_path):
+    d_single    = tool_run(d_tree, tmp_path / 'single', ['--relativeDir'])
+    d_merged    = shard.merge(shards_run(d_tree, tmp_path / 'shards'))
+    assert d_merged['status'] == d_single['status'] == True
+    assert d_merged['filesRead'] == d_single['filesRead']
+    assert d_merged['d_shards']['l_missing'] == []
+
+def test_mergeFailedShard(d_tree, tmp_path):
+    """
+    Most directories fail to write: a single-node run is still a success
+    (as pftree ORs over the directories), so the merge must be as well.
+    """
+    d_single    = tool_run(d_tree, tmp_path / 'single', ['--relativeDir'], failDICOM)
+    d_merged    = shard.merge(shards_run(d_tree, tmp_path / 'shards', failDICOM))
+    assert d_merged['status'] == d_single['status']
+    assert d_merged['d_outputCallback']['status'] == d_single['d_outputCallback']['status']
+
+@pytest.mark.parametrize('d_fail', [
+    {'read': ['0000', '0001'], 'analyze': ['0002'], 'output': ['0003']},
+    {'read': ['0000', '0001', '0002'], 'output': ['0003']},
+    {'analyze': ['0000', '0001', '0002', '0003']},
+    {'read': ['0001'], 'output': ['0000', '0001', '0002', '0003']}
+])
+def test_mergeStageFailures(d_tree, tmp_path, d_fail):
+    """
+    Directories fail in different stages, so that a shard may fail as a
+    whole while each stage succeeded in some other shard: the merged
+    status is made of the merged stage statuses, as in a single-node run.
+    """
+    cls         = type('failDICOM', (stageFailDICOM,), {'d_fail': d_fail})
+    d_single    = tool_run(d_tree, tmp_path / 'single', ['--relativeDir'], cls)
+    d_merged    = shard.merge(shards_run(d_tree, tmp_path / 'shards', cls, 4))
+    for str_key in shard.l_anyKey:
+        assert d_merged[str_key]['status'] == d_single[str_key]['status']
+    assert d_merged['status'] == d_single['status']
+
+def test_mergeStages(d_tree, tmp_path):
+    """
+    A stage that a run did not have does not count against the status.
+    """
+    d_ret       = {
+        'd_inputCallback':      {'status': False},
+        'd_analyzeCallback':    {'status': True},
+        'd_outputCallback':     {'status': True}
+    }
+    assert shard.stages_get({'analysisCallback': print, 'outputWriteCallback': print}) == \
+            ['d_analyzeCallback', 'd_outputCallback']
+    assert shard.status_get(d_ret, ['d_analyzeCallback', 'd_outputCallback'])
+    assert not shard.status_get(d_ret, shard.l_anyKey)
+
+def test_mergeDuplicate(d_tree, tmp_path):
+    l_file      = shards_run(d_tree, tmp_path / 'shards')
+    shutil.copy(l_file[0], tmp_path / 'copy.json')
+    d_merged    = shard.merge(l_file + [str(tmp_path / 'copy.json')])
+    assert not d_merged['status']
+    assert d_merged['d_shards']['l_duplicate'] == [1]
+    assert d_merged['filesRead'] == d_tree['files']
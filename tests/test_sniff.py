@@ -0,0 +1,128 @@
+#
+# Files that are not DICOM are rejected from their first bytes, files
+# that fail to parse are counted, and neither stops a run.
+#
+
+import      io
+import      os
+import      struct
+
+import      pytest
+
+from        pydicom.uid         import  generate_uid
+
+from        pfdicom             import  bench, sniff
+from        conftest            import  tool_run, pfdicom_make
+
+@pytest.fixture(scope = 'module')
+def d_file(tmp_path_factory):
+    """
+    A DICOM file, the same without its preamble, and files that are not
+    (or not quite) DICOM.
+    """
+    str_dir     = tmp_path_factory.mktemp('sniff')
+    d_file      = {}
+    d_file['DICM']  = str(str_dir / 'dicm.dcm')
+    bench.dataset_make(0, 0, generate_uid(), 1, 4).save_as(d_file['DICM'],
+                                                           write_like_original = False)
+    with open(d_file['DICM'], 'rb') as fp:
+        data    = fp.read()
+    # The file meta, then a sequence that ends in the middle of an item
+    metaEnd     = 144 + struct.unpack('<L', data[140:144])[0]
+    d_content   = {
+        'raw':          data[132:],
+        'text':         b'This is not a DICOM file, but it is long enough to sniff.' * 4,
+        'empty':        b'',
+        'truncated':    data[:metaEnd] + struct.pack('<HH', 0x0008, 0x1140) + b'SQ\0\0' +
+                        struct.pack('<LHHL', 0xffffffff, 0xfffe, 0xe000, 0xffffffff) +
+                        b'\x08\x00'
+    }
+    for str_kind, content in d_content.items():
+        d_file[str_kind]    = str(str_dir / ('%s.dcm' % str_kind))
+        with open(d_file[str_kind], 'wb') as fp:
+            fp.write(content)
+    return d_file
+
+def test_dcmSniff():
+    assert sniff.dcm_sniff(b'\0' * 128 + b'DICM') == 'DICM'
+    assert sniff.dcm_sniff(struct.pack('<HH', 0x0008, 0x0005) + b'CS\x0a\x00') == 'raw'
+    assert sniff.dcm_sniff(struct.pack('<HHL', 0x0008, 0x0005, 10)) == 'raw'
+    assert sniff.dcm_sniff(struct.pack('<HHL', 0x0008, 0x0005, 0xffffffff)) == 'raw'
+    assert sniff.dcm_sniff(struct.pack('<HHL', 0x0008, 0x0005, 1 << 31)) == ''
+    assert sniff.dcm_sniff(struct.pack('<HHL', 0x0010, 0x0010, 10)) == ''
+    assert sniff.dcm_sniff(b'\0' * 7) == ''
+    assert sniff.dcm_sniff(b'\0' * 128 + b'DICX') == ''
+
+@pytest.mark.parametrize('str_kind, d_args', [('DICM', {}), ('raw', {'force': True})])
+def test_fpCheck(d_file, str_kind, d_args):
+    with open(d_file[str_kind], 'rb') as fp:
+        fp.seek(0)
+        assert sniff.fp_check(fp) == d_args
+        assert fp.tell() == 0
+    fp  = io.BytesIO(b'xx' + open(d_file[str_kind], 'rb').read())
+    fp.seek(2)
+    assert sniff.fp_check(fp) == d_args
+    assert fp.tell() == 2
+
+@pytest.mark.parametrize('str_kind', ['text', 'empty'])
+def test_fpCheckReject(d_file, str_kind):
+    with open(d_file[str_kind], 'rb') as fp:
+        with pytest.raises(sniff.notDICOM):
+            sniff.fp_check(fp)
+
+@pytest.mark.parametrize('l_args', [[], ['--mmap'], ['--io-concurrency', '2'], ['--headerOnly']],
+                         ids = ['plain', 'mmap', 'prefetch', 'headerOnly'])
+def test_read(d_file, l_args):
+    pf_dicom    = pfdicom_make(l_args)
+    d_status    = {str_kind : pf_dicom.DICOMfile_read(file = str_file)['status']
+                    for str_kind, str_file in d_file.items()}
+    assert d_status == {'DICM': True, 'raw': True, 'text': False, 'empty': False,
+                        'truncated': False}
+    d_read      = {str_kind : pf_dicom.DICOMfile_read(file = d_file[str_kind])
+                    for str_kind in ['DICM', 'raw']}
+    assert d_read['raw']['d_DICOM']['d_dicomSimple']['PatientID'] == \
+           d_read['DICM']['d_DICOM']['d_dicomSimple']['PatientID']
+    d_stats     = pf_dicom.readLog.stats()
+    assert (d_stats['rejected'], d_stats['failed']) == (2, 1)
+    assert [os.path.basename(d['file']) for d in d_stats['l_entry']
+                if d['kind'] == 'failed'] == ['truncated.dcm']
+    assert pf_dicom.readLog.summary() == '2 file(s) skipped as not DICOM, 1 failed to read'
+
+def test_readLog():
+    log     = sniff.readLog(maxEntries = 3)
+    assert log.summary() == ''
+    for i in range(5):
+        log.add('rejected' if i % 2 else 'failed', 'file-%d' % i, 'reason %d' % i)
+    d_stats = log.stats()
+    assert (d_stats['rejected'], d_stats['failed']) == (2, 3)
+    assert [d['file'] for d in d_stats['l_entry']] == ['file-2', 'file-3', 'file-4']
+    d_drain = log.drain()
+    assert d_drain == d_stats
+    assert log.stats() == {'rejected': 0, 'failed': 0, 'l_entry': []}
+    other   = sniff.readLog()
+    other.add('failed', 'file-x', 'reason')
+    other.merge(d_drain)
+    assert (other.stats()['rejected'], other.stats()['failed']) == (2, 4)
+    assert len(other.stats()['l_entry']) == 4
+
+@pytest.mark.parametrize('l_args', [[], ['--executor', 'process', '--workers', '2'],
+                                    ['--stream']],
+                         ids = ['thread', 'process', 'stream'])
+def test_run(d_tree, d_file, tmp_path, l_args):
+    """
+    Files that are not DICOM in the tree are counted, once, whatever the
+    executor.
+    """
+    str_dir     = os.path.join(d_tree['rootDir'], 'junk')
+    os.makedirs(str_dir, exist_ok = True)
+    for str_kind in ['text', 'empty', 'truncated']:
+        with open(d_file[str_kind], 'rb') as fp, \
+             open(os.path.join(str_dir, '%s.dcm' % str_kind), 'wb') as fp_out:
+            fp_out.write(fp.read())
+    try:
+        d_ret   = tool_run(d_tree, tmp_path, l_args)
+    finally:
+        for str_file in os.listdir(str_dir):
+            os.remove(os.path.join(str_dir, str_file))
+        os.rmdir(str_dir)
+    assert (d_ret['d_readLog']['rejected'], d_ret['d_readLog']['failed']) == (2, 1)
@@ -0,0 +1,110 @@
+#
+# When str(dcm) fails, 'strRaw' is built element by element, the failing
+# element is remembered per vendor and private creator, and later files
+# with it skip str(dcm).
+#
+
+import      io
+import      os
+import      struct
+
+import      pytest
+
+from        pydicom.uid         import  generate_uid
+
+from        pfdicom             import  bench
+from        conftest            import  tool_run, pfdicom_make
+
+def file_write(str_file, str_vendor, block = 0x10, b_bad = True):
+    """
+    A file of <str_vendor> with a private element (in the creator block
+    <block>) that str() fails on if <b_bad>: a US value of three bytes.
+    """
+    ds                  = bench.dataset_make(0, 0, generate_uid(), 1, 0)
+    ds.Manufacturer     = str_vendor
+    ds.add_new((0x0029, block), 'LO', 'ACME PRIVATE')
+    ds.add_new((0x0029, (block << 8) | 0x01), 'UN', b'abc' if b_bad else b'ab')
+    fp                  = io.BytesIO()
+    ds.save_as(fp, write_like_original = False)
+    data                = fp.getvalue()
+    i                   = data.index(struct.pack('<HH', 0x0029, (block << 8) | 0x01) + b'UN')
+    with open(str_file, 'wb') as fp:
+        fp.write(data[:i + 4] + b'US' + struct.pack('<H', 3 if b_bad else 2) + data[i + 12:])
+    return str_file
+
+def strRaw_read(pf_dicom, str_file):
+    d_DICOM     = pf_dicom.DICOMfile_read(file = str_file)['d_DICOM']
+    return d_DICOM, d_DICOM['strRaw']
+
+def test_fallback(tmp_path):
+    pf_dicom    = pfdicom_make()
+    d_DICOM, str_raw    = strRaw_read(pf_dicom, file_write(str(tmp_path / 'a.dcm'), 'ACME'))
+    assert not d_DICOM.b_strRaw
+    assert 'Failed to string convert key "(0029, 1001)"' in str_raw
+    assert "Patient ID                          LO: '4412364'" in str_raw
+    d_stats     = pf_dicom.strRaw.stats()
+    assert (d_stats['files'], d_stats['filesSkipped']) == (1, 0)
+    assert d_stats['l_failure'] == [{'vendor': 'ACME', 'creator': 'ACME PRIVATE',
+                                     'tag': '(0029, 0001)', 'count': 1}]
+
+def test_known(tmp_path):
+    """
+    The failing element is known again in a file where its creator has
+    another block, but not for another vendor.
+    """
+    pf_dicom    = pfdicom_make()
+    strRaw_read(pf_dicom, file_write(str(tmp_path / 'a.dcm'), 'ACME'))
+    d_DICOM, str_raw    = strRaw_read(pf_dicom,
+                                      file_write(str(tmp_path / 'b.dcm'), 'ACME', block = 0x11))
+    assert not d_DICOM.b_strRaw
+    assert 'Failed to string convert key "(0029, 1101)"' in str_raw
+    assert pf_dicom.strRaw.stats()['filesSkipped'] == 1
+    strRaw_read(pf_dicom, file_write(str(tmp_path / 'c.dcm'), 'OTHER'))
+    d_stats     = pf_dicom.strRaw.stats()
+    assert (d_stats['files'], d_stats['filesSkipped']) == (3, 1)
+    assert pf_dicom.strRaw.summary() == \
+            '3 file(s) needed an explicit string conversion, 3 element(s) failed'
+
+def test_good(tmp_path):
+    pf_dicom    = pfdicom_make()
+    d_DICOM, str_raw    = strRaw_read(pf_dicom,
+                                      file_write(str(tmp_path / 'a.dcm'), 'ACME', b_bad = False))
+    assert d_DICOM.b_strRaw
+    assert str_raw == str(d_DICOM['dcm'])
+    assert pf_dicom.strRaw.stats()['files'] == 0
+    assert pf_dicom.strRaw.summary() == ''
+
+def test_mergeKeepsMemory(tmp_path):
+    pf_worker   = pfdicom_make()
+    strRaw_read(pf_worker, file_write(str(tmp_path / 'a.dcm'), 'ACME'))
+    pf_parent   = pfdicom_make()
+    pf_parent.strRaw.merge(pf_worker.strRaw.drain())
+    assert pf_worker.strRaw.stats()['files'] == 0
+    assert pf_parent.strRaw.stats()['l_failure'][0]['count'] == 1
+    strRaw_read(pf_parent, file_write(str(tmp_path / 'b.dcm'), 'ACME'))
+    assert pf_parent.strRaw.stats()['filesSkipped'] == 1
+
+class strRawDICOM(bench.benchDICOM):
+    """
+    Builds the 'strRaw' of every file it reads.
+    """
+
+    def inputReadCallback(self, *args, **kwargs):
+        d_read  = super().inputReadCallback(*args, **kwargs)
+        for d_file in d_read['l_DCMRead']:
+            d_file['d_DICOM']['strRaw']
+        return d_read
+
+@pytest.mark.parametrize('l_args', [[], ['--executor', 'process', '--workers', '2']],
+                         ids = ['thread', 'process'])
+def test_run(tmp_path, l_args):
+    str_rootDir = tmp_path / 'in'
+    for i in range(3):
+        os.makedirs(str(str_rootDir / ('dir-%d' % i)))
+        for j in range(2):
+            file_write(str(str_rootDir / ('dir-%d' % i) / ('%d.dcm' % j)), 'ACME')
+    d_ret       = tool_run({'rootDir': str(str_rootDir)}, tmp_path / 'out', l_args,
+                           cls = strRawDICOM)
+    assert d_ret['d_strRaw']['files'] == 6
+    assert d_ret['d_strRaw']['l_failure'][0]['count'] == 6
+    assert d_ret['d_strRaw']['filesSkipped'] >= 3
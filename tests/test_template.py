@@ -0,0 +1,119 @@
+#
+# The compiled output file stem templates must give exactly what the
+# string interpreter gives.
+#
+
+import      pytest
+
+from        pydicom.dataset     import  Dataset
+
+from        pfdicom             import  template
+from        pfdicom.dicommap    import  DICOMmap
+from        conftest            import  pfdicom_make
+
+l_template  = [
+    '',
+    'no-tags-here',
+    '%PatientID',
+    '%PatientID-%PatientAge',
+    '%PatientID-%PatientID',
+    '%PatientID-%StudyDate-%_md5|8_AccessionNumber',
+    '%_md5_PatientID',
+    '%_md5|7_PatientID-%_strmsk|******01_PatientBirthDate-%Modality',
+    '%_strmsk|**************_PatientID',
+    '%_nospc|-_SeriesDescription-%ProtocolName.dcm',
+    '%_nospc_SeriesDescription',
+    '%_name|patientID_PatientName-%_md5|4_PatientID-%StudyDate-output.txt',
+    '%_name|studyDate_PatientName',
+    '%NotATag-%PatientID',
+    '%Modality%PatientID',
+    '%%PatientID',
+    '100%-%PatientAge',
+    '%ProtocolName-%Protocol',
+    '%SeriesDescription/%_md5|4_SeriesInstanceUID',
+]
+
+def dataset_make():
+    ds                      = Dataset()
+    ds.PatientName          = 'Doe^John'
+    ds.PatientID            = '4412364'
+    ds.PatientAge           = '006Y'
+    ds.PatientBirthDate     = '20140317'
+    ds.AccessionNumber      = '22681485'
+    ds.StudyDate            = '20200101'
+    ds.Modality             = 'MR'
+    ds.SeriesDescription    = 'AX T1 MPRAGE (post)'
+    ds.ProtocolName         = 'T1 MPRAGE'
+    ds.SeriesInstanceUID    = '1.2.3.4'
+    ds.add_new((0x0019, 0x1001), 'LO', 'private')
+    return ds
+
+@pytest.fixture(scope = 'module')
+def pf_dicom():
+    return pfdicom_make()
+
+@pytest.mark.parametrize('l_tagsToUse', [None, ['PatientID']], ids = ['all', 'some'])
+@pytest.mark.parametrize('astr', l_template)
+def test_compiled(pf_dicom, astr, l_tagsToUse):
+    ds          = dataset_make()
+    d_DICOM     = DICOMmap(ds, l_tagsToUse = l_tagsToUse)
+    d_interp    = pf_dicom.tagsInString_interpret(d_DICOM, astr)
+    # Twice: compiled, and served from the stem memo
+    for i in range(2):
+        assert pf_dicom.tagsInString_process(d_DICOM, astr) == d_interp
+
+def test_compiledIndexed(pf_dicom):
+    """
+    A map served from a tag index gives the stems of a parsed one.
+    """
+    ds          = dataset_make()
+    d_index     = {
+        'l_tagRaw':         ds.dir(),
+        'd_dicomSimple':    {t : ds.data_element(t).value for t in ds.dir()}
+    }
+    for astr in l_template:
+        assert pf_dicom.tagsInString_process(DICOMmap(d_index = d_index), astr) == \
+               pf_dicom.tagsInString_interpret(DICOMmap(ds), astr)
+
+l_function  = ['md5', 'md5|8', 'strmsk|****01**', 'strmsk|*', 'nospc', 'nospc|-', 'nospc|.']
+
+l_value     = ['AX T1 MPRAGE (post)', 'SAG  T2/FLAIR', '  dwi_b1000 ', 'Ünïcödé rest',
+               'x', '12345678901234', '--(())--', 'T1 MPRAGE']
+
+@pytest.fixture(params = ['numpy', 'python'])
+def b_numpy(request, monkeypatch):
+    """
+    The column transforms with numpy (if it is installed), and without.
+    """
+    if request.param == 'numpy':
+        if template.numpy is None:
+            pytest.skip('numpy is not installed')
+    else:
+        monkeypatch.setattr(template, 'numpy', None)
+    return request.param == 'numpy'
+
+@pytest.mark.parametrize('l_column', [
+    l_value,
+    l_value * 16,
+    l_value[:3] * 4096,
+    [None] + l_value + [None, None],
+    [None, l_value[0]] * 64
+], ids = ['distinct', 'repeated', 'sampled', 'missing', 'missingRepeated'])
+@pytest.mark.parametrize('str_func', l_function)
+def test_column(pf_dicom, b_numpy, str_func, l_column):
+    """
+    A column transform gives, for each value, what the per-string
+    template function gives for it (None stays None).
+    """
+    d_expected  = {None: None}
+    for str_value in set(l_column) - {None}:
+        ds                      = Dataset()
+        ds.SeriesDescription    = str_value
+        d_expected[str_value]   = pf_dicom.tagsInString_interpret(
+                                    DICOMmap(ds), '%%_%s_SeriesDescription' % str_func)['str_result']
+    assert template.column_transform(l_column, str_func) == \
+           [d_expected[v] for v in l_column]
+
+def test_columnFunction():
+    with pytest.raises(ValueError):
+        template.column_transform(l_value, 'name')